@@ -0,0 +1,41 @@
+import argparse
+from env import load_env_file
+from services.batch_service import StageLimits, run_batch
+
+load_env_file()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate resumes in bulk from a JSONL or CSV manifest.")
+    parser.add_argument("manifest", help="Path to a .jsonl/.ndjson or .csv manifest")
+    parser.add_argument("--results", default="./batch-results.jsonl", help="Where to write per-item results")
+    parser.add_argument("--output-dir", default="./resumes", help="Local output folder when no blob container is set")
+    parser.add_argument("--rewrite-workers", type=int, default=4)
+    parser.add_argument("--render-workers", type=int, default=4)
+    parser.add_argument("--upload-workers", type=int, default=8)
+    parser.add_argument("--persist-workers", type=int, default=8)
+    parser.add_argument("--section-concurrency", type=int, default=None,
+                        help="In-flight section rewrites per resume (defaults to OPENAI_MAX_CONCURRENCY)")
+    parser.add_argument("--renderer", choices=("nutrient", "local"), default=None,
+                        help="PDF backend (defaults to PDF_RENDERER, then nutrient)")
+    args = parser.parse_args()
+
+    limits = StageLimits(
+        rewrite=args.rewrite_workers,
+        render=args.render_workers,
+        upload=args.upload_workers,
+        persist=args.persist_workers,
+    )
+    succeeded, failed = run_batch(
+        manifest_path=args.manifest,
+        results_path=args.results,
+        output_dir=args.output_dir,
+        limits=limits,
+        section_concurrency=args.section_concurrency,
+        renderer=args.renderer,
+    )
+    print(f"Done. {succeeded} succeeded, {failed} failed. Results written to {args.results}")
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import sys
+import json
+import argparse
+import multiprocessing
+from dataclasses import asdict
+from urllib.request import urlopen
+
+from benchmarks.fake_services import SERVICES, FakeServiceConfig, FaultProfile, serve_fake_services, service_env
+from benchmarks.scenarios import SCENARIOS, ScenarioParams, ScenarioResult, run_scenario_in_child, summarize
+
+DEFAULT_LATENCY_MS = {"openai": 250.0, "nutrient": 400.0, "blob": 20.0, "table": 15.0}
+# Direction in which each compared metric gets worse.
+_LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+_HIGHER_IS_BETTER = ("throughput_per_second",)
+
+def _parse_per_service(raw: str | None, defaults: dict[str, float]) -> dict[str, float]:
+    values = dict(defaults)
+    if not raw:
+        return values
+    for item in raw.split(","):
+        service, sep, value = item.partition("=")
+        service = service.strip()
+        if sep:
+            if service not in SERVICES:
+                raise argparse.ArgumentTypeError(f"Unknown service '{service}'; expected one of {', '.join(SERVICES)}")
+            values[service] = float(value)
+        else:
+            # A bare number applies to every service.
+            values = {s: float(service) for s in SERVICES}
+    return values
+
+def _fetch_stats(base_url: str) -> dict:
+    with urlopen(f"{base_url}/__stats", timeout=10) as resp:
+        return json.loads(resp.read())
+
+def _stats_delta(before: dict, after: dict) -> dict[str, int]:
+    delta = {}
+    for service in SERVICES:
+        delta[f"{service}_requests"] = after["requests"][service] - before["requests"][service]
+        injected = after["errors"][service] - before["errors"][service]
+        if injected:
+            delta[f"{service}_injected_errors"] = injected
+    return delta
+
+def _compare(current: list[dict], baseline_path: str, tolerance: float) -> list[str]:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {row["scenario"]: row for row in json.load(f)["results"]}
+
+    regressions = []
+    for row in current:
+        before = baseline.get(row["scenario"])
+        if not before:
+            continue
+        for metric in _LOWER_IS_BETTER + _HIGHER_IS_BETTER:
+            old, new = before.get(metric), row.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > tolerance if metric in _LOWER_IS_BETTER else change < -tolerance
+            if worse:
+                regressions.append(f"{row['scenario']}.{metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+def _print_table(rows: list[dict]) -> None:
+    columns = ("scenario", "operations", "throughput_per_second", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+    headers = ("scenario", "ops", "ops/s", "p50 ms", "p95 ms", "p99 ms", "peak RSS MB")
+    table = [headers] + [tuple("-" if row.get(c) is None else str(row.get(c)) for c in columns) for row in rows]
+    widths = [max(len(r[i]) for r in table) for i in range(len(columns))]
+    for r in table:
+        print("  ".join(cell.rjust(w) if i else cell.ljust(w) for i, (cell, w) in enumerate(zip(r, widths))))
+    for row in rows:
+        if row.get("error"):
+            print(f"{row['scenario']} failed: {row['error']}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark resume generation against local stand-ins for OpenAI, Nutrient and Azure."
+    )
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--iterations", type=int, default=10, help="Operations per scenario (create/list/regenerate/upload)")
+    parser.add_argument("--batch-size", type=int, default=20, help="Resumes in the batch scenario")
+    parser.add_argument("--workers", type=int, default=4, help="Per-stage workers in the batch scenario")
+    parser.add_argument("--entities", type=int, default=50_000, help="Table entities seeded for the list scenario")
+    parser.add_argument("--pdf-kb", type=int, default=48, help="Size of the PDFs the fake Nutrient returns")
+    parser.add_argument("--renderer", choices=("nutrient", "local"), default=None)
+    parser.add_argument("--latency", default=None,
+                        help="Per-service latency in ms, e.g. 'openai=300,nutrient=500' or one number for all")
+    parser.add_argument("--jitter", default="0", help="Per-service extra random latency in ms, same format")
+    parser.add_argument("--error-rate", default="0", help="Per-service fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for latency jitter and error injection")
+    parser.add_argument("--token-delay", type=float, default=0.0,
+                        help="Fake OpenAI generation time per completion token in ms (latency is then time to first token)")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Compare against a previous --json file")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative change before a metric counts as a regression")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s) {', '.join(unknown)}; expected {', '.join(SCENARIOS)}")
+    scenarios = list(dict.fromkeys(args.scenarios or SCENARIOS))
+
+    latency = _parse_per_service(args.latency, DEFAULT_LATENCY_MS)
+    jitter = _parse_per_service(args.jitter, {s: 0.0 for s in SERVICES})
+    error_rate = _parse_per_service(args.error_rate, {s: 0.0 for s in SERVICES})
+    config = FakeServiceConfig(
+        profiles={
+            s: FaultProfile(latency_ms=latency[s], jitter_ms=jitter[s], error_rate=error_rate[s])
+            for s in SERVICES
+        },
+        pdf_bytes=args.pdf_kb * 1024,
+        seed_entities=args.entities if "list" in scenarios else 0,
+        token_delay_ms=args.token_delay,
+        seed=args.seed,
+    )
+
+    # Fresh interpreters for the fakes and for each scenario keep their memory and warm
+    # connection pools out of each other's numbers.
+    ctx = multiprocessing.get_context("spawn")
+    ready, child_ready = ctx.Pipe(duplex=False)
+    fakes = ctx.Process(target=serve_fake_services, args=(config, child_ready), daemon=True)
+    fakes.start()
+    child_ready.close()
+    base_url = f"http://127.0.0.1:{ready.recv()}"
+
+    rows: list[dict] = []
+    try:
+        for name in scenarios:
+            params = ScenarioParams(
+                iterations=args.iterations,
+                batch_size=args.batch_size,
+                renderer=args.renderer,
+                workers=args.workers,
+                env=service_env(base_url),
+            )
+            before = _fetch_stats(base_url)
+            result_conn, child_conn = ctx.Pipe(duplex=False)
+            worker = ctx.Process(target=run_scenario_in_child, args=(name, params, child_conn))
+            worker.start()
+            child_conn.close()
+            try:
+                result = ScenarioResult(**result_conn.recv())
+            except EOFError:
+                result = ScenarioResult(name, 0, 0.0, [], None, error=f"scenario process exited with {worker.exitcode}")
+            worker.join()
+            row = summarize(result)
+            row.update(_stats_delta(before, _fetch_stats(base_url)))
+            rows.append(row)
+            print(f"{name}: done in {row['wall_seconds']}s", file=sys.stderr)
+    finally:
+        fakes.terminate()
+        fakes.join()
+
+    _print_table(rows)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": asdict(config), "results": rows}, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+    failed = any(row.get("error") for row in rows)
+    if args.baseline:
+        regressions = _compare(rows, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"Regression: {line}")
+        failed = failed or bool(regressions)
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,532 @@
+import io
+import json
+import time
+import random
+import re
+import threading
+import zipfile
+from xml.sax.saxutils import escape
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from email.parser import BytesParser
+from email.utils import formatdate
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+SERVICES = ("openai", "nutrient", "blob", "table")
+SAS_QUERY = "sv=bench&sig=bench"
+TABLE_NAME = "Resumes"
+
+@dataclass
+class FaultProfile:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+
+@dataclass
+class FakeServiceConfig:
+    profiles: dict[str, FaultProfile] = field(default_factory=lambda: {s: FaultProfile() for s in SERVICES})
+    pdf_bytes: int = 48 * 1024
+    seed_entities: int = 0
+    # Generation time per completion token (one word here); the profile latency is then the
+    # time to the first token, which streaming responses send right away.
+    token_delay_ms: float = 0.0
+    seed: int = 1234
+
+def service_env(base_url: str) -> dict[str, str]:
+    return {
+        "OPENAI_API_URL": f"{base_url}/openai/v1/chat/completions",
+        "OPENAI_API_KEY": "bench",
+        "NUTRIENT_API_URL": f"{base_url}/nutrient/build",
+        "NUTRIENT_API_KEY": "bench",
+        "AZURE_CONTAINER_SAS_URL": f"{base_url}/blob/resumes?{SAS_QUERY}",
+        "AZURE_LOGS_CONTAINER_SAS_URL": f"{base_url}/blob/logs?{SAS_QUERY}",
+        "AZURE_TABLE_SAS_URL": f"{base_url}/table?{SAS_QUERY}",
+        "AZURE_TABLE_NAME": TABLE_NAME,
+    }
+
+def _fake_pdf(size: int) -> bytes:
+    head = b"%PDF-1.4\n%bench\n"
+    tail = b"\n%%EOF\n"
+    return head + b"0" * max(size - len(head) - len(tail), 0) + tail
+
+_CLAUSE = re.compile(r"^\s*\(?\s*(\w+)\s+(eq|ne|gt|ge|lt|le)\s+(?:datetime)?'((?:[^']|'')*)'\s*\)?\s*$")
+
+def _parse_filter(expr: str) -> list[tuple[str, str, str]]:
+    # Only and-joined comparisons against literals, which is all this codebase emits;
+    # anything else is ignored rather than rejected.
+    clauses = []
+    for part in re.split(r"\s+and\s+", expr or ""):
+        match = _CLAUSE.match(part)
+        if match:
+            clauses.append((match.group(1), match.group(2), match.group(3).replace("''", "'")))
+    return clauses
+
+_OPS = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "ge": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "le": lambda a, b: a <= b,
+}
+
+class FakeState:
+    def __init__(self, config: FakeServiceConfig) -> None:
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.pdf = _fake_pdf(config.pdf_bytes)
+        self.blobs: dict[str, bytes] = {}
+        self.etags: dict[str, str] = {}
+        self.append_blobs: set[str] = set()
+        self.sealed_blobs: set[str] = set()
+        self.blocks: dict[str, dict[str, bytes]] = {}
+        self.entities: dict[tuple[str, str], dict] = {}
+        self.keys: list[tuple[str, str]] = []
+        self.requests = {s: 0 for s in SERVICES}
+        self.errors = {s: 0 for s in SERVICES}
+        self._seed_table(config.seed_entities)
+
+    def _seed_table(self, count: int) -> None:
+        started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for i in range(count):
+            code = f"{i:08x}"
+            created = (started + timedelta(seconds=i)).isoformat()
+            name = f"Seed Person {i}"
+            entity = {
+                "PartitionKey": "by-code",
+                "RowKey": code,
+                "Code": code,
+                "OriginalName": name,
+                "NameSlug": f"seed-person-{i}",
+                "BlobUrl": f"https://bench.invalid/resumes/seed-person-{i}-{code}.pdf",
+                "PageSize": "A4",
+                "Description": "Seeded entity for listing benchmarks.",
+                "CreatedAt": created,
+                "Timestamp": created,
+            }
+            self.entities[("by-code", code)] = entity
+        self.keys = sorted(self.entities)
+
+    def insert(self, entity: dict) -> bool:
+        key = (entity["PartitionKey"], entity["RowKey"])
+        with self.lock:
+            if key in self.entities:
+                return False
+            entity = dict(entity, Timestamp=datetime.now(timezone.utc).isoformat())
+            self.entities[key] = entity
+            insort(self.keys, key)
+            return True
+
+    def merge(self, key: tuple[str, str], entity: dict) -> None:
+        with self.lock:
+            if key not in self.entities:
+                insort(self.keys, key)
+            merged = {**self.entities.get(key, {}), **entity}
+            self.entities[key] = dict(merged, Timestamp=datetime.now(timezone.utc).isoformat())
+
+    def apply_batch(self, operations: list[tuple[str, tuple[str, str], dict]]) -> tuple[int, str] | None:
+        # All or nothing, like an entity group transaction: returns (index, code) of the
+        # first operation that cannot apply and leaves the table untouched.
+        with self.lock:
+            for i, (verb, key, _) in enumerate(operations):
+                if verb == "POST" and key in self.entities:
+                    return i, "EntityAlreadyExists"
+                if verb == "DELETE" and key not in self.entities:
+                    return i, "ResourceNotFound"
+            now = datetime.now(timezone.utc).isoformat()
+            for verb, key, entity in operations:
+                if verb == "DELETE":
+                    del self.entities[key]
+                    self.keys.remove(key)
+                    continue
+                if key not in self.entities:
+                    insort(self.keys, key)
+                base = self.entities.get(key, {}) if verb == "MERGE" else {}
+                self.entities[key] = dict({**base, **entity}, Timestamp=now)
+        return None
+
+    def query(self, filter_expr: str, top: int, select: list[str] | None, next_key: tuple[str, str] | None):
+        clauses = _parse_filter(filter_expr)
+        with self.lock:
+            start = bisect_left(self.keys, next_key) if next_key else 0
+            page: list[dict] = []
+            index = start
+            while index < len(self.keys) and len(page) < top:
+                entity = self.entities[self.keys[index]]
+                index += 1
+                if all(_OPS[op](str(entity.get(name, "")), value) for name, op, value in clauses):
+                    page.append({k: entity[k] for k in select if k in entity} if select else dict(entity))
+            continuation = self.keys[index] if index < len(self.keys) else None
+        return page, continuation
+
+class FakeServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> FakeState:
+        return self.server.fake_state
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes = b"", headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _send_json(self, status: int, payload, headers: dict[str, str] | None = None) -> None:
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        self._send(status, json.dumps(payload).encode("utf-8"), headers)
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _dispatch(self, method: str) -> None:
+        parts = urlsplit(self.path)
+        segments = [unquote(s) for s in parts.path.strip("/").split("/") if s]
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        body = self._body()
+
+        if segments == ["__stats"]:
+            with self.state.lock:
+                self._send_json(200, {"requests": dict(self.state.requests), "errors": dict(self.state.errors)})
+            return
+
+        service = segments[0] if segments else ""
+        if service not in SERVICES:
+            self._send_json(404, {"error": "unknown service"})
+            return
+
+        profile = self.state.config.profiles[service]
+        with self.state.lock:
+            self.state.requests[service] += 1
+            delay = profile.latency_ms + self.state.rng.uniform(0, profile.jitter_ms)
+            fail = self.state.rng.random() < profile.error_rate
+            if fail:
+                self.state.errors[service] += 1
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        if fail:
+            self._send_json(profile.error_status, {"error": "injected failure"})
+            return
+
+        getattr(self, f"_{service}")(method, segments[1:], query, body)
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_HEAD(self) -> None:
+        self._dispatch("HEAD")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_PUT(self) -> None:
+        self._dispatch("PUT")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def do_MERGE(self) -> None:
+        self._dispatch("MERGE")
+
+    def _openai(self, method: str, segments: list[str], query: dict, body: bytes) -> None:
+        payload = json.loads(body or b"{}")
+        user = next((m["content"] for m in payload.get("messages", []) if m.get("role") == "user"), "")
+        if (payload.get("response_format") or {}).get("type") == "json_object":
+            sections = json.loads(user)
+            content = json.dumps({k: f"{v} (improved)" for k, v in sections.items()})
+        else:
+            content = user.split("\n\n", 1)[-1] + " (improved)"
+        words = re.findall(r"\S+\s*", content)
+        token_delay = self.state.config.token_delay_ms / 1000.0
+        if payload.get("stream"):
+            self._stream_completion(payload, words, token_delay, len(user) // 4)
+            return
+        if token_delay > 0:
+            time.sleep(token_delay * len(words))
+        self._send_json(200, {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "model": payload.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(user) // 4, "completion_tokens": len(content) // 4},
+        })
+
+    def _stream_completion(self, payload: dict, words: list[str], token_delay: float, prompt_tokens: int) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(data: str) -> None:
+            self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        def chunk(delta: dict, finish_reason: str | None = None) -> str:
+            return json.dumps({
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            })
+
+        self.wfile.write(b": keep-alive\n\n")
+        event(chunk({"role": "assistant", "content": ""}))
+        for i, word in enumerate(words):
+            if i and token_delay > 0:
+                time.sleep(token_delay)
+            event(chunk({"content": word}))
+        event(chunk({}, "stop"))
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            event(json.dumps({
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "choices": [],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words)},
+            }))
+        event("[DONE]")
+
+    def _nutrient(self, method: str, segments: list[str], query: dict, body: bytes) -> None:
+        head = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("latin-1")
+        message = BytesParser(policy=HTTP).parsebytes(head + body)
+        instructions = {}
+        for part in message.iter_parts():
+            if part.get_param("name", header="content-disposition") == "instructions":
+                instructions = json.loads(part.get_content())
+        outputs = instructions.get("outputs") or [{"name": "resume.pdf"}]
+        if len(outputs) == 1:
+            self._send(200, self.state.pdf, {"Content-Type": "application/pdf"})
+            return
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+            for output in outputs:
+                archive.writestr(output["name"], self.state.pdf)
+        self._send(200, buffer.getvalue(), {"Content-Type": "application/zip"})
+
+    def _list_blobs(self, container: str, query: dict) -> None:
+        prefix = f"{container}/{query.get('prefix', '')}"
+        limit = int(query.get("maxresults", 5000))
+        marker = query.get("marker", "")
+        with self.state.lock:
+            names = sorted(p for p in self.state.blobs if p.startswith(prefix) and p > f"{container}/{marker}")
+            page = [(p, len(self.state.blobs[p]), p in self.state.sealed_blobs) for p in names[:limit]]
+        now = formatdate(usegmt=True)
+        blobs = "".join(
+            f"<Blob><Name>{escape(p.split('/', 1)[1])}</Name><Properties><Last-Modified>{now}</Last-Modified>"
+            f"<Content-Length>{size}</Content-Length>{'<Sealed>true</Sealed>' if sealed else ''}</Properties></Blob>"
+            for p, size, sealed in page
+        )
+        next_marker = escape(page[-1][0].split("/", 1)[1]) if len(names) > limit else ""
+        body = f"<EnumerationResults><Blobs>{blobs}</Blobs><NextMarker>{next_marker}</NextMarker></EnumerationResults>"
+        self._send(200, body.encode("utf-8"), {"Content-Type": "application/xml"})
+
+    def _blob(self, method: str, segments: list[str], query: dict, body: bytes) -> None:
+        path = "/".join(segments)
+        state = self.state
+        if method == "GET" and query.get("comp") == "list":
+            self._list_blobs(segments[0], query)
+            return
+        if method == "POST":
+            # No Blob Batch here; callers fall back to one DELETE per blob.
+            self._send_json(405, {"error": "UnsupportedHttpVerb"})
+            return
+        if method in ("GET", "HEAD"):
+            with state.lock:
+                data = state.blobs.get(path)
+                etag = state.etags.get(path, '"0"')
+            if data is None:
+                self._send(404)
+            elif method == "HEAD":
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+            else:
+                self._send(200, data, {"Content-Type": "application/pdf", "ETag": etag})
+            return
+        if method == "DELETE":
+            with state.lock:
+                if_match = self.headers.get("If-Match")
+                if if_match and path in state.blobs and if_match not in ("*", state.etags.get(path)):
+                    self._send(412)
+                    return
+                found = state.blobs.pop(path, None) is not None
+                state.etags.pop(path, None)
+                state.append_blobs.discard(path)
+                state.sealed_blobs.discard(path)
+            self._send(202 if found else 404)
+            return
+
+        comp = query.get("comp")
+        with state.lock:
+            if comp == "seal":
+                if path not in state.append_blobs:
+                    self._send(404)
+                    return
+                state.sealed_blobs.add(path)
+                self._send(200, headers={"ETag": state.etags[path]})
+                return
+            if comp == "appendblock":
+                if path not in state.append_blobs:
+                    self._send(404)
+                    return
+                if path in state.sealed_blobs:
+                    self._send_json(409, {"error": "BlobIsSealed"})
+                    return
+                limit = self.headers.get("x-ms-blob-condition-maxsize")
+                if limit and len(state.blobs[path]) + len(body) > int(limit):
+                    self._send_json(412, {"error": "MaxBlobSizeConditionNotMet"})
+                    return
+                state.blobs[path] += body
+                etag = state.etags[path] = f'"{len(state.blobs[path]):x}-{time.monotonic_ns():x}"'
+                self._send(201, headers={"ETag": etag})
+                return
+            if comp == "block":
+                state.blocks.setdefault(path, {})[query["blockid"]] = body
+                self._send(201)
+                return
+            if self.headers.get("If-None-Match") == "*" and path in state.blobs:
+                self._send_json(409, {"error": "BlobAlreadyExists"})
+                return
+            if_match = self.headers.get("If-Match")
+            if if_match and (path not in state.blobs or if_match not in ("*", state.etags.get(path))):
+                self._send_json(412, {"error": "ConditionNotMet"})
+                return
+            if comp == "blocklist":
+                staged = state.blocks.pop(path, {})
+                ids = re.findall(r"<Latest>([^<]+)</Latest>", body.decode("utf-8"))
+                if any(block_id not in staged for block_id in ids):
+                    self._send_json(400, {"error": "InvalidBlockList"})
+                    return
+                state.blobs[path] = b"".join(staged[block_id] for block_id in ids)
+            else:
+                state.blobs[path] = body
+            if self.headers.get("x-ms-blob-type") == "AppendBlob":
+                state.append_blobs.add(path)
+            else:
+                state.append_blobs.discard(path)
+            etag = state.etags[path] = f'"{len(body):x}-{time.monotonic_ns():x}"'
+        self._send(201, headers={"ETag": etag})
+
+    def _table_batch(self, body: bytes) -> None:
+        boundary = re.search(rb"boundary=(changeset_[\w-]+)", body)
+        if not boundary:
+            self._send_json(400, {"odata.error": {"code": "InvalidInput"}})
+            return
+        operations = []
+        for part in body.split(b"--" + boundary.group(1))[1:-1]:
+            # Part headers, then the embedded request line and headers, then its body.
+            _, request = part.split(b"\r\n\r\n", 1)
+            head, payload = request.split(b"\r\n\r\n", 1)
+            verb, url = head.decode("utf-8").split(" ", 2)[:2]
+            payload = payload.strip()
+            entity = json.loads(payload) if payload else {}
+            match = re.search(r"PartitionKey='((?:[^']|'')*)',RowKey='((?:[^']|'')*)'", unquote(url))
+            key = (
+                (match.group(1).replace("''", "'"), match.group(2).replace("''", "'"))
+                if match else (entity.get("PartitionKey"), entity.get("RowKey"))
+            )
+            operations.append((verb, key, entity))
+
+        failure = self.state.apply_batch(operations)
+        if failure is None:
+            responses = "".join(
+                "--changesetresponse_bench\r\nContent-Type: application/http\r\n\r\n"
+                "HTTP/1.1 204 No Content\r\n\r\n"
+                for _ in operations
+            )
+        else:
+            index, code = failure
+            status = "409 Conflict" if code == "EntityAlreadyExists" else "404 Not Found"
+            error = json.dumps({"odata.error": {"code": code, "message": {"value": f"{index}:{code}"}}})
+            responses = (
+                "--changesetresponse_bench\r\nContent-Type: application/http\r\n\r\n"
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n\r\n{error}\r\n"
+            )
+        text = (
+            "--batchresponse_bench\r\n"
+            "Content-Type: multipart/mixed; boundary=changesetresponse_bench\r\n\r\n"
+            f"{responses}--changesetresponse_bench--\r\n--batchresponse_bench--\r\n"
+        )
+        self._send(202, text.encode("utf-8"), {"Content-Type": "multipart/mixed; boundary=batchresponse_bench"})
+
+    def _table(self, method: str, segments: list[str], query: dict, body: bytes) -> None:
+        resource = segments[0] if segments else ""
+        if method == "POST" and resource == "$batch":
+            self._table_batch(body)
+            return
+        if method == "POST" and resource == TABLE_NAME:
+            if self.state.insert(json.loads(body)):
+                self._send(204)
+            else:
+                self._send_json(409, {"odata.error": {"code": "EntityAlreadyExists"}})
+            return
+
+        match = re.match(r".*PartitionKey='((?:[^']|'')*)',RowKey='((?:[^']|'')*)'", resource)
+        key = (match.group(1).replace("''", "'"), match.group(2).replace("''", "'")) if match else None
+        if method == "MERGE" and key:
+            # Without If-Match this is Insert Or Merge.
+            self.state.merge(key, json.loads(body))
+            self._send(204)
+            return
+
+        if method == "GET" and resource.startswith(f"{TABLE_NAME}("):
+            with self.state.lock:
+                entity = self.state.entities.get(key) if key else None
+            if entity is None:
+                self._send_json(404, {"odata.error": {"code": "ResourceNotFound"}})
+                return
+            select = query.get("$select")
+            columns = select.split(",") if select else None
+            self._send_json(200, {k: entity[k] for k in columns if k in entity} if columns else entity)
+            return
+
+        if method == "GET" and resource in (TABLE_NAME, f"{TABLE_NAME}()"):
+            next_pk, next_rk = query.get("NextPartitionKey"), query.get("NextRowKey")
+            select = query.get("$select")
+            page, continuation = self.state.query(
+                query.get("$filter", ""),
+                int(query.get("$top", 1000)),
+                select.split(",") if select else None,
+                (next_pk, next_rk) if next_pk and next_rk else None,
+            )
+            headers = {}
+            if continuation:
+                headers = {
+                    "x-ms-continuation-NextPartitionKey": continuation[0],
+                    "x-ms-continuation-NextRowKey": continuation[1],
+                }
+            self._send_json(200, {"value": page}, headers)
+            return
+
+        self._send_json(404, {"odata.error": {"code": "ResourceNotFound"}})
+
+class _FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Batch scenarios open many connections at once; the default backlog of 5 drops some.
+    request_queue_size = 128
+
+def create_fake_server(config: FakeServiceConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    httpd = _FakeServer((host, port), FakeServiceHandler)
+    httpd.fake_state = FakeState(config)
+    return httpd
+
+def serve_fake_services(config: FakeServiceConfig, ready) -> None:
+    # Entry point for a child process, so the fakes' memory and CPU stay out of the measurements.
+    httpd = create_fake_server(config)
+    ready.send(httpd.server_port)
+    ready.close()
+    httpd.serve_forever()
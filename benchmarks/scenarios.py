@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+from dataclasses import asdict, dataclass, field
+
+SCENARIOS = ("create", "batch", "list", "regenerate", "upload")
+
+SAMPLE_SECTIONS = {
+    "objective": "Backend engineer looking to build reliable data pipelines.",
+    "technical_skills": "Python, SQL, Azure, Terraform, Docker",
+    "experience": "Five years building APIs and batch jobs; led a migration to managed storage.",
+    "education": "BSc Computer Science",
+    "languages": "English, Portuguese",
+}
+
+@dataclass
+class ScenarioParams:
+    iterations: int = 10
+    batch_size: int = 20
+    page_size: str = "A4"
+    renderer: str | None = None
+    workers: int = 4
+    env: dict[str, str] = field(default_factory=dict)
+
+@dataclass
+class ScenarioResult:
+    scenario: str
+    operations: int
+    wall_seconds: float
+    latencies: list[float]
+    peak_rss_bytes: int | None
+    extra: dict = field(default_factory=dict)
+    error: str | None = None
+
+def percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def summarize(result: ScenarioResult) -> dict:
+    return {
+        "scenario": result.scenario,
+        "operations": result.operations,
+        "wall_seconds": round(result.wall_seconds, 4),
+        "throughput_per_second": round(result.operations / result.wall_seconds, 3) if result.wall_seconds else None,
+        "p50_ms": _ms(percentile(result.latencies, 50)),
+        "p95_ms": _ms(percentile(result.latencies, 95)),
+        "p99_ms": _ms(percentile(result.latencies, 99)),
+        "peak_rss_mb": round(result.peak_rss_bytes / (1024 * 1024), 1) if result.peak_rss_bytes else None,
+        **result.extra,
+        **({"error": result.error} if result.error else {}),
+    }
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+def _peak_rss_bytes(who: str = "RUSAGE_SELF") -> int | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(getattr(resource, who)).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _timed(fn, *args, **kwargs) -> tuple[float, object]:
+    started = time.perf_counter()
+    value = fn(*args, **kwargs)
+    return time.perf_counter() - started, value
+
+def _create(params: ScenarioParams, workdir: str) -> tuple[list[float], int, dict]:
+    from pdf_service import generate_resume_pdf
+
+    latencies = []
+    for i in range(params.iterations):
+        elapsed, _ = _timed(
+            generate_resume_pdf,
+            name=f"Bench Person {i}",
+            description=f"Benchmark run {i}: builds reliable systems and mentors engineers.",
+            output_path=os.path.join(workdir, f"create-{i}.pdf"),
+            page_size=params.page_size,
+            renderer=params.renderer,
+            **SAMPLE_SECTIONS,
+        )
+        latencies.append(elapsed)
+    return latencies, params.iterations, {}
+
+def _batch(params: ScenarioParams, workdir: str) -> tuple[list[float], int, dict]:
+    from services.batch_service import StageLimits, run_batch
+
+    manifest_path = os.path.join(workdir, "manifest.jsonl")
+    results_path = os.path.join(workdir, "results.jsonl")
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        for i in range(params.batch_size):
+            row = {"name": f"Batch Person {i}", "description": f"Batch item {i}.", "page_size": params.page_size}
+            f.write(json.dumps({**row, **SAMPLE_SECTIONS}) + "\n")
+
+    limits = StageLimits(rewrite=params.workers, render=params.workers, upload=params.workers * 2,
+                         persist=params.workers * 2)
+    succeeded, failed = run_batch(manifest_path, results_path, output_dir=workdir, limits=limits,
+                                  renderer=params.renderer)
+
+    latencies = []
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            # Time spent inside stages; queueing between stages is what the wall clock adds on top.
+            latencies.append(sum(json.loads(line)["timings"].values()))
+    return latencies, succeeded + failed, {"failed": failed}
+
+def _list(params: ScenarioParams, workdir: str) -> tuple[list[float], int, dict]:
+    from services.metadata_service import get_all_resumes
+
+    latencies = []
+    entities = 0
+    for _ in range(params.iterations):
+        elapsed, resumes = _timed(get_all_resumes)
+        latencies.append(elapsed)
+        entities = len(resumes)
+    total = sum(latencies)
+    return latencies, params.iterations, {
+        "entities": entities,
+        "entities_per_second": round(entities * params.iterations / total, 1) if total else None,
+    }
+
+def _regenerate(params: ScenarioParams, workdir: str) -> tuple[list[float], int, dict]:
+    from pdf_service import generate_resume_pdf
+    from services.metadata_service import get_resume_by_code
+    from services.resume_index import get_resume
+
+    def generate(i: int, existing: dict | None) -> str:
+        return generate_resume_pdf(
+            name="Bench Regenerate",
+            description=f"Revision {i} of the same resume.",
+            output_path=os.path.join(workdir, f"regenerate-{i}.pdf"),
+            page_size=params.page_size,
+            renderer=params.renderer,
+            existing=existing,
+            **SAMPLE_SECTIONS,
+        )
+
+    # Mirrors the CLI update flow: re-render and overwrite the same blob and row in place.
+    location = generate(0, None)
+    existing = None
+    if location.startswith("http"):
+        code = location.split("?", 1)[0].rsplit("-", 1)[-1].removesuffix(".pdf")
+        existing = get_resume_by_code(code)
+    latencies = []
+    for i in range(1, params.iterations + 1):
+        elapsed, _ = _timed(generate, i, existing)
+        latencies.append(elapsed)
+        if existing:
+            existing = get_resume(existing["code"])
+    return latencies, params.iterations, {}
+
+def _upload(params: ScenarioParams, workdir: str) -> tuple[list[float], int, dict]:
+    from services.metadata_service import _update_log
+
+    container = os.environ["AZURE_CONTAINER_SAS_URL"]
+    pdf = b"%PDF-1.4\n" + b"0" * (48 * 1024) + b"\n%%EOF\n"
+    latencies = []
+    for i in range(params.iterations):
+        elapsed, _ = _timed(_update_log, container, f"Upload Person {i}", "Upload benchmark.", params.page_size, pdf)
+        latencies.append(elapsed)
+    return latencies, params.iterations, {}
+
+def run_scenario(name: str, params: ScenarioParams) -> ScenarioResult:
+    os.environ.update(params.env)
+    workdir = tempfile.mkdtemp(prefix=f"resume-bench-{name}-")
+    # Keep every run cold and self-contained unless the caller opts back in through params.env.
+    os.environ.setdefault("OPENAI_CACHE_DISABLED", "1")
+    os.environ.setdefault("RENDER_CACHE_DISABLED", "1")
+    os.environ.setdefault("METADATA_JOURNAL_DIR", os.path.join(workdir, "journal"))
+    os.environ.setdefault("RESUME_INDEX_PATH", os.path.join(workdir, "index.sqlite3"))
+
+    started = time.perf_counter()
+    try:
+        latencies, operations, extra = globals()[f"_{name}"](params, workdir)
+        error = None
+    except Exception as ex:
+        latencies, operations, extra, error = [], 0, {}, f"{type(ex).__name__}: {ex}"
+    wall = time.perf_counter() - started
+    if params.renderer == "local":
+        from pdf_service import get_renderer
+
+        # Reap the render workers so their peak RSS shows up under RUSAGE_CHILDREN.
+        get_renderer("local").close()
+
+    from services.http_client import connection_stats
+
+    per_host = connection_stats().values()
+    extra["http_connections"] = sum(h.get("connections", 0) for h in per_host)
+    extra["http_retries"] = sum(h.get("retries", 0) for h in per_host)
+    # The local renderer's process pool lives outside this process's own RSS.
+    child_rss = _peak_rss_bytes("RUSAGE_CHILDREN")
+    if child_rss:
+        extra["peak_child_rss_mb"] = round(child_rss / (1024 * 1024), 1)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return ScenarioResult(name, operations, wall, latencies, _peak_rss_bytes(), extra, error)
+
+def run_scenario_in_child(name: str, params: ScenarioParams, conn) -> None:
+    # Each scenario gets a fresh interpreter so peak RSS and warm pools don't leak between them.
+    result = run_scenario(name, params)
+    conn.send(asdict(result))
+    conn.close()
@@ -1,8 +1,17 @@
+import sys
+import json
+import argparse
+from contextlib import redirect_stdout
 from dataclasses import dataclass
+from threading import Lock
 from env import load_env_file
-from pdf_service import generate_resume_pdf
-from services.metadata_service import get_all_resumes, delete_resume_blob
-from typing import Optional
+from services.resume_index import get_resume, iter_resume_pages, load_resumes
+from typing import Iterator, Optional
+
+DISPLAY_PAGE_SIZE = 20
+
+# pdf_service and metadata_service pull in requests and the render stack; they are
+# imported inside the commands that need them so `show` and `list --offline` start fast.
 
 load_env_file()
 
@@ -11,42 +20,119 @@ class Resume:
     name: str
     description: str
 
-def update_resume_interactive() -> None:
-    print("\nUpdate a Resume")
+class RewritePreview:
+    # Shows rewritten sections as they stream in. Sections stream concurrently, so one is
+    # printed live and the others are buffered until it finishes, then shown in turn.
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._active: str | None = None
+        self._buffers: dict[str, str] = {}
+        self._finished: list = []
+
+    def delta(self, prop: str, text: str) -> None:
+        with self._lock:
+            if self._active is None and not self._finished:
+                self._start(prop)
+            if prop == self._active:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+            else:
+                self._buffers[prop] = self._buffers.get(prop, "") + text
+
+    def complete(self, rewrite) -> None:
+        with self._lock:
+            if rewrite.property == self._active:
+                self._active = None
+                print(f"\n  Rewrote {rewrite.property} in {rewrite.elapsed:.2f}s")
+            else:
+                # Cached, speculative or buffered results are printed whole when their turn comes.
+                self._buffers.pop(rewrite.property, None)
+                self._finished.append(rewrite)
+            self._drain()
+
+    def _start(self, prop: str) -> None:
+        self._active = prop
+        print(f"\n[{prop}] ", end="")
+        sys.stdout.write(self._buffers.pop(prop, ""))
+        sys.stdout.flush()
+
+    def _drain(self) -> None:
+        while self._active is None and self._finished:
+            rewrite = self._finished.pop(0)
+            print(f"\n[{rewrite.property}] {rewrite.text}")
+            print(f"  Rewrote {rewrite.property} in {rewrite.elapsed:.2f}s")
+        if self._active is None and self._buffers:
+            self._start(next(iter(self._buffers)))
+
+def _load_details(summary: dict) -> dict:
+    code = summary.get("code")
+    if not code:
+        return summary
     try:
-        resumes = get_all_resumes()
+        return get_resume(code) or summary
+    except Exception as ex:
+        print(f"Warning: failed to load resume details: {ex}")
+        return summary
+
+def _choose_resume(action: str, cancel_message: str | None = None) -> Optional[dict]:
+    # Rows are printed as pages arrive and the next page is fetched in the background;
+    # picking a resume (or backing out) stops any further paging.
+    pages = iter_resume_pages(page_size=100)
+    rows = (r for page in pages for r in page)
+    shown: list[dict] = []
+    try:
+        pending = next(rows, None)
+        if pending is None:
+            print("No resumes found.")
+            return None
+
+        print("\nAvailable Resumes:")
+        while True:
+            for _ in range(DISPLAY_PAGE_SIZE):
+                if pending is None:
+                    break
+                shown.append(pending)
+                code = pending.get("code") or "N/A"
+                name = pending.get("name") or "Unnamed"
+                print(f"[{len(shown)}] {code} - {name}")
+                pending = next(rows, None)
+
+            if pending is not None:
+                hint = "press Enter for more, or q to go back"
+            else:
+                hint = "or press Enter to go back"
+            choice = input(f"\nEnter a number to {action} ({hint}): ").strip().lower()
+            if not choice and pending is not None:
+                continue
+            if not choice or choice in ("q", "quit"):
+                if cancel_message:
+                    print(cancel_message)
+                return None
+            if not choice.isdigit():
+                print("Invalid input. Please enter a number.")
+                return None
+
+            i = int(choice)
+            if i < 1 or i > len(shown):
+                print("Selection out of range.")
+                return None
+            return shown[i - 1]
     except Exception as ex:
         print(f"Error fetching resumes: {ex}")
-        return
-
-    if not resumes:
-        print("No resumes found.")
-        return
-
-    print("\nAvailable Resumes:")
-    for idx, r in enumerate(resumes, start=1):
-        code = r.get("code") or "N/A"
-        name = r.get("name") or "Unnamed"
-        print(f"[{idx}] {code} - {name}")
-
-    choice = input("\nEnter a number to update (or press Enter to cancel): ").strip()
-    if not choice:
-        print("Canceled. Returning to menu...")
-        return
-    if not choice.isdigit():
-        print("Invalid input. Please enter a number.")
-        return
+        return None
+    finally:
+        pages.close()
 
-    i = int(choice)
-    if i < 1 or i > len(resumes):
-        print("Selection out of range.")
+def update_resume_interactive() -> None:
+    print("\nUpdate a Resume")
+    summary = _choose_resume("update", cancel_message="Canceled. Returning to menu...")
+    if summary is None:
         return
 
-    selected = resumes[i - 1]
+    selected = _load_details(summary)
     current_name = selected.get("name") or ""
     current_desc = selected.get("description") or ""
     current_page_size = selected.get("page_size") or "A4"
-    old_blob_url = selected.get("blob_url")
     code = selected.get("code")
 
     print("\nPress Enter to keep the current value.")
@@ -71,61 +157,32 @@ def update_resume_interactive() -> None:
     timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
     output_path = f"./output/{safe_name}-updated-{timestamp}.pdf"
 
+    from pdf_service import generate_resume_pdf
+
+    preview = RewritePreview()
     try:
         new_location = generate_resume_pdf(
             name=new_name,
             description=new_desc,
             output_path=output_path,
             page_size=new_page_size,
+            on_section_rewritten=preview.complete,
+            on_section_delta=preview.delta,
+            existing=selected,
         )
-        print("\nNew version generated.")
-        print(f"New location: {new_location}")
-
-        if old_blob_url:
-            try:
-                delete_resume_blob(old_blob_url)
-                print("Old resume deleted successfully.")
-            except Exception as del_ex:
-                print(f"Warning: failed to delete old resume: {del_ex}")
-        else:
-            print("No previous resume file URL found; skipping deletion.")
-
+        print("\nResume updated.")
+        print(f"Location: {new_location}")
     except Exception as ex:
         print(f"\nFailed to update resume: {ex}")
 
     input("\nPress Enter to return to the menu...")
 
 def list_resumes_interactive() -> Optional[str]:
-    try:
-        resumes = get_all_resumes()
-    except Exception as ex:
-        print(f"Error fetching resumes: {ex}")
-        return None
-
-    if not resumes:
-        print("No resumes found.")
-        return None
-
-    print("\nAvailable Resumes:")
-    for idx, r in enumerate(resumes, start=1):
-        code = r.get("code") or "N/A"
-        name = r.get("name") or "Unnamed"
-        print(f"[{idx}] {code} - {name}")
-
-    choice = input("\nEnter a number to view details (or press Enter to go back): ").strip()
-    if not choice:
-        return None
-
-    if not choice.isdigit():
-        print("Invalid input. Please enter a number.")
-        return None
-
-    i = int(choice)
-    if i < 1 or i > len(resumes):
-        print("Selection out of range.")
+    summary = _choose_resume("view details")
+    if summary is None:
         return None
 
-    selected = resumes[i - 1]
+    selected = _load_details(summary)
     print("\nResume Details:")
     print(f"- Code:        {selected.get('code')}")
     print(f"- Name:        {selected.get('name')}")
@@ -136,76 +193,114 @@ def list_resumes_interactive() -> Optional[str]:
 
     return selected.get("code")
 
+CREATE_PROMPTS = (
+    ("name", "Name"),
+    ("description", "Description"),
+    ("page_size", "Page size (e.g., A4, Letter)"),
+    ("objective", "Objective"),
+    ("technical_skills", "Technical Skills"),
+    ("experience", "Experience"),
+    ("education", "Education"),
+    ("certification", "Certification"),
+    ("courses", "Courses"),
+    ("languages", "Languages"),
+    ("links", "Links"),
+)
+
 def create_resume_interactive() -> None:
+    from pdf_service import generate_resume_pdf, speculate_resume_field
+    from services.rewrite_service import SpeculativeRewriter
+
     print("\nCreate a Resume")
-    name = input("Name: ").strip()
-    description = input("Description: ").strip()
-    page_size = input("Page size (e.g., A4, Letter): ").strip() or "A4"
-    objective = input("Objective: ").strip()
-    technical_skills = input("Technical Skills: ").strip()
-    experience = input("Experience: ").strip()
-    education = input("Education: ").strip()
-    certification = input("Certification: ").strip()
-    courses = input("Courses: ").strip()
-    languages = input("Languages: ").strip()
-    links = input("Links: ").strip()
-
-    if not name:
-        print("Name is required.")
-        return
+    # Each section is sent for rewriting as soon as it is entered, so most of the OpenAI
+    # work is done by the time the user confirms. Unused results are dropped on close().
+    speculative = SpeculativeRewriter()
+    try:
+        fields = {}
+        for key, prompt in CREATE_PROMPTS:
+            fields[key] = input(f"{prompt}: ").strip()
+            speculate_resume_field(speculative, key, fields[key])
+
+        while True:
+            fields["page_size"] = fields["page_size"] or "A4"
+            if not fields["name"]:
+                print("Name is required.")
+                return
+
+            print("\n[Preview] Resume to be created:")
+            print(f"- Name:        {fields['name']}")
+            print(f"- Description: {fields['description']}")
+            print(f"- Page Size:   {fields['page_size']}")
+            print(f"- Objective: {fields['objective']}")
+            print(f"- Technical Skills: {fields['technical_skills']}")
+            print(f"- Experience: {fields['experience']}")
+            print(f"- Education: {fields['education']}")
+            print(f"- Certification: {fields['certification']}")
+            print(f"- Courses: {fields['courses']}")
+            print(f"- Languages: {fields['languages']}")
+            print(f"- Links: {fields['links']}")
+
+            choice = input("\nProceed with creating this resume? (y/N, e to edit a field): ").strip().lower()
+            if choice not in ("e", "edit"):
+                break
+            key = input("Field to edit (e.g., experience): ").strip().lower().replace(" ", "_")
+            prompts = dict(CREATE_PROMPTS)
+            if key not in prompts:
+                print(f"Unknown field '{key}'.")
+                continue
+            fields[key] = input(f"{prompts[key]}: ").strip()
+            speculate_resume_field(speculative, key, fields[key])
+
+        if choice not in ("y", "yes"):
+            print("Canceled. Returning to menu...")
+            return
+
+        from datetime import datetime
+        safe_name = "".join(c for c in fields["name"] if c.isalnum() or c in "-_ ").strip().replace(" ", "_") or "resume"
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output_path = f"./resumes/{safe_name}-{timestamp}.pdf"
+
+        preview = RewritePreview()
+        try:
+            result_path_or_url = generate_resume_pdf(
+                output_path=output_path,
+                on_section_rewritten=preview.complete,
+                on_section_delta=preview.delta,
+                speculative=speculative,
+                **fields,
+            )
+            print("\nSuccess! Resume generated.")
+            print(f"Location: {result_path_or_url}")
+        except Exception as ex:
+            print(f"\nFailed to generate resume: {ex}")
+    finally:
+        speculative.close()
 
-    print("\n[Preview] Resume to be created:")
-    print(f"- Name:        {name}")
-    print(f"- Description: {description}")
-    print(f"- Page Size:   {page_size}")
-    print(f"- Objective: {objective}")
-    print(f"- Technical Skills: {technical_skills}")
-    print(f"- Experience: {experience}")
-    print(f"- Education: {education}")
-    print(f"- Certification: {certification}")
-    print(f"- Courses: {courses}")
-    print(f"- Languages: {languages}")
-    print(f"- Links: {links}")
-
-    choice = input("\nProceed with creating this resume? (y/N): ").strip().lower()
-    if choice not in ("y", "yes"):
-        print("Canceled. Returning to menu...")
-        return
+    input("\nPress Enter to return to the menu...")
 
-    from datetime import datetime
-    safe_name = "".join(c for c in name if c.isalnum() or c in "-_ ").strip().replace(" ", "_") or "resume"
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    output_path = f"./resumes/{safe_name}-{timestamp}.pdf"
 
+def rebuild_index_interactive() -> None:
+    print("\nRebuilding the local resume index...")
     try:
-        result_path_or_url = generate_resume_pdf(
-            name=name,
-            description=description,
-            output_path=output_path,
-            page_size=page_size,
-            objective=objective,
-            technical_skills=technical_skills,
-            experience=experience,
-            education=education,
-            certification=certification,
-            courses=courses,
-            languages=languages,
-            links=links,
-        )
-        print("\nSuccess! Resume generated.")
-        print(f"Location: {result_path_or_url}")
+        resumes = load_resumes(full_sync=True)
     except Exception as ex:
-        print(f"\nFailed to generate resume: {ex}")
+        print(f"Error rebuilding index: {ex}")
+        return
+    print(f"Index rebuilt with {len(resumes)} resumes.")
 
-    input("\nPress Enter to return to the menu...")
+def run_cli() -> None:
+    from services.metadata_journal import resume_pending_metadata
 
+    pending = resume_pending_metadata()
+    if pending:
+        print(f"Retrying {pending} pending metadata record(s) in the background.")
 
-def run_cli() -> None:
     while True:
         print("\nWhat do you want to do?")
         print("1 - Get All Resumes")
         print("2 - Create a resume")
         print("3 - Update a resume")
+        print("4 - Rebuild local resume index")
         print("q - Quit")
 
         choice = input("Choose an option: ").strip().lower()
@@ -218,12 +313,243 @@ def run_cli() -> None:
             create_resume_interactive()
         elif choice == "3":
             update_resume_interactive()
+        elif choice == "4":
+            rebuild_index_interactive()
         elif choice in {"q", "quit", "exit"}:
             print("Goodbye!")
             break
         else:
             print("Invalid option. Please try again.")
 
+class CommandError(Exception):
+    pass
+
+def _print_json(value) -> None:
+    indent = 2 if sys.stdout.isatty() else None
+    print(json.dumps(value, ensure_ascii=False, indent=indent))
+
+def _output_path(name: str, folder: str, suffix: str = "") -> str:
+    from datetime import datetime
+    safe_name = "".join(c for c in name if c.isalnum() or c in "-_ ").strip().replace(" ", "_") or "resume"
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return f"./{folder}/{safe_name}{suffix}-{timestamp}.pdf"
+
+def _read_fields(path: str) -> dict:
+    from services.batch_service import MANIFEST_FIELDS
+
+    try:
+        if path == "-":
+            data = json.load(sys.stdin)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+    except (OSError, ValueError) as ex:
+        raise CommandError(f"Could not read resume fields from {path}: {ex}") from ex
+    if not isinstance(data, dict):
+        raise CommandError(f"{path} must contain a JSON object")
+    unknown = sorted(set(data) - set(MANIFEST_FIELDS))
+    if unknown:
+        raise CommandError(f"Unknown field(s) in {path}: {', '.join(unknown)}")
+    return {k: str(v) for k, v in data.items() if v is not None}
+
+def _require_resume(code: str) -> dict:
+    resume = get_resume(code)
+    if resume is None:
+        raise CommandError(f"Resume {code} not found")
+    return resume
+
+def _start_pending_metadata() -> None:
+    from services.metadata_journal import resume_pending_metadata
+
+    pending = resume_pending_metadata()
+    if pending:
+        print(f"Retrying {pending} pending metadata record(s) in the background.", file=sys.stderr)
+
+def cmd_list(args) -> object:
+    if args.offline:
+        from services.resume_index import get_resume_index
+        return get_resume_index().list_resumes()
+    return load_resumes(full_sync=args.full_sync)
+
+def cmd_show(args) -> object:
+    return _require_resume(args.code)
+
+def cmd_create(args) -> object:
+    fields = _read_fields(args.source) if args.source else {}
+    for key in ("name", "description", "page_size"):
+        if getattr(args, key):
+            fields[key] = getattr(args, key)
+    if not fields.get("name"):
+        raise CommandError("A name is required")
+    fields.setdefault("description", "")
+
+    from pdf_service import generate_resume_pdf
+
+    _start_pending_metadata()
+    location = generate_resume_pdf(
+        output_path=args.output or _output_path(fields["name"], "resumes"),
+        renderer=args.renderer,
+        **fields,
+    )
+    return {"name": fields["name"], "location": location}
+
+def cmd_update(args) -> object:
+    current = _require_resume(args.code)
+    fields = _read_fields(args.source) if args.source else {}
+    fields.setdefault("name", current.get("name") or "")
+    fields.setdefault("description", current.get("description") or "")
+    fields.setdefault("page_size", current.get("page_size") or "A4")
+    for key in ("name", "description", "page_size"):
+        if getattr(args, key):
+            fields[key] = getattr(args, key)
+
+    from pdf_service import generate_resume_pdf
+
+    _start_pending_metadata()
+    location = generate_resume_pdf(
+        output_path=args.output or _output_path(fields["name"], "output", "-updated"),
+        renderer=args.renderer,
+        existing=current,
+        force=args.force,
+        **fields,
+    )
+    return {"code": args.code, "location": location}
+
+def cmd_delete(args) -> object:
+    resume = _require_resume(args.code)
+
+    from services.metadata_service import delete_resume_blob, delete_resume_entity
+    from services.resume_index import forget_resume
+
+    blob_url = resume.get("blob_url")
+    if blob_url and not args.keep_blob:
+        delete_resume_blob(blob_url)
+    deleted = delete_resume_entity(args.code)
+    forget_resume(args.code)
+    return {"code": args.code, "blob_deleted": bool(blob_url and not args.keep_blob), "entity_deleted": deleted}
+
+def cmd_gc(args) -> object:
+    from dataclasses import asdict
+    from services.blob_gc import collect_garbage
+
+    report = collect_garbage(
+        dry_run=not args.apply,
+        min_age_hours=args.min_age_hours,
+        workers=args.workers,
+        force=args.force,
+    )
+    return asdict(report)
+
+def _parse_date(value: str):
+    from datetime import date
+
+    try:
+        return date.fromisoformat(value)
+    except ValueError as ex:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}") from ex
+
+def cmd_audit(args) -> object:
+    from datetime import date, timedelta
+    from services.audit_log import iter_audit_records
+
+    until = args.until or date.today()
+    since = args.since or until - timedelta(days=7)
+    if since > until:
+        raise CommandError("--since must not be after --until")
+    return iter_audit_records(since, until)
+
+def cmd_audit_compact(args) -> object:
+    from services.audit_log import compact_audit_log
+
+    return compact_audit_log(before=args.before)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Manage resumes. Run without a command for the interactive menu; commands print JSON."
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    list_cmd = commands.add_parser("list", help="List resume summaries")
+    list_cmd.add_argument("--full-sync", action="store_true", help="Rebuild the local index from the table first")
+    list_cmd.add_argument("--offline", action="store_true", help="Read the local index without syncing")
+    list_cmd.set_defaults(handler=cmd_list)
+
+    show_cmd = commands.add_parser("show", help="Show one resume")
+    show_cmd.add_argument("code")
+    show_cmd.set_defaults(handler=cmd_show)
+
+    def add_generation_options(cmd, source_help: str) -> None:
+        cmd.add_argument("--from", dest="source", metavar="FILE", help=source_help)
+        cmd.add_argument("--name")
+        cmd.add_argument("--description")
+        cmd.add_argument("--page-size")
+        cmd.add_argument("--output", help="Local PDF path when blob storage is not configured")
+        cmd.add_argument("--renderer", choices=("nutrient", "local"), default=None)
+
+    create_cmd = commands.add_parser("create", help="Generate a new resume")
+    add_generation_options(create_cmd, "JSON object with the resume fields ('-' for stdin)")
+    create_cmd.set_defaults(handler=cmd_create)
+
+    update_cmd = commands.add_parser("update", help="Regenerate a resume in place, keeping its code")
+    update_cmd.add_argument("code")
+    add_generation_options(update_cmd, "JSON object with fields to change ('-' for stdin)")
+    update_cmd.add_argument("--force", action="store_true",
+                            help="Overwrite the PDF even if it changed since the resume was listed")
+    update_cmd.set_defaults(handler=cmd_update)
+
+    delete_cmd = commands.add_parser("delete", help="Delete a resume's PDF and metadata")
+    delete_cmd.add_argument("code")
+    delete_cmd.add_argument("--keep-blob", action="store_true", help="Only remove the metadata")
+    delete_cmd.set_defaults(handler=cmd_delete)
+
+    gc_cmd = commands.add_parser("gc", help="Delete orphaned PDFs and entities whose PDF is gone")
+    gc_mode = gc_cmd.add_mutually_exclusive_group()
+    gc_mode.add_argument("--dry-run", dest="apply", action="store_false",
+                         help="Report what would be deleted without deleting (the default)")
+    gc_mode.add_argument("--apply", dest="apply", action="store_true", help="Actually delete what the report lists")
+    gc_cmd.add_argument("--min-age-hours", type=float, default=24.0,
+                        help="Leave blobs and entities younger than this alone (default: 24)")
+    gc_cmd.add_argument("--workers", type=int, default=8, help="Concurrent delete batches")
+    gc_cmd.add_argument("--force", action="store_true",
+                        help="Allow deleting more than half of the table's entities or the container's blobs")
+    gc_cmd.set_defaults(handler=cmd_gc, apply=False)
+
+    audit_cmd = commands.add_parser("audit", help="Stream metadata audit records as NDJSON")
+    audit_cmd.add_argument("--since", type=_parse_date, help="First day to read (default: a week before --until)")
+    audit_cmd.add_argument("--until", type=_parse_date, help="Last day to read (default: today)")
+    audit_cmd.set_defaults(handler=cmd_audit)
+
+    compact_cmd = commands.add_parser("audit-compact", help="Gzip audit segments that no longer take appends")
+    compact_cmd.add_argument("--before", type=_parse_date,
+                             help="Seal every segment of days before this one (default: today)")
+    compact_cmd.set_defaults(handler=cmd_audit_compact)
+    return parser
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        run_cli()
+        return 0
+
+    out = sys.stdout
+    try:
+        # Library code reports progress with print(); keep stdout for the JSON result.
+        with redirect_stdout(sys.stderr):
+            result = args.handler(args)
+            if isinstance(result, Iterator):
+                # Streaming commands print one JSON line per record as it arrives.
+                for record in result:
+                    print(json.dumps(record, ensure_ascii=False), file=out, flush=True)
+                return 0
+    except CommandError as ex:
+        print(json.dumps({"error": str(ex)}), file=sys.stderr)
+        return 1
+    except Exception as ex:
+        print(json.dumps({"error": f"{type(ex).__name__}: {ex}"}), file=sys.stderr)
+        return 1
+    _print_json(result)
+    return 0
+
 if __name__ == "__main__":
-    run_cli()
+    sys.exit(main())
 
@@ -1,11 +1,24 @@
 import os
 import json
 import uuid
+import zipfile
+import tempfile
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from threading import Lock
 from html import escape
+from typing import Callable, Iterable, Iterator
+
 import requests
 
-from services.metadata_service import _upload_file, _update_log, persist_resume_metadata, improve_text_with_openai, \
-    render_section
+from services.metadata_service import STREAM_CHUNK_SIZE, _iter_pdf_chunks, _overwrite_resume, _save_stream_to_file, \
+    _upload_file, _update_log, render_section
+from services.local_pdf import normalize_page_size, render_html_to_pdf
+from services.render_cache import get_render_cache, iter_open_file, make_render_key
+from services.rewrite_service import SectionRewrite, SpeculativeRewriter, rewrite_sections
+from services.telemetry import count, span, trace
+from utils.identifiers import slugify
 
 API_URL = "https://api.nutrient.io/build"
 
@@ -15,11 +28,30 @@ def _ensure_unique_local_path(path: str) -> str:
     root, ext = os.path.splitext(path)
     return f"{root}-{uuid.uuid4().hex[:8]}{ext}"
 
-def generate_resume_pdf(
+# (title, form field, property sent to the rewriter), in document order.
+RESUME_SECTIONS = (
+    ("Objective", "objective", "objective"),
+    ("Technical Skills", "technical_skills", "technical_skills"),
+    ("Experience", "experience", "experience"),
+    ("Education", "education", "education"),
+    ("Certification", "certification", "certificate"),
+    ("Courses", "courses", "courses"),
+    ("Languages", "languages", "languages"),
+    ("Links", "links", "links"),
+)
+_SECTION_PROPERTIES = {field: prop for _, field, prop in RESUME_SECTIONS}
+_SECTION_PROPERTIES["description"] = "description"
+
+def speculate_resume_field(speculative: SpeculativeRewriter, field: str, value: str | None) -> None:
+    # Starts the rewrite build_resume_html would request for this field, so it can be
+    # claimed at generation time if the value doesn't change.
+    prop = _SECTION_PROPERTIES.get(field)
+    if prop is not None:
+        speculative.submit(prop, escape(value or ""))
+
+def build_resume_html(
     name: str,
     description: str,
-    output_path: str,
-    page_size: str = "A4",
     objective: str | None = None,
     technical_skills: str | None = None,
     experience: str | None = None,
@@ -28,60 +60,58 @@ def generate_resume_pdf(
     courses: str | None = None,
     languages: str | None = None,
     links: str | None = None,
-
+    max_concurrency: int | None = None,
+    on_section_rewritten: Callable[[SectionRewrite], None] | None = None,
+    speculative: SpeculativeRewriter | None = None,
+    on_section_delta: Callable[[str, str], None] | None = None,
 ) -> str:
-    api_key = os.getenv("NUTRIENT_API_KEY")
-    azure_container_sas_url = os.getenv("AZURE_CONTAINER_SAS_URL")
-
-    if not api_key:
-        raise ValueError("Missing API key. Set NUTRIENT_API_KEY or pass api_key.")
-
-    sections_html = []
     safe_name = escape(name)
     safe_desc = escape(description)
 
-    if objective:
-        safe_objective = escape(objective)
-        safe_objective = improve_text_with_openai("objective", safe_objective)
-        sections_html.append(render_section("Objective", safe_objective))
-
-    if technical_skills:
-        safe_technical_skills = escape(technical_skills)
-        safe_technical_skills = improve_text_with_openai("technical_skills", safe_technical_skills)
-        sections_html.append(render_section("Technical Skills", safe_technical_skills))
-
-    if experience:
-        safe_experience = escape(experience)
-        safe_experience = improve_text_with_openai("experience", safe_experience)
-        sections_html.append(render_section("Experience", safe_experience))
-
-    if education:
-        safe_education = escape(education)
-        safe_education = improve_text_with_openai("education", safe_education)
-        sections_html.append(render_section("Education", safe_education))
-
-    if certification:
-        safe_certification = escape(certification)
-        safe_certification = improve_text_with_openai("certificate", safe_certification)
-        sections_html.append(render_section("Certification", safe_certification))
+    values = {
+        "objective": objective,
+        "technical_skills": technical_skills,
+        "experience": experience,
+        "education": education,
+        "certification": certification,
+        "courses": courses,
+        "languages": languages,
+        "links": links,
+    }
+    requested_sections = [
+        (title, prop, escape(values[field]))
+        for title, field, prop in RESUME_SECTIONS
+        if values[field]
+    ]
 
-    if courses:
-        safe_courses = escape(courses)
-        safe_courses = improve_text_with_openai("courses", safe_courses)
-        sections_html.append(render_section("Courses", safe_courses))
+    titles = {prop: title for title, prop, _ in requested_sections}
+    rendered: dict[str, str] = {}
 
-    if languages:
-        safe_languages = escape(languages)
-        safe_languages = improve_text_with_openai("languages", safe_languages)
-        sections_html.append(render_section("Languages", safe_languages))
+    def section_done(rewrite: SectionRewrite) -> None:
+        # Finished sections are rendered while the others are still being rewritten.
+        if rewrite.property in titles:
+            rendered[rewrite.property] = render_section(titles[rewrite.property], rewrite.text)
+        if on_section_rewritten:
+            on_section_rewritten(rewrite)
 
-    if links:
-        safe_links = escape(links)
-        safe_links = improve_text_with_openai("links", safe_links)
-        sections_html.append(render_section("Links", safe_links))
+    count("rewrite_sections_total", len(requested_sections) + 1)
+    with span("rewrite"):
+        rewrites = rewrite_sections(
+            [(prop, text) for _, prop, text in requested_sections] + [("description", safe_desc)],
+            max_concurrency=max_concurrency,
+            on_complete=section_done,
+            speculative=speculative,
+            on_delta=on_section_delta,
+        )
 
-    safe_desc = improve_text_with_openai("description", safe_desc)
+    with span("html.assemble"):
+        sections_html = [
+            rendered.get(prop) or render_section(title, rewrite.text)
+            for (title, prop, _), rewrite in zip(requested_sections, rewrites)
+        ]
+        return _resume_document(safe_name, rewrites[-1].text, sections_html)
 
+def _resume_document(safe_name: str, safe_desc: str, sections_html: list[str]) -> str:
     sections_html.append(f"""
                         <div class="section">
                           <h2>About</h2>
@@ -116,12 +146,10 @@ def generate_resume_pdf(
                       </body>
                     </html>"""
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Accept": "application/pdf, application/zip",
-    }
+    return html_doc
 
-    instructions = {
+def _build_instructions(page_size: str) -> dict:
+    return {
         "parts": [
             {
                 "html": "index.html"  # reference the uploaded file by name
@@ -137,21 +165,368 @@ def generate_resume_pdf(
         ],
     }
 
-    files = {
-        "index.html": ("index.html", html_doc.encode("utf-8"), "text/html; charset=utf-8"),
+def _post_build(instructions: dict, files: dict[str, object], stream: bool) -> requests.Response:
+    api_key = os.getenv("NUTRIENT_API_KEY")
+    if not api_key:
+        raise ValueError("Missing API key. Set NUTRIENT_API_KEY or pass api_key.")
+
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Accept": "application/pdf, application/zip",
     }
     data = {
         "instructions": json.dumps(instructions),
     }
 
+    api_url = os.getenv("NUTRIENT_API_URL") or API_URL
+    return _upload_file(api_url, headers=headers, data=data, files=files, stream=stream, rate_limiter="nutrient")
+
+def render_resume_pdf(html_doc: str, page_size: str = "A4", stream: bool = False) -> requests.Response:
+    files = {
+        "index.html": ("index.html", html_doc.encode("utf-8"), "text/html; charset=utf-8"),
+    }
+    return _post_build(_build_instructions(page_size), files, stream)
+
+@dataclass
+class RenderOutput:
+    name: str
+    html_doc: str
+    page_size: str = "A4"
+
+def _iter_zip_member(archive: zipfile.ZipFile, member: str) -> Iterator[bytes]:
+    with archive.open(member) as f:
+        while True:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+def _render_bundle(outputs: list[RenderOutput], sink: Callable[[RenderOutput, Iterable[bytes]], str]) -> dict[str, str]:
+    html_parts: dict[str, str] = {}
+    files: dict[str, object] = {}
+    instructions = {"parts": [], "outputs": []}
+    for output in outputs:
+        # Outputs that share a document (e.g. A4 and Letter of one resume) upload its HTML once.
+        part_name = html_parts.get(output.html_doc)
+        if part_name is None:
+            part_name = f"doc-{len(html_parts)}.html"
+            html_parts[output.html_doc] = part_name
+            files[part_name] = (part_name, output.html_doc.encode("utf-8"), "text/html; charset=utf-8")
+            instructions["parts"].append({"html": part_name})
+        instructions["outputs"].append({
+            "type": "pdf",
+            "name": output.name,
+            "input": part_name,
+            "options": {"page": {"size": output.page_size}},
+        })
+
+    response = _post_build(instructions, files, stream=True)
+    content_type = response.headers.get("Content-Type", "")
+    if "zip" not in content_type:
+        if len(outputs) != 1:
+            response.close()
+            raise RuntimeError(f"Expected a zip archive for {len(outputs)} outputs, got '{content_type}'")
+        return {outputs[0].name: sink(outputs[0], _iter_pdf_chunks(response))}
+
+    # ZipFile needs a seekable file; spool to disk past a few MB so memory stays bounded.
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+        for chunk in _iter_pdf_chunks(response):
+            spool.write(chunk)
+        spool.seek(0)
+        with zipfile.ZipFile(spool) as archive:
+            members = {os.path.basename(info.filename): info.filename for info in archive.infolist()}
+            locations = {}
+            for output in outputs:
+                member = members.get(output.name)
+                if member is None:
+                    raise RuntimeError(f"Render output '{output.name}' missing from the build archive")
+                locations[output.name] = sink(output, _iter_zip_member(archive, member))
+            return locations
+
+class PdfRenderer(ABC):
+    name = ""
+
+    def check_configured(self) -> None:
+        pass
+
+    @abstractmethod
+    def cache_instructions(self, page_size: str) -> dict:
+        ...
+
+    @abstractmethod
+    def render(self, html_doc: str, page_size: str) -> Iterable[bytes] | requests.Response:
+        ...
+
+    def render_many(
+        self,
+        outputs: list[RenderOutput],
+        sink: Callable[[RenderOutput, Iterable[bytes]], str],
+    ) -> dict[str, str]:
+        return {o.name: sink(o, _iter_pdf_chunks(self.render(o.html_doc, o.page_size))) for o in outputs}
+
+class NutrientRenderer(PdfRenderer):
+    name = "nutrient"
+
+    def check_configured(self) -> None:
+        if not os.getenv("NUTRIENT_API_KEY"):
+            raise ValueError("Missing API key. Set NUTRIENT_API_KEY or pass api_key.")
+
+    def cache_instructions(self, page_size: str) -> dict:
+        return _build_instructions(page_size)
+
+    def render(self, html_doc: str, page_size: str) -> requests.Response:
+        return render_resume_pdf(html_doc, page_size, stream=True)
+
+    def render_many(self, outputs, sink) -> dict[str, str]:
+        return _render_bundle(outputs, sink)
+
+class LocalRenderer(PdfRenderer):
+    name = "local"
+    # Bump when the layout changes so cached renders of the old layout aren't served.
+    layout_version = 1
+
+    def __init__(self, processes: int | None = None) -> None:
+        if processes is None:
+            raw = os.getenv("LOCAL_RENDER_PROCESSES", "").strip()
+            processes = int(raw) if raw else (os.cpu_count() or 1)
+        if processes < 1:
+            raise ValueError("processes must be at least 1")
+        self.processes = processes
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_lock = Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor | None:
+        if self.processes == 1:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes)
+            return self._pool
+
+    def check_page_size(self, page_size: str) -> None:
+        normalize_page_size(page_size)
+
+    def cache_instructions(self, page_size: str) -> dict:
+        # "a4" and "A4" render the same PDF, so they share a cache entry.
+        return {"renderer": self.name, "layout": self.layout_version, "page": {"size": normalize_page_size(page_size)}}
+
+    def render(self, html_doc: str, page_size: str) -> Iterable[bytes]:
+        self.check_page_size(page_size)
+        # Layout is pure CPU work; running it in worker processes lets concurrent
+        # callers (batch render workers, service threads) use every core.
+        pool = self._get_pool()
+        if pool is None:
+            return [render_html_to_pdf(html_doc, page_size)]
+        return [pool.submit(render_html_to_pdf, html_doc, page_size).result()]
+
+    def render_many(self, outputs, sink) -> dict[str, str]:
+        for output in outputs:
+            self.check_page_size(output.page_size)
+        pool = self._get_pool()
+        if pool is None:
+            pdfs = [render_html_to_pdf(o.html_doc, o.page_size) for o in outputs]
+        else:
+            pdfs = pool.map(render_html_to_pdf, [o.html_doc for o in outputs], [o.page_size for o in outputs])
+        return {o.name: sink(o, [pdf]) for o, pdf in zip(outputs, pdfs)}
+
+    def close(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+RENDERERS: dict[str, type[PdfRenderer]] = {
+    NutrientRenderer.name: NutrientRenderer,
+    LocalRenderer.name: LocalRenderer,
+}
+_renderers: dict[str, PdfRenderer] = {}
+_renderers_lock = Lock()
+
+def get_renderer(name: str | None = None) -> PdfRenderer:
+    name = (name or os.getenv("PDF_RENDERER", "") or NutrientRenderer.name).strip().lower()
+    if name not in RENDERERS:
+        raise ValueError(f"Unknown PDF renderer '{name}'; expected one of {', '.join(RENDERERS)}")
+    with _renderers_lock:
+        if name not in _renderers:
+            _renderers[name] = RENDERERS[name]()
+        return _renderers[name]
+
+def _page_size_label(page_size: str) -> str:
+    # Span labels become histogram labels; keep them to the known sizes.
+    try:
+        return normalize_page_size(page_size)
+    except ValueError:
+        return "other"
+
+def render_resume_chunks(
+    html_doc: str,
+    page_size: str = "A4",
+    renderer: str | None = None,
+) -> Iterable[bytes] | requests.Response:
+    backend = get_renderer(renderer)
+    cache = get_render_cache()
+    if cache is None:
+        with span("render", renderer=backend.name, page_size=_page_size_label(page_size)):
+            return backend.render(html_doc, page_size)
+
+    key = make_render_key(html_doc, backend.cache_instructions(page_size))
+    cached = cache.open(key)
+    if cached is None:
+        with span("render", renderer=backend.name, page_size=_page_size_label(page_size)):
+            cached = cache.put(key, _iter_pdf_chunks(backend.render(html_doc, page_size)))
+    return iter_open_file(cached)
+
+def render_resume_outputs(
+    outputs: list[RenderOutput],
+    sink: Callable[[RenderOutput, Iterable[bytes]], str],
+    renderer: str | None = None,
+) -> dict[str, str]:
+    if len({o.name for o in outputs}) != len(outputs):
+        raise ValueError("Render output names must be unique")
+
+    backend = get_renderer(renderer)
+    cache = get_render_cache()
+    locations: dict[str, str] = {}
+    misses: list[RenderOutput] = []
+    keys: dict[str, str] = {}
+    for output in outputs:
+        if cache is None:
+            misses.append(output)
+            continue
+        keys[output.name] = make_render_key(output.html_doc, backend.cache_instructions(output.page_size))
+        cached = cache.open(keys[output.name])
+        if cached is None:
+            misses.append(output)
+        else:
+            locations[output.name] = sink(output, iter_open_file(cached))
+
+    if not misses:
+        return locations
+
+    if cache is None:
+        # The sink runs inside render_many, so these spans include storing each output.
+        count("render_outputs_total", len(misses), renderer=backend.name)
+        with span("render.outputs", renderer=backend.name):
+            locations.update(backend.render_many(misses, sink))
+        return locations
+
+    def cache_then_sink(output: RenderOutput, chunks: Iterable[bytes]) -> str:
+        return sink(output, iter_open_file(cache.put(keys[output.name], chunks)))
+
+    count("render_outputs_total", len(misses), renderer=backend.name)
+    with span("render.outputs", renderer=backend.name):
+        locations.update(backend.render_many(misses, cache_then_sink))
+    return locations
+
+def generate_resume_pdf(
+    name: str,
+    description: str,
+    output_path: str,
+    page_size: str = "A4",
+    objective: str | None = None,
+    technical_skills: str | None = None,
+    experience: str | None = None,
+    education: str | None = None,
+    certification: str | None = None,
+    courses: str | None = None,
+    languages: str | None = None,
+    links: str | None = None,
+    max_concurrency: int | None = None,
+    on_section_rewritten: Callable[[SectionRewrite], None] | None = None,
+    renderer: str | None = None,
+    existing: dict | None = None,
+    speculative: SpeculativeRewriter | None = None,
+    on_section_delta: Callable[[str, str], None] | None = None,
+    force: bool = False,
+) -> str:
+    # Pass the stored resume as `existing` to update it in place: same code, same blob.
+    # force overwrites the blob even if it changed since `existing` was loaded.
+    backend = get_renderer(renderer)
+    backend.check_configured()
+    with trace(), span("generate", renderer=backend.name, page_size=_page_size_label(page_size)):
+        azure_container_sas_url = os.getenv("AZURE_CONTAINER_SAS_URL")
+
+        html_doc = build_resume_html(
+            name=name,
+            description=description,
+            objective=objective,
+            technical_skills=technical_skills,
+            experience=experience,
+            education=education,
+            certification=certification,
+            courses=courses,
+            languages=languages,
+            links=links,
+            max_concurrency=max_concurrency,
+            on_section_rewritten=on_section_rewritten,
+            speculative=speculative,
+            on_section_delta=on_section_delta,
+        )
+
+        upload_response = render_resume_chunks(html_doc, page_size, renderer=renderer)
+
+        if azure_container_sas_url and existing:
+            return _overwrite_resume(
+                azure_container_sas_url, existing, name, description, page_size, upload_response, force=force
+            )
+        if azure_container_sas_url:
+            return _update_log(azure_container_sas_url, name, description, page_size, upload_response)
+
+        _save_stream_to_file(upload_response, output_path)
+
+        return output_path
+
+def generate_resume_variants(
+    name: str,
+    description: str,
+    output_dir: str,
+    page_sizes: tuple[str, ...] = ("A4", "Letter"),
+    objective: str | None = None,
+    technical_skills: str | None = None,
+    experience: str | None = None,
+    education: str | None = None,
+    certification: str | None = None,
+    courses: str | None = None,
+    languages: str | None = None,
+    links: str | None = None,
+    max_concurrency: int | None = None,
+    on_section_rewritten: Callable[[SectionRewrite], None] | None = None,
+    renderer: str | None = None,
+    on_section_delta: Callable[[str, str], None] | None = None,
+) -> dict[str, str]:
+    backend = get_renderer(renderer)
+    backend.check_configured()
+    with trace(), span("generate", renderer=backend.name):
+        azure_container_sas_url = os.getenv("AZURE_CONTAINER_SAS_URL")
 
-    upload_response = _upload_file(API_URL, headers=headers, data=data, files=files)
+        html_doc = build_resume_html(
+            name=name,
+            description=description,
+            objective=objective,
+            technical_skills=technical_skills,
+            experience=experience,
+            education=education,
+            certification=certification,
+            courses=courses,
+            languages=languages,
+            links=links,
+            max_concurrency=max_concurrency,
+            on_section_rewritten=on_section_rewritten,
+            on_section_delta=on_section_delta,
+        )
 
-    if azure_container_sas_url:
-        return _update_log(azure_container_sas_url, name, description, page_size, upload_response)
+        slug = slugify(name)
+        outputs = [
+            RenderOutput(name=f"{slug}-{size.lower()}.pdf", html_doc=html_doc, page_size=size)
+            for size in dict.fromkeys(page_sizes)
+        ]
 
-    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
-    with open(output_path, "wb") as f:
-        f.write(upload_response.content)
+        def sink(output: RenderOutput, chunks: Iterable[bytes]) -> str:
+            if azure_container_sas_url:
+                return _update_log(azure_container_sas_url, name, description, output.page_size, chunks)
+            path = _ensure_unique_local_path(os.path.join(output_dir, output.name))
+            _save_stream_to_file(chunks, path)
+            return path
 
-    return output_path
\ No newline at end of file
+        locations = render_resume_outputs(outputs, sink, renderer=renderer)
+        return {o.page_size: locations[o.name] for o in outputs}
@@ -0,0 +1,358 @@
+import os
+import json
+import uuid
+import queue
+import argparse
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from env import load_env_file
+from pdf_service import generate_resume_pdf
+from services.batch_service import MANIFEST_FIELDS
+from services.metadata_journal import resume_pending_metadata
+from services.metadata_service import find_resumes
+from services.resume_index import get_resume, load_resumes
+from services.telemetry import get_telemetry, span, trace
+from utils.identifiers import slugify
+
+load_env_file()
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 32
+MAX_TRACKED_JOBS = 1000
+MAX_BODY_BYTES = 1024 * 1024
+WAIT_TIMEOUT_SECONDS = 300
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    payload: dict
+    code: str | None = None
+    status: str = "queued"
+    result: dict | None = None
+    error: str | None = None
+    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    finished_at: str | None = None
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "code": self.code,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+class ResumeService:
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        output_dir: str = "./resumes",
+    ) -> None:
+        self.workers = workers
+        self.output_dir = output_dir
+        self._queue: queue.Queue[Job | None] = queue.Queue(maxsize=queue_size)
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"resume-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads.clear()
+
+    def submit(self, kind: str, payload: dict, code: str | None = None) -> Job | None:
+        job = Job(id=uuid.uuid4().hex, kind=kind, payload=payload, code=code)
+        # Tracked before it is queued, so a fast worker or an early poll always finds it.
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            self._evict_finished_jobs()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._jobs_lock:
+                self._jobs.pop(job.id, None)
+            return None
+        return job
+
+    def _evict_finished_jobs(self) -> None:
+        # Oldest finished jobs go first; queued and running ones stay pollable. Those are
+        # bounded by the queue size plus the workers. Callers hold self._jobs_lock.
+        excess = len(self._jobs) - MAX_TRACKED_JOBS
+        if excess <= 0:
+            return
+        finished = [job_id for job_id, job in self._jobs.items() if job.done.is_set()][:excess]
+        for job_id in finished:
+            del self._jobs[job_id]
+
+    def get_job(self, job_id: str) -> Job | None:
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.status = "running"
+            try:
+                with trace(job.id), span("job", kind=job.kind):
+                    job.result = self._create(job) if job.kind == "create" else self._update(job)
+                job.status = "succeeded"
+            except Exception as ex:
+                job.error = str(ex)
+                job.status = "failed"
+            finally:
+                job.finished_at = datetime.now(timezone.utc).isoformat()
+                job.done.set()
+
+    def _output_path(self, name: str, job: Job) -> str:
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        return os.path.join(self.output_dir, f"{slugify(name)}-{timestamp}-{job.id[:8]}.pdf")
+
+    def _create(self, job: Job) -> dict:
+        p = job.payload
+        location = generate_resume_pdf(
+            name=p["name"],
+            description=p.get("description", ""),
+            output_path=self._output_path(p["name"], job),
+            page_size=p.get("page_size") or "A4",
+            objective=p.get("objective"),
+            technical_skills=p.get("technical_skills"),
+            experience=p.get("experience"),
+            education=p.get("education"),
+            certification=p.get("certification"),
+            courses=p.get("courses"),
+            languages=p.get("languages"),
+            links=p.get("links"),
+        )
+        return {"location": location}
+
+    def _update(self, job: Job) -> dict:
+        current = get_resume(job.code)
+        if current is None:
+            raise LookupError(f"Resume {job.code} not found")
+
+        p = job.payload
+        name = p.get("name") or current.get("name") or ""
+        # Overwrites the stored PDF in place (same code, same blob) under its ETag.
+        location = generate_resume_pdf(
+            name=name,
+            description=p.get("description") or current.get("description") or "",
+            output_path=self._output_path(name, job),
+            page_size=p.get("page_size") or current.get("page_size") or "A4",
+            objective=p.get("objective"),
+            technical_skills=p.get("technical_skills"),
+            experience=p.get("experience"),
+            education=p.get("education"),
+            certification=p.get("certification"),
+            courses=p.get("courses"),
+            languages=p.get("languages"),
+            links=p.get("links"),
+            existing=current,
+        )
+        return {"code": job.code, "location": location}
+
+class ResumeRequestHandler(BaseHTTPRequestHandler):
+    server_version = "ResumeService/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self) -> ResumeService:
+        return self.server.resume_service
+
+    def log_message(self, format: str, *args) -> None:
+        if os.getenv("SERVICE_ACCESS_LOG", "").strip().lower() in ("1", "true", "yes"):
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload, headers: dict[str, str] | None = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status: int, body: str, content_type: str) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str, headers: dict[str, str] | None = None) -> None:
+        self._send_json(status, {"error": message}, headers)
+
+    def _read_json(self) -> dict | None:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            # The unread body would corrupt the next request on this connection.
+            self.close_connection = True
+            self._error(413, "Request body too large")
+            return None
+        raw = self.rfile.read(length) if length else b""
+        try:
+            payload = json.loads(raw or b"{}")
+        except json.JSONDecodeError as ex:
+            self._error(400, f"Invalid JSON: {ex}")
+            return None
+        if not isinstance(payload, dict):
+            self._error(400, "Request body must be a JSON object")
+            return None
+        return {
+            k: str(payload[k]).strip()
+            for k in MANIFEST_FIELDS
+            if payload.get(k) is not None and str(payload[k]).strip()
+        }
+
+    def _route(self) -> tuple[list[str], dict[str, list[str]]]:
+        parts = urlsplit(self.path)
+        segments = [unquote(s) for s in parts.path.strip("/").split("/") if s]
+        return segments, parse_qs(parts.query)
+
+    def _accepted(self, job: Job | None, query: dict[str, list[str]], done_status: int) -> None:
+        if job is None:
+            self._error(429, "Generation queue is full, retry later", {"Retry-After": "1"})
+            return
+        wait = query.get("wait", ["false"])[0].lower() in ("1", "true", "yes")
+        if wait and job.done.wait(WAIT_TIMEOUT_SECONDS):
+            status = done_status if job.status == "succeeded" else 500
+            self._send_json(status, job.to_dict())
+            return
+        self._send_json(202, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+    def do_GET(self) -> None:
+        segments, query = self._route()
+        try:
+            if segments == ["health"]:
+                self._send_json(200, {"status": "ok", "queue_depth": self.service.queue_depth()})
+            elif segments == ["metrics"]:
+                telemetry = get_telemetry()
+                if telemetry is None:
+                    self._error(404, "Telemetry is disabled; set TELEMETRY_ENABLED=1")
+                else:
+                    self._send_text(200, telemetry.render_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+            elif segments == ["resumes"]:
+                self._list_resumes(query)
+            elif len(segments) == 2 and segments[0] == "resumes":
+                resume = get_resume(segments[1])
+                if resume is None:
+                    self._error(404, "Resume not found")
+                else:
+                    self._send_json(200, resume)
+            elif len(segments) == 2 and segments[0] == "jobs":
+                job = self.service.get_job(segments[1])
+                if job is None:
+                    self._error(404, "Job not found")
+                else:
+                    self._send_json(200, job.to_dict())
+            else:
+                self._error(404, "Not found")
+        except Exception as ex:
+            self._error(502, str(ex))
+
+    def _list_resumes(self, query: dict[str, list[str]]) -> None:
+        name_prefix = query.get("name_prefix", [None])[0]
+        created_from = query.get("created_from", [None])[0]
+        created_to = query.get("created_to", [None])[0]
+        if name_prefix or created_from or created_to:
+            resumes = find_resumes(
+                name_slug_prefix=name_prefix,
+                created_from=created_from,
+                created_to=created_to,
+            )
+        else:
+            resumes = load_resumes()
+        self._send_json(200, {"value": resumes, "count": len(resumes)})
+
+    def do_POST(self) -> None:
+        segments, query = self._route()
+        if segments != ["resumes"]:
+            self._error(404, "Not found")
+            return
+        payload = self._read_json()
+        if payload is None:
+            return
+        if not payload.get("name"):
+            self._error(400, "Name is required.")
+            return
+        self._accepted(self.service.submit("create", payload), query, 201)
+
+    def do_PUT(self) -> None:
+        segments, query = self._route()
+        if len(segments) != 2 or segments[0] != "resumes":
+            self._error(404, "Not found")
+            return
+        payload = self._read_json()
+        if payload is None:
+            return
+        try:
+            exists = get_resume(segments[1]) is not None
+        except Exception as ex:
+            self._error(502, str(ex))
+            return
+        if not exists:
+            self._error(404, "Resume not found")
+            return
+        self._accepted(self.service.submit("update", payload, code=segments[1]), query, 200)
+
+def create_server(
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    workers: int = DEFAULT_WORKERS,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    output_dir: str = "./resumes",
+) -> ThreadingHTTPServer:
+    httpd = ThreadingHTTPServer((host, port), ResumeRequestHandler)
+    httpd.daemon_threads = True
+    httpd.resume_service = ResumeService(workers=workers, queue_size=queue_size, output_dir=output_dir)
+    httpd.resume_service.start()
+    resume_pending_metadata()
+    return httpd
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve resume generation over a local HTTP API.")
+    parser.add_argument("--host", default=os.getenv("SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVICE_PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVICE_WORKERS", DEFAULT_WORKERS)))
+    parser.add_argument("--queue-size", type=int, default=int(os.getenv("SERVICE_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)))
+    parser.add_argument("--output-dir", default="./resumes")
+    args = parser.parse_args()
+
+    httpd = create_server(args.host, args.port, args.workers, args.queue_size, args.output_dir)
+    print(f"Serving on http://{args.host}:{httpd.server_port} "
+          f"({args.workers} workers, queue size {args.queue_size})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        httpd.server_close()
+        httpd.resume_service.stop()
+
+if __name__ == "__main__":
+    main()
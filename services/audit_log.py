@@ -0,0 +1,417 @@
+import os
+import gzip
+import json
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from threading import Lock
+from typing import Iterable, Iterator
+from urllib.parse import quote
+
+import requests
+
+from services.http_client import get_session
+from services.telemetry import count, span
+
+DEFAULT_PREFIX = "audit"
+DEFAULT_SEGMENT_MB = 64
+# One Append Block call carries at most 4 MiB.
+MAX_RECORD_BYTES = 4 * 1024 * 1024
+MAX_ROTATIONS = 8
+SEAL_ATTEMPTS = 3
+READ_CHUNK_SIZE = 64 * 1024
+
+_BLOB_VERSION = "2019-12-12"
+
+def _split(container_sas_url: str) -> tuple[str, str]:
+    container_sas_url = container_sas_url.strip()
+    if "?" not in container_sas_url:
+        raise ValueError("AZURE_LOGS_CONTAINER_SAS_URL must include a SAS query string")
+    base_url, sas_query = container_sas_url.split("?", 1)
+    return base_url.rstrip("/"), sas_query
+
+def segment_name(prefix: str, day: str, seq: int) -> str:
+    return f"{prefix}/{day}/{seq:05d}.ndjson"
+
+def _parse_segment(prefix: str, name: str) -> tuple[str, int, bool] | None:
+    # "audit/2024-05-01/00003.ndjson[.gz]" -> ("2024-05-01", 3, gzipped)
+    if not name.startswith(f"{prefix}/"):
+        return None
+    parts = name[len(prefix) + 1:].split("/")
+    if len(parts) != 2:
+        return None
+    day, file_name = parts
+    gzipped = file_name.endswith(".ndjson.gz")
+    stem = file_name[:-len(".ndjson.gz")] if gzipped else file_name.removesuffix(".ndjson")
+    if stem == file_name or not stem.isdigit():
+        return None
+    return day, int(stem), gzipped
+
+def build_audit_record(entity: dict, op: str) -> dict:
+    # Retries of the same write share an id, so readers can drop the duplicates an
+    # ambiguous append failure may leave behind.
+    version = entity.get("UpdatedAt") or entity.get("CreatedAt") or ""
+    return {
+        "id": f"{entity.get('RowKey')}:{version}",
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "op": op,
+        "entity": entity,
+    }
+
+class AuditLogWriter:
+    def __init__(
+        self,
+        container_sas_url: str,
+        prefix: str = DEFAULT_PREFIX,
+        max_segment_bytes: int = DEFAULT_SEGMENT_MB * 1024 * 1024,
+        gzip_sealed: bool = False,
+        timeout: int = 30,
+    ) -> None:
+        self.base_url, self.sas_query = _split(container_sas_url)
+        self.prefix = prefix.strip("/")
+        self.max_segment_bytes = max_segment_bytes
+        self.gzip_sealed = gzip_sealed
+        self.timeout = timeout
+        self._current: dict[str, int] = {}
+        self._lock = Lock()
+        self._sealer: ThreadPoolExecutor | None = None
+
+    def _url(self, name: str, query: str = "") -> str:
+        return f"{self.base_url}/{quote(name)}?{query}{'&' if query else ''}{self.sas_query}"
+
+    def _current_seq(self, day: str) -> int:
+        with self._lock:
+            seq = self._current.get(day)
+        if seq is not None:
+            return seq
+
+        # First write for this day in this process: continue after whatever is already there.
+        seq = 0
+        for name, segment_seq, finished in self._list_segments(f"{self.prefix}/{day}/"):
+            seq = max(seq, segment_seq + 1 if finished else segment_seq)
+        with self._lock:
+            previous = self._current.get(day)
+            self._current[day] = max(seq, previous or 0)
+            # A new day seals the last segment of the previous one.
+            sealed_day = max((d for d in self._current if d < day), default=None)
+            sealed = None
+            if sealed_day is not None:
+                sealed = segment_name(self.prefix, sealed_day, self._current.pop(sealed_day))
+            seq = self._current[day]
+        if sealed:
+            self._schedule_seal(sealed)
+        return seq
+
+    def _list_segments(self, prefix: str) -> Iterator[tuple[str, int, bool]]:
+        from services.blob_gc import iter_blob_pages
+
+        for page in iter_blob_pages(f"{self.base_url}?{self.sas_query}", prefix=prefix):
+            for blob in page:
+                parsed = _parse_segment(self.prefix, blob.name)
+                if parsed:
+                    # A sealed or gzipped segment takes no more appends.
+                    yield blob.name, parsed[1], parsed[2] or blob.sealed
+
+    def _exists(self, name: str) -> bool:
+        resp = get_session().head(self._url(name), headers={"x-ms-version": _BLOB_VERSION}, timeout=self.timeout)
+        return resp.status_code == 200
+
+    def _rotate(self, day: str, full_seq: int, seal: bool = True) -> None:
+        with self._lock:
+            # Only the first thread to see the full segment moves on; the rest reuse its choice.
+            if self._current.get(day, full_seq) <= full_seq:
+                self._current[day] = full_seq + 1
+                rotated = True
+            else:
+                rotated = False
+        if rotated:
+            count("audit_segments_rotated_total")
+            if seal:
+                self._schedule_seal(segment_name(self.prefix, day, full_seq))
+
+    def _create(self, name: str) -> None:
+        headers = {
+            "x-ms-version": _BLOB_VERSION,
+            "x-ms-blob-type": "AppendBlob",
+            "x-ms-blob-content-type": "application/x-ndjson",
+            "If-None-Match": "*",
+        }
+        resp = get_session().put(self._url(name), headers=headers, data=b"", timeout=self.timeout)
+        # 409: another writer created it first, which is just as good.
+        if resp.status_code not in (201, 409):
+            _raise_for(resp, "Audit segment create failed")
+
+    def append(self, record: dict) -> str:
+        day, line = self._encode(record)
+        return self._append_block(day, line)
+
+    def append_many(self, records: list[dict]) -> list[str]:
+        # Bulk imports pack many records into each Append Block instead of one call apiece.
+        limit = min(MAX_RECORD_BYTES, self.max_segment_bytes)
+        blocks: dict[str, list[bytes]] = {}
+        names = []
+        for record in records:
+            day, line = self._encode(record)
+            pending = blocks.setdefault(day, [])
+            if pending and sum(map(len, pending)) + len(line) > limit:
+                names.append(self._append_block(day, b"".join(pending)))
+                pending.clear()
+            pending.append(line)
+        for day, pending in blocks.items():
+            if pending:
+                names.append(self._append_block(day, b"".join(pending)))
+        return names
+
+    def _encode(self, record: dict) -> tuple[str, bytes]:
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        if len(line) > MAX_RECORD_BYTES:
+            raise ValueError(f"Audit record of {len(line)} bytes exceeds the {MAX_RECORD_BYTES}-byte append limit")
+        return str(record.get("ts") or datetime.now(timezone.utc).isoformat())[:10], line
+
+    def _append_block(self, day: str, line: bytes) -> str:
+        with span("metadata.logs"):
+            listed = False
+            for _ in range(MAX_ROTATIONS):
+                with self._lock:
+                    listed = listed or day not in self._current
+                seq = self._current_seq(day)
+                name = segment_name(self.prefix, day, seq)
+                headers = {
+                    "x-ms-version": _BLOB_VERSION,
+                    # The service refuses appends that would push the segment past this size.
+                    "x-ms-blob-condition-maxsize": str(self.max_segment_bytes),
+                }
+                resp = get_session().put(self._url(name, "comp=appendblock"), headers=headers, data=line,
+                                         timeout=self.timeout)
+                if resp.status_code == 201:
+                    count("bytes_uploaded_total", len(line), target="logs")
+                    return name
+                if resp.status_code == 404:
+                    if not listed:
+                        # Another process may have sealed our cached segment; look again
+                        # rather than re-creating a name that already has a .gz copy.
+                        with self._lock:
+                            self._current.pop(day, None)
+                        continue
+                    if self._exists(f"{name}.gz"):
+                        # Sealed and compressed after our listing; never re-create its name.
+                        self._rotate(day, seq, seal=False)
+                        continue
+                    self._create(name)
+                    continue
+                # 412: the segment is full. 409: it was sealed or hit the 50,000-block limit.
+                if resp.status_code in (409, 412):
+                    self._rotate(day, seq)
+                    continue
+                _raise_for(resp, "Audit append failed")
+        raise RuntimeError(f"Audit append kept finding full segments under {self.prefix}/{day}/")
+
+    def _schedule_seal(self, name: str) -> None:
+        if not self.gzip_sealed:
+            return
+        with self._lock:
+            if self._sealer is None:
+                self._sealer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audit-seal")
+        self._sealer.submit(self._seal_quietly, name)
+
+    def _seal_quietly(self, name: str) -> None:
+        try:
+            seal_segment(f"{self.base_url}?{self.sas_query}", name, self.timeout)
+        except Exception as ex:
+            print(f"Warning: failed to compress audit segment {name}: {ex}")
+
+def _raise_for(resp: requests.Response, message: str) -> None:
+    try:
+        resp.raise_for_status()
+    except requests.HTTPError as ex:
+        raise requests.HTTPError(f"{message}: {ex}\nResponse text: {getattr(resp, 'text', '')}") from ex
+    raise requests.HTTPError(f"{message}: unexpected status {resp.status_code}", response=resp)
+
+def seal_segment(container_sas_url: str, name: str, timeout: int = 60) -> str | None:
+    # Replaces a finished segment with a gzipped copy. Sealing the append blob first makes
+    # late appends fail (and rotate) instead of racing the copy; a plain segment re-created
+    # after an earlier seal is folded into the existing .gz.
+    from services.metadata_service import _http_status, _put_blob_stream
+
+    base_url, sas_query = _split(container_sas_url)
+    url = f"{base_url}/{quote(name)}?{sas_query}"
+    gz_name = f"{name}.gz"
+    gz_url = f"{base_url}/{quote(gz_name)}?{sas_query}"
+    headers = {"x-ms-version": _BLOB_VERSION}
+    sealed = get_session().put(f"{base_url}/{quote(name)}?comp=seal&{sas_query}", headers=headers, timeout=timeout)
+    if sealed.status_code == 404:
+        return None
+    if sealed.status_code != 200:
+        _raise_for(sealed, "Audit segment seal failed")
+
+    for _ in range(SEAL_ATTEMPTS):
+        resp = get_session().get(url, headers=headers, timeout=timeout)
+        if resp.status_code == 404:
+            return None
+        if resp.status_code != 200:
+            _raise_for(resp, "Audit segment read failed")
+        etag = resp.headers.get("ETag")
+
+        prior = get_session().get(gz_url, headers=headers, timeout=timeout)
+        if prior.status_code == 200:
+            content = gzip.decompress(prior.content) + resp.content
+            gz_conditions = {"If-Match": prior.headers.get("ETag") or "*"}
+        elif prior.status_code == 404:
+            content = resp.content
+            gz_conditions = {"If-None-Match": "*"}
+        else:
+            _raise_for(prior, "Audit segment read failed")
+
+        with span("audit.seal"):
+            try:
+                _put_blob_stream(gz_url, [gzip.compress(content)], content_type="application/gzip",
+                                 timeout=timeout, conditions=gz_conditions)
+            except requests.HTTPError as ex:
+                if _http_status(ex) in (409, 412):
+                    # Another sealer got there first; start over from what is stored now.
+                    continue
+                raise
+            delete = get_session().delete(url, headers={**headers, "If-Match": etag or "*"}, timeout=timeout)
+        if delete.status_code in (202, 404):
+            return gz_name
+        _raise_for(delete, "Audit segment delete failed")
+    raise RuntimeError(f"Audit segment {name} kept changing while being sealed")
+
+def _date_range_prefix(prefix: str, start: date, end: date) -> str:
+    # One listing per month instead of one per day: list under the longest prefix the
+    # two ends share ("audit/2024-05-" for a range within May).
+    first, last = start.isoformat(), end.isoformat()
+    shared = os.path.commonprefix([first, last])
+    return f"{prefix}/{shared}"
+
+def list_segments(
+    container_sas_url: str,
+    start: date | None = None,
+    end: date | None = None,
+    prefix: str = DEFAULT_PREFIX,
+) -> list[tuple[str, str, int, bool]]:
+    from services.blob_gc import iter_blob_pages
+
+    prefix = prefix.strip("/")
+    first = start.isoformat() if start else ""
+    last = end.isoformat() if end else "9999-12-31"
+    listing_prefix = _date_range_prefix(prefix, start, end) if start and end else f"{prefix}/"
+    found = []
+    for page in iter_blob_pages(container_sas_url, prefix=listing_prefix):
+        for blob in page:
+            parsed = _parse_segment(prefix, blob.name)
+            if parsed and first <= parsed[0] <= last:
+                day, seq, gzipped = parsed
+                found.append((blob.name, day, seq, gzipped))
+    # While a segment is being sealed both copies can exist; the .gz sorts first and the
+    # reader's id dedupe drops the overlap.
+    return sorted(found, key=lambda s: (s[1], s[2], not s[3]))
+
+def _iter_lines(chunks: Iterable[bytes], gzipped: bool) -> Iterator[bytes]:
+    decompressor = zlib.decompressobj(wbits=31) if gzipped else None
+    pending = b""
+    for chunk in chunks:
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        yield from lines
+    if decompressor is not None:
+        pending += decompressor.flush()
+    if pending:
+        yield pending
+
+def iter_audit_records(
+    start: date,
+    end: date | None = None,
+    container_sas_url: str | None = None,
+    prefix: str | None = None,
+    dedupe: bool = True,
+) -> Iterator[dict]:
+    # One listing for the range plus one streamed GET per segment, oldest first.
+    container_sas_url = container_sas_url or os.getenv("AZURE_LOGS_CONTAINER_SAS_URL")
+    if not container_sas_url:
+        raise ValueError("AZURE_LOGS_CONTAINER_SAS_URL must be set to read the audit log")
+    prefix = (prefix or os.getenv("AUDIT_LOG_PREFIX") or DEFAULT_PREFIX).strip("/")
+    end = end or datetime.now(timezone.utc).date()
+    base_url, sas_query = _split(container_sas_url)
+
+    seen: set[str] = set()
+    segments = list_segments(container_sas_url, start, end, prefix)
+    listed = {name for name, _, _, _ in segments}
+    for name, _, _, gzipped in segments:
+        resp = get_session().get(f"{base_url}/{quote(name)}?{sas_query}", headers={"x-ms-version": _BLOB_VERSION},
+                                 timeout=60, stream=True)
+        if resp.status_code == 404:
+            resp.close()
+            if gzipped or f"{name}.gz" in listed:
+                continue
+            # Sealed into its .gz between the listing and now.
+            resp = get_session().get(f"{base_url}/{quote(name + '.gz')}?{sas_query}",
+                                     headers={"x-ms-version": _BLOB_VERSION}, timeout=60, stream=True)
+            gzipped = True
+        try:
+            if resp.status_code != 200:
+                _raise_for(resp, "Audit segment read failed")
+            for line in _iter_lines(resp.iter_content(READ_CHUNK_SIZE), gzipped):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                record_id = record.get("id")
+                if dedupe and record_id:
+                    if record_id in seen:
+                        continue
+                    seen.add(record_id)
+                yield record
+        finally:
+            resp.close()
+
+def compact_audit_log(
+    before: date | None = None,
+    container_sas_url: str | None = None,
+    prefix: str | None = None,
+) -> list[str]:
+    # Gzips every segment that can no longer receive appends: all of the days before
+    # `before` (default today) plus all but the newest segment of later days.
+    container_sas_url = container_sas_url or os.getenv("AZURE_LOGS_CONTAINER_SAS_URL")
+    if not container_sas_url:
+        raise ValueError("AZURE_LOGS_CONTAINER_SAS_URL must be set to compact the audit log")
+    prefix = (prefix or os.getenv("AUDIT_LOG_PREFIX") or DEFAULT_PREFIX).strip("/")
+    before = before or datetime.now(timezone.utc).date()
+
+    segments = list_segments(container_sas_url, prefix=prefix)
+    newest: dict[str, int] = {}
+    for _, day, seq, _ in segments:
+        newest[day] = max(newest.get(day, -1), seq)
+
+    sealed = []
+    for name, day, seq, gzipped in segments:
+        if gzipped or (day >= before.isoformat() and seq == newest[day]):
+            continue
+        gz_name = seal_segment(container_sas_url, name)
+        if gz_name:
+            sealed.append(gz_name)
+    return sealed
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes")
+
+_writer: AuditLogWriter | None = None
+_writer_lock = Lock()
+
+def get_audit_log() -> AuditLogWriter | None:
+    global _writer
+    container_sas_url = os.getenv("AZURE_LOGS_CONTAINER_SAS_URL")
+    if not container_sas_url:
+        return None
+    with _writer_lock:
+        base_url, sas_query = _split(container_sas_url)
+        if _writer is None or (_writer.base_url, _writer.sas_query) != (base_url, sas_query):
+            segment_mb = float(os.getenv("AUDIT_LOG_SEGMENT_MB", "").strip() or DEFAULT_SEGMENT_MB)
+            _writer = AuditLogWriter(
+                container_sas_url,
+                prefix=os.getenv("AUDIT_LOG_PREFIX") or DEFAULT_PREFIX,
+                max_segment_bytes=int(segment_mb * 1024 * 1024),
+                gzip_sealed=_env_flag("AUDIT_LOG_GZIP"),
+            )
+        return _writer
@@ -0,0 +1,356 @@
+import os
+import csv
+import json
+import time
+import uuid
+import shutil
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from threading import Condition, Lock
+
+from pdf_service import _ensure_unique_local_path, build_resume_html, get_renderer, render_resume_chunks
+from services.metadata_service import (
+    _iter_file_chunks,
+    _save_stream_to_file,
+    MetadataPersistError,
+    _upload_resume_blob,
+    build_resume_entity,
+    persist_entities_durably,
+    persist_entity_durably,
+)
+from services.metadata_journal import write_behind_enabled
+from services.table_batch import MAX_BATCH_ENTITIES
+from services.telemetry import span, trace
+from utils.identifiers import slugify
+
+MANIFEST_FIELDS = (
+    "name",
+    "description",
+    "page_size",
+    "objective",
+    "technical_skills",
+    "experience",
+    "education",
+    "certification",
+    "courses",
+    "languages",
+    "links",
+)
+
+STAGES = ("rewrite", "render", "upload", "persist")
+
+@dataclass
+class StageLimits:
+    rewrite: int = 4
+    render: int = 4
+    upload: int = 8
+    persist: int = 8
+
+@dataclass
+class BatchItem:
+    index: int
+    fields: dict[str, str]
+    html: str | None = None
+    pdf_path: str | None = None
+    code: str | None = None
+    location: str | None = None
+    blob_url: str | None = None
+    blob_etag: str | None = None
+    metadata: str | None = None
+    error: str | None = None
+    failed_stage: str | None = None
+    timings: dict[str, float] = field(default_factory=dict)
+
+    def to_result(self) -> dict:
+        return {
+            "index": self.index,
+            "name": self.fields.get("name"),
+            "status": "failed" if self.error else "ok",
+            "code": self.code,
+            "location": self.location,
+            "metadata": self.metadata,
+            "failed_stage": self.failed_stage,
+            "error": self.error,
+            "timings": {k: round(v, 4) for k, v in self.timings.items()},
+        }
+
+def load_manifest(path: str) -> list[dict[str, str]]:
+    ext = os.path.splitext(path)[1].lower()
+    rows: list[dict[str, str]] = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if ext == ".csv":
+            reader = csv.DictReader(f)
+            rows.extend(reader)
+        elif ext in (".jsonl", ".ndjson"):
+            for lineno, raw in enumerate(f, start=1):
+                line = raw.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as ex:
+                    raise ValueError(f"{path}:{lineno}: invalid JSON: {ex}") from ex
+                if not isinstance(row, dict):
+                    raise ValueError(f"{path}:{lineno}: each line must be a JSON object")
+                rows.append(row)
+        else:
+            raise ValueError("Manifest must be a .jsonl, .ndjson or .csv file")
+
+    items = []
+    for row in rows:
+        items.append({
+            key: str(row[key]).strip()
+            for key in MANIFEST_FIELDS
+            if row.get(key) is not None and str(row[key]).strip()
+        })
+    return items
+
+class ResumeBatchPipeline:
+    def __init__(
+        self,
+        results_path: str,
+        output_dir: str = "./resumes",
+        limits: StageLimits | None = None,
+        section_concurrency: int | None = None,
+        renderer: str | None = None,
+    ) -> None:
+        self.results_path = results_path
+        self.output_dir = output_dir
+        self.limits = limits or StageLimits()
+        self.section_concurrency = section_concurrency
+        self.renderer = renderer
+        self.container_sas_url = os.getenv("AZURE_CONTAINER_SAS_URL")
+
+        self._pools = {
+            stage: ThreadPoolExecutor(max_workers=getattr(self.limits, stage), thread_name_prefix=f"batch-{stage}")
+            for stage in STAGES
+        }
+        self._results_lock = Lock()
+        self._pending = 0
+        self._done = Condition()
+        # Items waiting for the persist stage; guarded by self._done together with _pending.
+        self._persist_buffer: list[BatchItem] = []
+        self.succeeded = 0
+        self.failed = 0
+
+    def run(self, manifest: list[dict[str, str]]) -> tuple[int, int]:
+        get_renderer(self.renderer).check_configured()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.results_path)), exist_ok=True)
+        self._spool_dir = tempfile.mkdtemp(prefix="resume-batch-")
+        self._run_id = uuid.uuid4().hex[:8]
+        try:
+            with open(self.results_path, "w", encoding="utf-8") as results:
+                self._results = results
+                with self._done:
+                    self._pending = len(manifest)
+                for index, fields in enumerate(manifest):
+                    self._submit("rewrite", BatchItem(index=index, fields=fields))
+                with self._done:
+                    self._done.wait_for(lambda: self._pending == 0)
+        finally:
+            for pool in self._pools.values():
+                pool.shutdown(wait=True)
+            shutil.rmtree(self._spool_dir, ignore_errors=True)
+        return self.succeeded, self.failed
+
+    def _submit(self, stage: str, item: BatchItem) -> None:
+        future = self._pools[stage].submit(self._run_stage, stage, item)
+        future.add_done_callback(lambda f: self._advance(stage, item, f))
+
+    def _run_stage(self, stage: str, item: BatchItem) -> None:
+        started = time.perf_counter()
+        try:
+            # One trace per manifest row, so its stages line up in the span log across workers.
+            with trace(f"{self._run_id}-{item.index:05d}"), span(f"batch.{stage}"):
+                getattr(self, f"_{stage}")(item)
+        finally:
+            item.timings[stage] = time.perf_counter() - started
+
+    def _advance(self, stage: str, item: BatchItem, future: Future) -> None:
+        # A done-callback: the executor only logs what escapes it, and run() would wait
+        # forever on an item that never reaches _finish.
+        try:
+            exc = future.exception()
+            if exc is not None:
+                item.error = str(exc)
+                item.failed_stage = stage
+                self._finish(item)
+                return
+
+            next_index = STAGES.index(stage) + 1
+            if next_index < len(STAGES) and not (stage == "upload" and not item.blob_url):
+                if STAGES[next_index] == "persist":
+                    self._queue_persist(item)
+                else:
+                    self._submit(STAGES[next_index], item)
+            else:
+                self._finish(item)
+        except Exception as ex:
+            # _finish and _dispatch_persist never raise, so the item hasn't been handed on.
+            item.error = str(ex)
+            item.failed_stage = stage
+            self._finish(item)
+
+    def _queue_persist(self, item: BatchItem) -> None:
+        with self._done:
+            self._persist_buffer.append(item)
+            batch = self._take_persist_batch()
+        self._dispatch_persist(batch)
+
+    def _dispatch_persist(self, batch: list[BatchItem]) -> None:
+        if not batch:
+            return
+        try:
+            self._pools["persist"].submit(self._persist_batch, batch)
+        except Exception as ex:
+            for item in batch:
+                item.error = str(ex)
+                item.failed_stage = "persist"
+                self._finish(item)
+
+    def _take_persist_batch(self) -> list[BatchItem]:
+        # Rows are written as table batches: send a full one, or whatever is waiting once
+        # every unfinished item is in the buffer and nothing upstream can add to it.
+        # Callers hold self._done.
+        buffered = len(self._persist_buffer)
+        if not buffered or (buffered < MAX_BATCH_ENTITIES and buffered < self._pending):
+            return []
+        batch = self._persist_buffer[:MAX_BATCH_ENTITIES]
+        del self._persist_buffer[:MAX_BATCH_ENTITIES]
+        return batch
+
+    def _finish(self, item: BatchItem) -> None:
+        # Never raises: every item must take _pending down exactly once or run() hangs.
+        try:
+            item.html = None
+            if item.pdf_path and os.path.exists(item.pdf_path):
+                os.remove(item.pdf_path)
+            item.pdf_path = None
+            line = json.dumps(item.to_result(), ensure_ascii=False, default=str)
+            with self._results_lock:
+                self._results.write(line + "\n")
+                self._results.flush()
+                if item.error:
+                    self.failed += 1
+                else:
+                    self.succeeded += 1
+        except Exception as ex:
+            print(f"Warning: failed to record batch item {item.index}: {ex}")
+            with self._results_lock:
+                self.failed += 1
+        finally:
+            with self._done:
+                self._pending -= 1
+                batch = self._take_persist_batch()
+                self._done.notify_all()
+        self._dispatch_persist(batch)
+
+    def _rewrite(self, item: BatchItem) -> None:
+        fields = item.fields
+        if not fields.get("name"):
+            raise ValueError("Name is required.")
+        item.html = build_resume_html(
+            name=fields["name"],
+            description=fields.get("description", ""),
+            objective=fields.get("objective"),
+            technical_skills=fields.get("technical_skills"),
+            experience=fields.get("experience"),
+            education=fields.get("education"),
+            certification=fields.get("certification"),
+            courses=fields.get("courses"),
+            languages=fields.get("languages"),
+            links=fields.get("links"),
+            max_concurrency=self.section_concurrency,
+        )
+
+    def _render(self, item: BatchItem) -> None:
+        # Spool the rendered PDF to disk so in-flight items don't each hold a whole PDF in memory.
+        chunks = render_resume_chunks(item.html, item.fields.get("page_size") or "A4", renderer=self.renderer)
+        path = os.path.join(self._spool_dir, f"{item.index:05d}.pdf")
+        _save_stream_to_file(chunks, path)
+        item.pdf_path = path
+        item.html = None
+
+    def _upload(self, item: BatchItem) -> None:
+        if self.container_sas_url:
+            item.code, item.blob_url, item.blob_etag = _upload_resume_blob(
+                self.container_sas_url, item.fields["name"], _iter_file_chunks(item.pdf_path)
+            )
+            item.location = item.blob_url
+        else:
+            path = os.path.join(self.output_dir, f"{slugify(item.fields['name'])}-{item.index:05d}.pdf")
+            path = _ensure_unique_local_path(path)
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            shutil.move(item.pdf_path, path)
+            item.pdf_path = None
+            item.location = path
+
+    def _entity(self, item: BatchItem) -> dict:
+        return build_resume_entity(
+            original_name=item.fields["name"],
+            code=item.code,
+            blob_url=item.blob_url,
+            page_size=item.fields.get("page_size") or "A4",
+            description=item.fields.get("description", ""),
+            blob_etag=item.blob_etag,
+        )
+
+    def _persist(self, item: BatchItem) -> None:
+        try:
+            item.metadata = "written" if persist_entity_durably(self._entity(item)) else "queued"
+        except MetadataPersistError:
+            item.metadata = "queued"
+            raise
+
+    def _persist_batch(self, items: list[BatchItem]) -> None:
+        started = time.perf_counter()
+        errors: dict[int, str] = {}
+        try:
+            with trace(f"{self._run_id}-persist"), span("batch.persist"):
+                if write_behind_enabled():
+                    # The journal is local disk; there is nothing to batch.
+                    for item in items:
+                        try:
+                            self._persist(item)
+                        except Exception as ex:
+                            errors[item.index] = str(ex)
+                else:
+                    entities = {item.index: self._entity(item) for item in items}
+                    failed = persist_entities_durably(list(entities.values()))
+                    for item in items:
+                        failure = failed.get(entities[item.index]["RowKey"])
+                        item.metadata = "queued" if failure else "written"
+                        if failure:
+                            errors[item.index] = str(failure)
+        except Exception as ex:
+            for item in items:
+                item.metadata = item.metadata or "failed"
+                errors.setdefault(item.index, str(ex))
+
+        elapsed = time.perf_counter() - started
+        for item in items:
+            item.timings["persist"] = elapsed
+            if item.index in errors:
+                item.error = errors[item.index]
+                item.failed_stage = "persist"
+            self._finish(item)
+
+def run_batch(
+    manifest_path: str,
+    results_path: str,
+    output_dir: str = "./resumes",
+    limits: StageLimits | None = None,
+    section_concurrency: int | None = None,
+    renderer: str | None = None,
+) -> tuple[int, int]:
+    manifest = load_manifest(manifest_path)
+    pipeline = ResumeBatchPipeline(
+        results_path=results_path,
+        output_dir=output_dir,
+        limits=limits,
+        section_concurrency=section_concurrency,
+        renderer=renderer,
+    )
+    return pipeline.run(manifest)
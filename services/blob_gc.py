@@ -0,0 +1,316 @@
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Iterator
+from urllib.parse import quote, unquote, urlparse
+from xml.etree import ElementTree
+
+import requests
+
+from services.http_client import get_session
+from services.telemetry import count, span
+
+LIST_PAGE_SIZE = 5000
+# Blob Batch accepts at most 256 subrequests per call.
+MAX_BLOB_BATCH = 256
+ENTITY_CHUNK_SIZE = 100
+DEFAULT_MIN_AGE_HOURS = 24.0
+DEFAULT_WORKERS = 8
+# Refuse to drop more than this share of the table, or of the container, in one run
+# unless forced: a wrong container URL makes every entity look stale, and a wrong or
+# empty table makes every blob look orphaned.
+MAX_STALE_FRACTION = 0.5
+
+_PART_STATUS = re.compile(r"^HTTP/1\.1 (\d{3})", re.MULTILINE)
+_PART_ID = re.compile(r"^Content-ID:\s*(\d+)", re.MULTILINE | re.IGNORECASE)
+_BATCH_UNSUPPORTED = {400, 403, 404, 405, 501}
+
+@dataclass
+class BlobInfo:
+    name: str
+    last_modified: datetime | None
+    size: int
+    sealed: bool = False
+
+@dataclass
+class GcReport:
+    dry_run: bool
+    entities_scanned: int = 0
+    blobs_scanned: int = 0
+    skipped_recent: int = 0
+    orphan_blobs: list[str] = field(default_factory=list)
+    stale_entities: list[str] = field(default_factory=list)
+    deleted_blobs: int = 0
+    deleted_entities: int = 0
+    failures: list[str] = field(default_factory=list)
+
+def _split_container_url(container_sas_url: str) -> tuple[str, str, str]:
+    container_sas_url = container_sas_url.strip()
+    if "?" not in container_sas_url:
+        raise ValueError("AZURE_CONTAINER_SAS_URL must include a SAS query string")
+    base_url, sas_query = container_sas_url.split("?", 1)
+    base_url = base_url.rstrip("/")
+    return base_url, sas_query, urlparse(base_url).path
+
+def _blob_name(blob_url: str | None, container_path: str) -> str | None:
+    # Only URLs inside the configured container count; anything else is left alone.
+    if not blob_url or not blob_url.startswith("http"):
+        return None
+    path = urlparse(blob_url).path
+    prefix = f"{container_path}/"
+    if not path.startswith(prefix):
+        return None
+    return unquote(path[len(prefix):]) or None
+
+def _parse_time(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def iter_blob_pages(
+    container_sas_url: str,
+    prefix: str | None = None,
+    page_size: int = LIST_PAGE_SIZE,
+) -> Iterator[list[BlobInfo]]:
+    base_url, sas_query, _ = _split_container_url(container_sas_url)
+    marker = None
+    while True:
+        url = f"{base_url}?restype=container&comp=list&maxresults={page_size}&{sas_query}"
+        if prefix:
+            url += f"&prefix={quote(prefix, safe='')}"
+        if marker:
+            url += f"&marker={quote(marker, safe='')}"
+
+        with span("gc.list_blobs"):
+            resp = get_session().get(url, headers={"x-ms-version": "2019-12-12"}, timeout=60)
+        try:
+            resp.raise_for_status()
+        except requests.HTTPError as ex:
+            msg = getattr(resp, "text", "")
+            raise requests.HTTPError(f"Blob listing failed: {ex}\nResponse text: {msg}") from ex
+
+        root = ElementTree.fromstring(resp.content)
+        page = []
+        for blob in root.iterfind("Blobs/Blob"):
+            props = blob.find("Properties")
+            page.append(BlobInfo(
+                name=blob.findtext("Name") or "",
+                last_modified=_parse_time(props.findtext("Last-Modified")) if props is not None else None,
+                size=int((props.findtext("Content-Length") if props is not None else None) or 0),
+                sealed=props is not None and (props.findtext("Sealed") or "").lower() == "true",
+            ))
+        yield page
+
+        marker = root.findtext("NextMarker")
+        if not marker:
+            break
+
+def _batch_statuses(resp: requests.Response, expected: int) -> list[int | None]:
+    statuses: list[int | None] = [None] * expected
+    match = re.search(r'boundary="?([^";]+)"?', resp.headers.get("Content-Type", ""))
+    if not match:
+        return statuses
+    parts = resp.text.split(f"--{match.group(1)}")
+    position = 0
+    for part in parts:
+        status = _PART_STATUS.search(part)
+        if not status:
+            continue
+        part_id = _PART_ID.search(part)
+        index = int(part_id.group(1)) if part_id else position
+        if 0 <= index < expected:
+            statuses[index] = int(status.group(1))
+        position += 1
+    return statuses
+
+def _delete_blob(blob_url: str, timeout: int) -> int:
+    resp = get_session().delete(blob_url, headers={"x-ms-version": "2019-12-12", "x-ms-delete-snapshots": "include"},
+                                timeout=timeout)
+    resp.close()
+    return resp.status_code
+
+def delete_blobs_batched(container_sas_url: str, names: list[str], timeout: int = 60) -> tuple[int, list[str]]:
+    if not names:
+        return 0, []
+    if len(names) > MAX_BLOB_BATCH:
+        raise ValueError(f"A blob batch holds at most {MAX_BLOB_BATCH} deletes")
+    base_url, sas_query, container_path = _split_container_url(container_sas_url)
+
+    boundary = f"batch_{uuid.uuid4()}"
+    parts = []
+    for i, name in enumerate(names):
+        parts.append(
+            f"--{boundary}\r\n"
+            "Content-Type: application/http\r\n"
+            "Content-Transfer-Encoding: binary\r\n"
+            f"Content-ID: {i}\r\n"
+            "\r\n"
+            f"DELETE {container_path}/{quote(name)}?{sas_query} HTTP/1.1\r\n"
+            "x-ms-delete-snapshots: include\r\n"
+            "Content-Length: 0\r\n"
+            "\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n")
+    headers = {
+        "Content-Type": f"multipart/mixed; boundary={boundary}",
+        # Container-scoped batches need 2020-04-08 or later.
+        "x-ms-version": "2020-04-08",
+    }
+
+    with span("gc.delete_blobs"):
+        resp = get_session().post(f"{base_url}?restype=container&comp=batch&{sas_query}", headers=headers,
+                                  data="".join(parts).encode("utf-8"), timeout=timeout)
+        if resp.status_code in _BATCH_UNSUPPORTED:
+            # Emulators and SAS tokens without batch rights reject the call outright; the
+            # same deletes still work one by one.
+            statuses = [_delete_blob(f"{base_url}/{quote(name)}?{sas_query}", timeout) for name in names]
+        elif resp.status_code != 202:
+            msg = getattr(resp, "text", "")
+            return 0, [f"{name}: blob batch rejected ({resp.status_code}): {msg[:200]}" for name in names]
+        else:
+            statuses = _batch_statuses(resp, len(names))
+
+    deleted = 0
+    failures = []
+    for name, status in zip(names, statuses):
+        # 404 means someone else already removed it, which is the outcome we wanted.
+        if status in (200, 202, 404):
+            deleted += 1
+        else:
+            failures.append(f"{name}: delete returned {status}")
+    count("gc_deleted_total", deleted, target="blob")
+    return deleted, failures
+
+def _delete_entities(codes: list[str]) -> tuple[int, list[str]]:
+    from services.resume_index import forget_resume
+    from services.table_batch import write_entities_batched
+
+    entities = [{"PartitionKey": "by-code", "RowKey": code} for code in codes]
+    with span("gc.delete_entities"):
+        written, failures = write_entities_batched(entities, mode="delete")
+    failed = {f.entity["RowKey"] for f in failures}
+    for code in codes:
+        if code not in failed:
+            forget_resume(code)
+    count("gc_deleted_total", written, target="entity")
+    return written, [f"entity {f.entity['RowKey']}: {f.error}" for f in failures]
+
+def _referenced_blobs(container_path: str, report: GcReport) -> dict[str, list[tuple[str, datetime | None]]]:
+    from services.metadata_journal import get_metadata_journal
+    from services.metadata_service import _iter_table_pages
+
+    referenced: dict[str, list[tuple[str, datetime | None]]] = {}
+    for page in _iter_table_pages(page_size=1000, select=("PartitionKey", "RowKey", "BlobUrl", "CreatedAt")):
+        for entity in page:
+            report.entities_scanned += 1
+            name = _blob_name(entity.get("BlobUrl"), container_path)
+            if name:
+                referenced.setdefault(name, []).append((entity["RowKey"], _parse_time(entity.get("CreatedAt"))))
+
+    # Blobs whose metadata is still queued in the write-behind journal are not orphans.
+    for entity in get_metadata_journal().pending_entities():
+        name = _blob_name(entity.get("BlobUrl"), container_path)
+        if name:
+            referenced.setdefault(name, [])
+    return referenced
+
+def collect_garbage(
+    dry_run: bool = True,
+    min_age_hours: float = DEFAULT_MIN_AGE_HOURS,
+    workers: int = DEFAULT_WORKERS,
+    force: bool = False,
+    container_sas_url: str | None = None,
+) -> GcReport:
+    container_sas_url = container_sas_url or os.getenv("AZURE_CONTAINER_SAS_URL")
+    if not container_sas_url:
+        raise ValueError("AZURE_CONTAINER_SAS_URL must be set to collect orphaned blobs")
+    if not os.getenv("AZURE_TABLE_SAS_URL") or not os.getenv("AZURE_TABLE_NAME"):
+        raise ValueError("AZURE_TABLE_SAS_URL and AZURE_TABLE_NAME must be set to collect orphaned blobs")
+    _, _, container_path = _split_container_url(container_sas_url)
+
+    report = GcReport(dry_run=dry_run)
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=min_age_hours)
+
+    def old_enough(when: datetime | None) -> bool:
+        # Unknown ages are treated as old; recent uploads may not have their entity yet.
+        return when is None or when <= cutoff
+
+    # Snapshot the table before listing blobs: an upload racing the listing then shows up
+    # as a young blob (skipped by age) rather than as an entity whose blob looks missing.
+    referenced = _referenced_blobs(container_path, report)
+    listed: set[str] = set()
+
+    # Nothing is deleted until both sides are fully listed and the guards have passed.
+    for page in iter_blob_pages(container_sas_url):
+        for blob in page:
+            report.blobs_scanned += 1
+            listed.add(blob.name)
+            if blob.name in referenced:
+                continue
+            if not old_enough(blob.last_modified):
+                report.skipped_recent += 1
+                continue
+            report.orphan_blobs.append(blob.name)
+
+    for name, owners in referenced.items():
+        if name in listed:
+            continue
+        for code, created_at in owners:
+            if old_enough(created_at):
+                report.stale_entities.append(code)
+            else:
+                report.skipped_recent += 1
+
+    if dry_run:
+        return report
+
+    delete_blobs = bool(report.orphan_blobs)
+    if delete_blobs and not force and len(report.orphan_blobs) > report.blobs_scanned * MAX_STALE_FRACTION:
+        delete_blobs = False
+        report.failures.append(
+            f"Refusing to delete {len(report.orphan_blobs)} of {report.blobs_scanned} blobs; "
+            "check the table settings or pass force=True"
+        )
+    delete_entities = bool(report.stale_entities)
+    if delete_entities and not force and len(report.stale_entities) > report.entities_scanned * MAX_STALE_FRACTION:
+        delete_entities = False
+        report.failures.append(
+            f"Refusing to delete {len(report.stale_entities)} of {report.entities_scanned} entities; "
+            "check the container URL or pass force=True"
+        )
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = []
+        if delete_blobs:
+            names = report.orphan_blobs
+            for i in range(0, len(names), MAX_BLOB_BATCH):
+                futures.append(executor.submit(delete_blobs_batched, container_sas_url, names[i:i + MAX_BLOB_BATCH]))
+        entity_futures = []
+        if delete_entities:
+            codes = report.stale_entities
+            for i in range(0, len(codes), ENTITY_CHUNK_SIZE):
+                entity_futures.append(executor.submit(_delete_entities, codes[i:i + ENTITY_CHUNK_SIZE]))
+
+        for future in as_completed(futures + entity_futures):
+            try:
+                deleted, failures = future.result()
+            except Exception as ex:
+                report.failures.append(f"{type(ex).__name__}: {ex}")
+                continue
+            if future in entity_futures:
+                report.deleted_entities += deleted
+            else:
+                report.deleted_blobs += deleted
+            report.failures.extend(failures)
+    return report
@@ -0,0 +1,169 @@
+import os
+from threading import Lock, local
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 16
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+# 429s are left to services.rate_limit, which paces the whole provider instead of one call.
+RETRY_STATUSES = (500, 502, 503, 504)
+# A 503 means the service turned the request away before applying it; after a read
+# timeout or another 5xx a POST or conditional write may already have landed.
+UNSAFE_RETRY_STATUSES = (503,)
+_CONDITIONAL_HEADERS = ("if-match", "if-none-match", "if-modified-since", "if-unmodified-since")
+
+class _ServiceRetry(Retry):
+    # urllib3 retries any 413/429 carrying Retry-After regardless of status_forcelist.
+    RETRY_AFTER_STATUS_CODES = frozenset({503})
+
+def _is_replay_safe(request: requests.PreparedRequest) -> bool:
+    # Re-sending is only harmless for idempotent methods without preconditions: a retried
+    # If-None-Match PUT that already landed comes back 409, a retried If-Match one 412.
+    if (request.method or "").upper() not in Retry.DEFAULT_ALLOWED_METHODS:
+        return False
+    return not any(
+        name.lower() in _CONDITIONAL_HEADERS or name.lower().startswith("x-ms-blob-condition-")
+        for name in request.headers
+    )
+
+class _PooledAdapter(HTTPAdapter):
+    def __init__(self, *args, unsafe_retries: Retry | None = None, **kwargs) -> None:
+        self._local = local()
+        super().__init__(*args, **kwargs)
+        self._unsafe_retries = unsafe_retries or Retry(0, read=False)
+        self._stats: dict[str, dict[str, int]] = {}
+        self._pools: dict[str, object] = {}
+        self._stats_lock = Lock()
+
+    # HTTPAdapter.send reads self.max_retries; serve the per-request policy chosen in send().
+    @property
+    def max_retries(self) -> Retry:
+        return getattr(self._local, "retries", None) or self._retries
+
+    @max_retries.setter
+    def max_retries(self, value: Retry) -> None:
+        self._retries = value
+
+    def send(self, request, *args, **kwargs):
+        self._local.retries = None if _is_replay_safe(request) else self._unsafe_retries
+        try:
+            return super().send(request, *args, **kwargs)
+        finally:
+            self._local.retries = None
+
+    def get_connection_with_tls_context(self, request, *args, **kwargs):
+        pool = super().get_connection_with_tls_context(request, *args, **kwargs)
+        host = urlsplit(request.url).netloc
+        with self._stats_lock:
+            entry = self._stats.setdefault(host, {"requests": 0, "attempts": 0, "connections": 0})
+            entry["requests"] += 1
+            self._pools[host] = pool
+        return pool
+
+    def _refresh(self) -> None:
+        # Pool counters are cumulative for the pool's lifetime; keep the highest value
+        # seen so a pool evicted from the pool manager does not reset the stats.
+        for host, pool in self._pools.items():
+            entry = self._stats[host]
+            entry["attempts"] = max(entry["attempts"], pool.num_requests)
+            entry["connections"] = max(entry["connections"], pool.num_connections)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        with self._stats_lock:
+            self._refresh()
+            snapshot = {host: dict(entry) for host, entry in self._stats.items()}
+        for entry in snapshot.values():
+            entry["retries"] = max(entry["attempts"] - entry["requests"], 0)
+            entry["reused"] = max(entry["attempts"] - entry["connections"], 0)
+        return snapshot
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name, "").strip()
+    return int(raw) if raw else default
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name, "").strip()
+    return float(raw) if raw else default
+
+def build_session(
+    pool_connections: int | None = None,
+    pool_maxsize: int | None = None,
+    max_retries: int | None = None,
+    backoff_factor: float | None = None,
+) -> requests.Session:
+    retries = max_retries if max_retries is not None else _env_int("HTTP_MAX_RETRIES", DEFAULT_MAX_RETRIES)
+    backoff_factor = (
+        backoff_factor if backoff_factor is not None
+        else _env_float("HTTP_BACKOFF_FACTOR", DEFAULT_BACKOFF_FACTOR)
+    )
+    # Idempotent requests retry after read errors and any transient 5xx.
+    retry = _ServiceRetry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    # POSTs, MERGEs and conditional writes only retry when they can't have been applied:
+    # the connection never went through, or the service answered 503.
+    unsafe_retry = _ServiceRetry(
+        total=retries,
+        connect=retries,
+        read=False,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=UNSAFE_RETRY_STATUSES,
+        allowed_methods=None,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = _PooledAdapter(
+        pool_connections=(
+            pool_connections if pool_connections is not None
+            else _env_int("HTTP_POOL_CONNECTIONS", DEFAULT_POOL_CONNECTIONS)
+        ),
+        pool_maxsize=pool_maxsize if pool_maxsize is not None else _env_int("HTTP_POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE),
+        max_retries=retry,
+        unsafe_retries=unsafe_retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+_session: requests.Session | None = None
+_session_lock = Lock()
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = build_session()
+        return _session
+
+def connection_stats() -> dict[str, dict[str, int]]:
+    with _session_lock:
+        session = _session
+    if session is None:
+        return {}
+
+    merged: dict[str, dict[str, int]] = {}
+    for adapter in {id(a): a for a in session.adapters.values()}.values():
+        if isinstance(adapter, _PooledAdapter):
+            merged.update(adapter.stats())
+    return merged
+
+def close_session() -> None:
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from threading import Lock
+
+from services.telemetry import count
+
+DEFAULT_CACHE_PATH = ".cache/openai-rewrites.sqlite3"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rewrites (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rewrites_accessed_at ON rewrites (accessed_at);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+"""
+
+def make_rewrite_key(
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    property: list[str] | str,
+    text: str,
+) -> str:
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    material = json.dumps(
+        [model, temperature, max_tokens, property, text_hash],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class RewriteCache:
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation keeps this safe across threads;
+        # WAL plus a busy timeout lets several processes share the same file.
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT value, created_at FROM rewrites WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.max_age_seconds:
+                conn.execute("DELETE FROM rewrites WHERE key = ?", (key,))
+                conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'evictions'")
+                row = None
+            if row is None:
+                conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'misses'")
+                conn.execute("COMMIT")
+                count("cache_lookups_total", cache="rewrite", result="miss")
+                return None
+            conn.execute("UPDATE rewrites SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'hits'")
+            conn.execute("COMMIT")
+            count("cache_lookups_total", cache="rewrite", result="hit")
+            return row[0]
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO rewrites (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        expired = conn.execute(
+            "DELETE FROM rewrites WHERE created_at < ?", (now - self.max_age_seconds,)
+        ).rowcount
+        evicted = max(expired, 0)
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM rewrites").fetchone()[0]
+        if total > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM rewrites ORDER BY accessed_at ASC").fetchall()
+            stale_keys = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                stale_keys.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM rewrites WHERE key = ?", stale_keys)
+            evicted += len(stale_keys)
+
+        if evicted:
+            conn.execute(
+                "UPDATE counters SET value = value + ? WHERE name = 'evictions'", (evicted,)
+            )
+
+    def stats(self) -> dict[str, int]:
+        conn = self._connect()
+        try:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM rewrites"
+            ).fetchone()
+        finally:
+            conn.close()
+        counters["entries"] = entries
+        counters["bytes"] = total
+        return counters
+
+    def clear(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM rewrites")
+            conn.execute("UPDATE counters SET value = 0")
+        finally:
+            conn.close()
+
+_cache: RewriteCache | None = None
+_cache_lock = Lock()
+
+def get_rewrite_cache() -> RewriteCache | None:
+    global _cache
+    if os.getenv("OPENAI_CACHE_DISABLED", "").strip().lower() in ("1", "true", "yes"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = RewriteCache(
+                path=os.getenv("OPENAI_CACHE_PATH", DEFAULT_CACHE_PATH),
+                max_bytes=int(os.getenv("OPENAI_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+                max_age_seconds=float(os.getenv("OPENAI_CACHE_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS)),
+            )
+        return _cache
@@ -0,0 +1,343 @@
+import re
+import zlib
+import unicodedata
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+
+# Page sizes in PDF points (1/72 in).
+PAGE_SIZES = {
+    "A4": (595.28, 841.89),
+    "Letter": (612.0, 792.0),
+}
+MARGIN = 24.0  # the stylesheet's 2rem body margin
+
+# Base-14 fonts need no embedding, so every viewer has them and the output stays small.
+_FONTS = {
+    "regular": ("F1", "Helvetica"),
+    "bold": ("F2", "Helvetica-Bold"),
+    "mono": ("F3", "Courier"),
+}
+
+# Advance widths (1/1000 em) for printable ASCII, from the standard Adobe AFM files.
+_HELVETICA_ASCII = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_HELVETICA_BOLD_ASCII = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+# The few non-ASCII WinAnsi glyphs render_section and the rewrites commonly produce.
+_EXTRA_WIDTHS = {
+    "regular": {"•": 350, "—": 1000, "–": 556, "·": 278, "‘": 222, "’": 222, "“": 333, "”": 333, "…": 1000},
+    "bold": {"•": 350, "—": 1000, "–": 556, "·": 278, "‘": 278, "’": 278, "“": 500, "”": 500, "…": 1000},
+}
+_WIDTHS = {
+    "regular": {chr(32 + i): w for i, w in enumerate(_HELVETICA_ASCII)},
+    "bold": {chr(32 + i): w for i, w in enumerate(_HELVETICA_BOLD_ASCII)},
+}
+for _style, _extra in _EXTRA_WIDTHS.items():
+    _WIDTHS[_style].update(_extra)
+
+def _char_width(ch: str, style: str) -> int:
+    if style == "mono":
+        return 600
+    widths = _WIDTHS[style]
+    width = widths.get(ch)
+    if width is None:
+        # Accented Latin letters share their base letter's advance.
+        base = unicodedata.normalize("NFKD", ch)[:1]
+        width = widths.get(base, 556)
+        widths[ch] = width
+    return width
+
+def text_width(text: str, style: str, size: float) -> float:
+    return sum(_char_width(ch, style) for ch in text) * size / 1000.0
+
+@dataclass(frozen=True)
+class TextStyle:
+    font: str = "regular"
+    size: float = 11.0
+    color: tuple[float, float, float] = (0.0, 0.0, 0.0)
+    leading: float = 1.3
+    space_before: float = 0.0
+    space_after: float = 0.0
+
+# Mirrors the stylesheet build_resume_html embeds, converted to points.
+STYLES = {
+    "h1": TextStyle(font="bold", size=24.0, leading=1.15, space_after=3.0),
+    "subtitle": TextStyle(size=12.0, color=(0.333, 0.333, 0.333), space_after=4.0),
+    "h2": TextStyle(font="bold", size=16.5, leading=1.2, space_before=18.0, space_after=6.0),
+    "h3": TextStyle(font="bold", size=13.0, leading=1.2, space_before=6.0, space_after=2.0),
+    "p": TextStyle(space_after=6.0),
+    "meta": TextStyle(size=10.5, color=(0.4, 0.4, 0.4), space_after=4.0),
+    "pre": TextStyle(font="mono", size=10.0, space_after=6.0),
+    "li": TextStyle(space_after=1.5),
+    "dt": TextStyle(font="bold", space_before=3.0),
+    "dd": TextStyle(space_after=4.5),
+}
+LIST_INDENT = 15.0  # ul { margin-left: 1.25rem }
+
+@dataclass
+class Block:
+    kind: str
+    text: str
+    indent: float = 0.0
+    bullet: bool = False
+
+@dataclass
+class _OpenBlock:
+    kind: str
+    indent: float
+    bullet: bool
+    parts: list[str] = field(default_factory=list)
+
+_BLOCK_TAGS = {"h1", "h2", "h3", "p", "pre", "li", "dt", "dd"}
+_SKIP_TAGS = {"head", "style", "script", "title"}
+_WHITESPACE = re.compile(r"\s+")
+
+class _ResumeHtmlParser(HTMLParser):
+    # Flattens the markup render_section emits into a list of styled text blocks.
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.blocks: list[Block] = []
+        self._stack: list[_OpenBlock] = []
+        self._skip = 0
+        self._list_depth = 0
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+            return
+        if tag == "ul":
+            self._list_depth += 1
+            return
+        if tag == "br" and self._stack:
+            self._stack[-1].parts.append("\n")
+            return
+        if tag not in _BLOCK_TAGS:
+            return
+
+        kind = tag
+        if tag == "p":
+            classes = (dict(attrs).get("class") or "").split()
+            kind = "subtitle" if "subtitle" in classes else "meta" if "meta" in classes else "p"
+        indent = LIST_INDENT * self._list_depth
+        if self._stack:
+            # A nested block (e.g. <dd><pre>) ends whatever text its parent had so far.
+            parent = self._stack[-1]
+            self._emit(parent)
+            parent.parts = []
+            indent = max(indent, parent.indent)
+        self._stack.append(_OpenBlock(kind=kind, indent=indent, bullet=tag == "li"))
+
+    def handle_endtag(self, tag) -> None:
+        if tag in _SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+            return
+        if tag == "ul":
+            self._list_depth = max(self._list_depth - 1, 0)
+            return
+        if tag not in _BLOCK_TAGS or not self._stack:
+            return
+        self._emit(self._stack.pop())
+
+    def handle_data(self, data) -> None:
+        if self._skip:
+            return
+        if self._stack:
+            self._stack[-1].parts.append(data)
+        elif data.strip():
+            # Loose text directly inside a <div>/<body>.
+            self.blocks.append(Block(kind="p", text=_WHITESPACE.sub(" ", data).strip()))
+
+    def _emit(self, block: _OpenBlock) -> None:
+        raw = "".join(block.parts)
+        if block.kind == "pre":
+            text = raw.strip("\n")
+        else:
+            text = _WHITESPACE.sub(" ", raw).strip()
+        if text or block.bullet:
+            self.blocks.append(Block(kind=block.kind, text=text, indent=block.indent, bullet=block.bullet))
+            block.bullet = False
+
+    def close(self) -> None:
+        super().close()
+        while self._stack:
+            self._emit(self._stack.pop())
+
+def parse_resume_html(html_doc: str) -> list[Block]:
+    parser = _ResumeHtmlParser()
+    parser.feed(html_doc)
+    parser.close()
+    return parser.blocks
+
+def _wrap_words(text: str, style: str, size: float, max_width: float) -> list[str]:
+    lines: list[str] = []
+    line: list[str] = []
+    line_width = 0.0
+    space = text_width(" ", style, size)
+    for word in text.split(" "):
+        word_width = text_width(word, style, size)
+        added = word_width + (space if line else 0.0)
+        if line_width + added <= max_width:
+            line.append(word)
+            line_width += added
+            continue
+        if line:
+            lines.append(" ".join(line))
+        # Break words (long URLs mostly) that don't fit on a line by themselves.
+        while word_width > max_width and len(word) > 1:
+            cut, cut_width = 1, text_width(word[0], style, size)
+            while cut < len(word):
+                next_width = cut_width + text_width(word[cut], style, size)
+                if next_width > max_width:
+                    break
+                cut, cut_width = cut + 1, next_width
+            lines.append(word[:cut])
+            word = word[cut:]
+            word_width -= cut_width
+        line, line_width = [word], word_width
+    lines.append(" ".join(line))
+    return lines
+
+def wrap_text(text: str, style: str, size: float, max_width: float) -> list[str]:
+    lines: list[str] = []
+    for paragraph in text.split("\n"):
+        lines.extend(_wrap_words(paragraph, style, size, max_width))
+    return lines
+
+def _pdf_string(text: str) -> bytes:
+    raw = text.encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+def _num(value: float) -> str:
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+class _PageWriter:
+    def __init__(self, width: float, height: float) -> None:
+        self.width = width
+        self.height = height
+        self.pages: list[list[bytes]] = []
+        self.y = 0.0
+        self._new_page()
+
+    def _new_page(self) -> None:
+        self.pages.append([])
+        self.y = self.height - MARGIN
+
+    def ensure(self, needed: float) -> None:
+        if self.y - needed < MARGIN and self.pages[-1]:
+            self._new_page()
+
+    def skip(self, amount: float) -> None:
+        # Vertical space at the top of a page is swallowed, like a browser's page break.
+        if self.pages[-1]:
+            self.y -= amount
+
+    def text(self, x: float, line: str, style: TextStyle, marker: str | None = None) -> None:
+        line_height = style.size * style.leading
+        self.ensure(line_height)
+        self.y -= line_height
+        font_name = _FONTS[style.font][0]
+        baseline = self.y + (line_height - style.size) / 2 + style.size * 0.22
+        r, g, b = style.color
+        prefix = f"BT /{font_name} {_num(style.size)} Tf {_num(r)} {_num(g)} {_num(b)} rg ".encode("ascii")
+        if marker:
+            prefix += f"{_num(x - 10.0)} {_num(baseline)} Td ".encode("ascii") + _pdf_string(marker) + b" Tj 10 0 Td "
+        else:
+            prefix += f"{_num(x)} {_num(baseline)} Td ".encode("ascii")
+        self.pages[-1].append(prefix + _pdf_string(line) + b" Tj ET")
+
+def normalize_page_size(page_size: str) -> str:
+    # Manifests and form posts spell sizes freely ("a4", "LETTER "); map them to the table's keys.
+    for name in PAGE_SIZES:
+        if name.lower() == str(page_size).strip().lower():
+            return name
+    raise ValueError(f"Unsupported page size '{page_size}'; expected one of {', '.join(PAGE_SIZES)}")
+
+def layout(blocks: list[Block], page_size: str) -> list[list[bytes]]:
+    width, height = PAGE_SIZES[normalize_page_size(page_size)]
+
+    writer = _PageWriter(width, height)
+    content_width = width - 2 * MARGIN
+    for block in blocks:
+        style = STYLES[block.kind]
+        x = MARGIN + block.indent
+        avail = content_width - block.indent
+        writer.skip(style.space_before)
+
+        lines = wrap_text(block.text, style.font, style.size, avail) if block.text else [""]
+        if block.kind in ("h2", "h3", "dt"):
+            # Keep a heading with at least the first line that follows it.
+            writer.ensure(style.size * style.leading * (len(lines) + 1))
+        for i, line in enumerate(lines):
+            writer.text(x, line, style, marker="•" if block.bullet and i == 0 else None)
+        writer.skip(style.space_after)
+    return writer.pages
+
+def _serialize(pages: list[list[bytes]], width: float, height: float) -> bytes:
+    objects: list[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(b"")
+    pages_id = add(b"")
+    font_refs = []
+    for font_name, base_font in _FONTS.values():
+        font_id = add(
+            f"<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} "
+            f"/Encoding /WinAnsiEncoding >>".encode("ascii")
+        )
+        font_refs.append(f"/{font_name} {font_id} 0 R")
+    resources = f"<< /Font << {' '.join(font_refs)} >> >>"
+
+    page_ids = []
+    for ops in pages:
+        stream = zlib.compress(b"\n".join(ops))
+        content_id = add(
+            f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode("ascii")
+            + stream
+            + b"\nendstream"
+        )
+        page_ids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {_num(width)} {_num(height)}] "
+            f"/Resources {resources} /Contents {content_id} 0 R >>".encode("ascii")
+        ))
+
+    objects[catalog_id - 1] = f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode("ascii")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("ascii")
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+
+    xref_offset = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("ascii")
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\n"
+        f"startxref\n{xref_offset}\n%%EOF\n"
+    ).encode("ascii")
+    return bytes(out)
+
+def render_html_to_pdf(html_doc: str, page_size: str = "A4") -> bytes:
+    page_size = normalize_page_size(page_size)
+    pages = layout(parse_resume_html(html_doc), page_size)
+    width, height = PAGE_SIZES[page_size]
+    return _serialize(pages, width, height)
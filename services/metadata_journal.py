@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import random
+import threading
+from datetime import datetime, timezone
+
+DEFAULT_JOURNAL_DIR = ".cache/metadata-journal"
+DEFAULT_RETRY_INTERVAL = 2.0
+MAX_RETRY_INTERVAL = 300.0
+EXIT_FLUSH_TIMEOUT = 10.0
+
+# Statuses that mean an earlier attempt already landed: the table insert found its own
+# row from a previous try. Audit appends are retried as-is; readers drop repeats by id.
+_ALREADY_WRITTEN = {"table": {409}}
+
+def write_behind_enabled() -> bool:
+    return os.getenv("METADATA_WRITE_BEHIND", "").strip().lower() in ("1", "true", "yes")
+
+def _fsync_directory(directory: str) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class MetadataJournal:
+    def __init__(self, directory: str = DEFAULT_JOURNAL_DIR, retry_interval: float = DEFAULT_RETRY_INTERVAL) -> None:
+        self.directory = directory
+        self.retry_interval = retry_interval
+        os.makedirs(directory, exist_ok=True)
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._stop = threading.Event()
+        self._drain_lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+        self._worker_lock = threading.Lock()
+
+    def _record_path(self, code: str) -> str:
+        return os.path.join(self.directory, f"{code}.json")
+
+    def _write_record(self, path: str, record: dict) -> None:
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_directory(self.directory)
+
+    def append(self, entity: dict, completed: set[str] | frozenset[str] = frozenset(), merge: bool = False) -> str:
+        record = {
+            "entity": entity,
+            "mode": "merge" if merge else "insert",
+            "completed": sorted(completed),
+            "attempts": 0,
+            "enqueued_at": datetime.now(timezone.utc).isoformat(),
+            "last_error": None,
+        }
+        path = self._record_path(entity["RowKey"])
+        self._write_record(path, record)
+        self.start()
+        return path
+
+    def pending(self) -> list[str]:
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".json")
+        )
+
+    def pending_entities(self) -> list[dict]:
+        entities = []
+        for path in self.pending():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entities.append(json.load(f)["entity"])
+            except (FileNotFoundError, ValueError, KeyError):
+                continue
+        return entities
+
+    def drain_once(self) -> int:
+        from services.metadata_service import MetadataPersistError, _http_status, _write_entity
+
+        remaining = 0
+        with self._drain_lock:
+            for path in self.pending():
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        record = json.load(f)
+                except FileNotFoundError:
+                    # Another process flushed it first.
+                    continue
+
+                completed = set(record.get("completed") or [])
+                try:
+                    _write_entity(record["entity"], skip=completed, merge=record.get("mode") == "merge")
+                except MetadataPersistError as ex:
+                    completed = set(ex.completed)
+                    unresolved = {}
+                    for target, err in ex.errors.items():
+                        if _http_status(err) in _ALREADY_WRITTEN.get(target, ()):
+                            completed.add(target)
+                        else:
+                            unresolved[target] = err
+                    if unresolved:
+                        record["completed"] = sorted(completed)
+                        record["attempts"] = record.get("attempts", 0) + 1
+                        record["last_error"] = "; ".join(f"{t}: {e}" for t, e in unresolved.items())
+                        self._write_record(path, record)
+                        remaining += 1
+                        continue
+
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return remaining
+
+    def start(self) -> None:
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stop.clear()
+                self._worker = threading.Thread(target=self._run, name="metadata-journal", daemon=True)
+                self._worker.start()
+        self._idle.clear()
+        self._wake.set()
+
+    def _run(self) -> None:
+        failures = 0
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                remaining = self.drain_once()
+            except Exception as ex:
+                print(f"Warning: metadata journal flush failed: {ex}")
+                remaining = len(self.pending())
+
+            if not remaining:
+                failures = 0
+                self._idle.set()
+                self._wake.wait()
+                continue
+
+            failures += 1
+            delay = min(self.retry_interval * (2 ** (failures - 1)), MAX_RETRY_INTERVAL)
+            self._wake.wait(delay * random.uniform(0.5, 1.0))
+
+    def flush(self, timeout: float | None = None) -> bool:
+        if not self.pending():
+            return True
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending():
+            wait_for = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if wait_for == 0:
+                return False
+            self._idle.wait(min(wait_for or 0.5, 0.5))
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+_journal: MetadataJournal | None = None
+_journal_lock = threading.Lock()
+
+def get_metadata_journal() -> MetadataJournal:
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = MetadataJournal(os.getenv("METADATA_JOURNAL_DIR", DEFAULT_JOURNAL_DIR))
+            atexit.register(_flush_on_exit, _journal)
+        return _journal
+
+def _flush_on_exit(journal: MetadataJournal) -> None:
+    if journal.pending() and not journal.flush(EXIT_FLUSH_TIMEOUT):
+        print(f"Warning: {len(journal.pending())} metadata record(s) still pending in {journal.directory}; "
+              "they will be retried on the next run.")
+
+def resume_pending_metadata() -> int:
+    journal = get_metadata_journal()
+    pending = len(journal.pending())
+    if pending:
+        journal.start()
+    return pending
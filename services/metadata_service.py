@@ -1,41 +1,144 @@
 import os
 import json
+import uuid
+import contextvars
 from html import escape
 
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Iterable, Iterator
 from datetime import datetime, timezone
+from services.audit_log import build_audit_record, get_audit_log
+from services.http_client import get_session
+from services.llm_cache import get_rewrite_cache, make_rewrite_key
+from services.rate_limit import get_rate_limiter, send_with_rate_limit
+from services.telemetry import count, span
 from utils.identifiers import slugify
+from utils.text_chunks import estimate_tokens, split_text
 
-def persist_resume_metadata(
+STREAM_CHUNK_SIZE = 64 * 1024
+DEFAULT_BLOB_BLOCK_SIZE = 4 * 1024 * 1024
+OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
+OPENAI_MODEL = "gpt-4o-mini"
+OPENAI_TEMPERATURE = 0.3
+OPENAI_MAX_TOKENS = 600
+# A chunk rewrite that comes back under this share of its input's tokens is treated as lossy.
+MIN_CHUNK_OUTPUT_RATIO = 0.5
+
+def build_resume_entity(
     original_name: str,
     code: str,
     blob_url: str,
     page_size: str,
     description: str,
-) -> None:
-    created_at = datetime.now(timezone.utc).isoformat()
-    name_slug = slugify(original_name)
-
+    created_at: str | None = None,
+    blob_etag: str | None = None,
+) -> dict:
     entity = {
         "PartitionKey": "by-code",
         "RowKey": code,
         "OriginalName": original_name,
-        "NameSlug": name_slug,
+        "NameSlug": slugify(original_name),
         "Code": code,
         "BlobUrl": blob_url,
         "PageSize": page_size,
-        "CreatedAt": created_at,
+        "CreatedAt": created_at or datetime.now(timezone.utc).isoformat(),
         "Description": description,
     }
+    if blob_etag:
+        # Lets an in-place update overwrite the PDF only if nobody replaced it meanwhile.
+        entity["BlobETag"] = blob_etag
+    return entity
+
+class MetadataPersistError(RuntimeError):
+    def __init__(self, entity: dict, completed: set[str], errors: dict[str, Exception]) -> None:
+        detail = "; ".join(f"{target}: {ex}" for target, ex in errors.items())
+        super().__init__(f"Failed to persist metadata for {entity.get('RowKey')}: {detail}")
+        self.entity = entity
+        self.completed = completed
+        self.errors = errors
+
+class ResumeConflictError(RuntimeError):
+    pass
+
+_metadata_executor: ThreadPoolExecutor | None = None
+_metadata_executor_lock = Lock()
 
+def _get_metadata_executor() -> ThreadPoolExecutor:
+    global _metadata_executor
+    with _metadata_executor_lock:
+        if _metadata_executor is None:
+            _metadata_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="metadata")
+        return _metadata_executor
+
+_chunk_executor: ThreadPoolExecutor | None = None
+_chunk_executor_lock = Lock()
+
+def _get_chunk_executor() -> ThreadPoolExecutor:
+    # One pool for every chunked rewrite in the process. Sections are already rewritten on
+    # OPENAI_MAX_CONCURRENCY threads; a pool per section would multiply that bound.
+    global _chunk_executor
+    with _chunk_executor_lock:
+        if _chunk_executor is None:
+            workers = int(os.getenv("OPENAI_MAX_CONCURRENCY", "").strip() or 4)
+            _chunk_executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="rewrite-chunk")
+        return _chunk_executor
+
+def _http_status(ex: BaseException) -> int | None:
+    for candidate in (ex, ex.__cause__):
+        response = getattr(candidate, "response", None)
+        if response is not None:
+            return response.status_code
+    return None
+
+def _write_entity(entity: dict, skip: set[str] | frozenset[str] = frozenset(), merge: bool = False) -> None:
+    writers = {}
     table_sas_url = os.getenv("AZURE_TABLE_SAS_URL")
     table_name = os.getenv("AZURE_TABLE_NAME")
-    if table_sas_url and table_name:
-        _insert_table_entity(table_sas_url.strip(), table_name.strip(), entity)
+    if table_sas_url and table_name and "table" not in skip:
+        if merge:
+            writers["table"] = lambda: _merge_table_entity(entity)
+        else:
+            writers["table"] = lambda: _insert_table_entity(table_sas_url.strip(), table_name.strip(), entity)
 
     logs_container_sas_url = os.getenv("AZURE_LOGS_CONTAINER_SAS_URL")
-    if logs_container_sas_url:
-        _upload_metadata_json_to_logs(logs_container_sas_url.strip(), code, entity)
+    if logs_container_sas_url and "logs" not in skip:
+        writers["logs"] = lambda: _append_audit_record(entity, "merge" if merge else "insert")
+
+    with span("metadata.write"):
+        errors = _run_writers(writers)
+
+    if errors:
+        completed = set(skip) | {target for target in writers if target not in errors}
+        raise MetadataPersistError(entity, completed, errors)
+
+def _run_writers(writers: dict) -> dict[str, Exception]:
+    # The table row and the log blob don't depend on each other, so write them side by side.
+    if len(writers) > 1:
+        futures = {
+            target: _get_metadata_executor().submit(contextvars.copy_context().run, fn)
+            for target, fn in writers.items()
+        }
+        errors = {target: f.exception() for target, f in futures.items() if f.exception() is not None}
+    else:
+        errors = {}
+        for target, fn in writers.items():
+            try:
+                fn()
+            except Exception as ex:
+                errors[target] = ex
+    return errors
+
+def persist_resume_metadata(
+    original_name: str,
+    code: str,
+    blob_url: str,
+    page_size: str,
+    description: str,
+) -> None:
+    entity = build_resume_entity(original_name, code, blob_url, page_size, description)
+    _write_entity(entity)
 
 def _insert_table_entity(table_account_sas_url: str, table_name: str, entity: dict) -> None:
     if "?" not in table_account_sas_url:
@@ -73,55 +176,191 @@ def _insert_table_entity(table_account_sas_url: str, table_name: str, entity: di
         "x-ms-version": "2019-02-02",
     }
 
-    import requests, json
-    resp = requests.post(url, headers=headers, data=json.dumps(entity), timeout=30)
+    body = json.dumps(entity)
+    with span("metadata.table"):
+        resp = get_session().post(url, headers=headers, data=body, timeout=30)
+    count("bytes_uploaded_total", len(body), target="table")
     try:
         resp.raise_for_status()
     except requests.HTTPError as ex:
         raise requests.HTTPError(f"Table insert failed: {ex}\nResponse text: {getattr(resp, 'text', '')}") from ex
 
-def _upload_metadata_json_to_logs(logs_container_sas_url: str, code: str, entity: dict) -> None:
-    if "?" not in logs_container_sas_url:
-        raise ValueError("AZURE_LOGS_CONTAINER_SAS_URL must include a SAS query string")
+def _merge_table_entity(entity: dict) -> None:
+    # MERGE without If-Match is Insert Or Merge, so a journaled retry still lands if the
+    # original insert never did.
+    query_url = _resolve_table_query_url()
+    if query_url is None:
+        raise ValueError("AZURE_TABLE_SAS_URL and AZURE_TABLE_NAME must be set to update an entity")
 
-    base_url, sas_query = logs_container_sas_url.split("?", 1)
-    blob_name = f"{code}.json"
-    url = f"{base_url.rstrip('/')}/{blob_name}?{sas_query}"
+    from urllib.parse import quote
 
+    table_url, sas_query = query_url.split("?", 1)
+    key = (
+        f"(PartitionKey={quote(_odata_quote(entity['PartitionKey']), safe='')},"
+        f"RowKey={quote(_odata_quote(entity['RowKey']), safe='')})"
+    )
     headers = {
-        "x-ms-blob-type": "BlockBlob",
-        "Content-Type": "application/json; charset=utf-8",
-        "If-None-Match": "*",
+        **_TABLE_QUERY_HEADERS,
+        "Content-Type": "application/json;odata=nometadata",
     }
-    body = json.dumps(entity, ensure_ascii=False).encode("utf-8")
-    resp = requests.put(url, headers=headers, data=body, timeout=30)
-    resp.raise_for_status()
+    body = json.dumps(entity)
+    with span("metadata.table", op="merge"):
+        resp = get_session().request("MERGE", f"{table_url}{key}?{sas_query}", headers=headers, data=body, timeout=30)
+    count("bytes_uploaded_total", len(body), target="table")
+    try:
+        resp.raise_for_status()
+    except requests.HTTPError as ex:
+        raise requests.HTTPError(f"Table merge failed: {ex}\nResponse text: {getattr(resp, 'text', '')}") from ex
+
+def _append_audit_record(entity: dict, op: str) -> None:
+    # One NDJSON line in the day's append-blob segment rather than a blob per resume.
+    get_audit_log().append(build_audit_record(entity, op))
 
 def _upload_file(
         api_url: str,
         headers: dict[str, str],
         data: dict[str, str] | None = None,
         files: dict[str, object] | None = None,
-        timeout: int = 30
+        timeout: int = 30,
+        stream: bool = False,
+        rate_limiter: str | None = None,
 ) -> requests.Response:
-    resp = requests.post(api_url, headers=headers, data=data, files=files, timeout=timeout)
+    def send() -> requests.Response:
+        return get_session().post(api_url, headers=headers, data=data, files=files, timeout=timeout, stream=stream)
+
+    resp = send_with_rate_limit(get_rate_limiter(rate_limiter), send) if rate_limiter else send()
 
     try:
         resp.raise_for_status()
     except requests.HTTPError as ex:
         msg = getattr(resp, "text", "")
+        resp.close()
         raise requests.HTTPError(f"PDF generation failed: {ex}\nResponse text: {msg}") from ex
 
     return resp
 
-def _update_log(
+def _iter_pdf_chunks(source: requests.Response | bytes | Iterable[bytes]) -> Iterator[bytes]:
+    if isinstance(source, requests.Response):
+        try:
+            yield from source.iter_content(STREAM_CHUNK_SIZE)
+        finally:
+            source.close()
+    elif isinstance(source, (bytes, bytearray)):
+        for start in range(0, len(source), STREAM_CHUNK_SIZE):
+            yield bytes(source[start:start + STREAM_CHUNK_SIZE])
+    else:
+        yield from source
+
+def _iter_file_chunks(path: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+def _save_stream_to_file(source: requests.Response | bytes | Iterable[bytes], output_path: str) -> int:
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    written = 0
+    tmp_path = f"{output_path}.part"
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in _iter_pdf_chunks(source):
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    count("bytes_written_total", written, target="file")
+    return written
+
+def _blob_block_size() -> int:
+    raw = os.getenv("AZURE_BLOB_BLOCK_SIZE", "").strip()
+    return int(raw) if raw else DEFAULT_BLOB_BLOCK_SIZE
+
+def _put_blob_block(blob_url: str, upload_id: str, index: int, data: bytes, timeout: int) -> str:
+    import base64
+    from urllib.parse import quote
+
+    # Block IDs must all have the same length within a blob. The per-upload prefix keeps two
+    # concurrent uploads of one blob from staging, and then committing, each other's blocks.
+    block_id = base64.b64encode(f"{upload_id}-{index:08d}".encode("ascii")).decode("ascii")
+    url = f"{blob_url}&comp=block&blockid={quote(block_id, safe='')}"
+    resp = get_session().put(url, headers={"x-ms-version": "2019-12-12"}, data=data, timeout=timeout)
+    try:
+        resp.raise_for_status()
+    except requests.HTTPError as ex:
+        msg = getattr(resp, "text", "")
+        raise requests.HTTPError(f"Azure block upload failed: {ex}\nResponse text: {msg}") from ex
+    return block_id
+
+def _put_blob_stream(
+        blob_url: str,
+        chunks: Iterable[bytes],
+        content_type: str = "application/pdf",
+        timeout: int = 30,
+        block_size: int | None = None,
+        conditions: dict[str, str] | None = None,
+) -> tuple[int, str | None]:
+    # New blobs must not clobber an existing name; overwrites pass If-Match instead.
+    conditions = conditions if conditions is not None else {"If-None-Match": "*"}
+    block_size = block_size or _blob_block_size()
+    buffer = bytearray()
+    block_ids: list[str] = []
+    upload_id = uuid.uuid4().hex
+    total = 0
+
+    for chunk in chunks:
+        buffer += chunk
+        total += len(chunk)
+        while len(buffer) >= block_size:
+            block_ids.append(_put_blob_block(blob_url, upload_id, len(block_ids), bytes(buffer[:block_size]), timeout))
+            del buffer[:block_size]
+
+    if not block_ids:
+        # Small enough for a single Put Blob; no need for the block protocol.
+        put_headers = {
+            "x-ms-blob-type": "BlockBlob",
+            "Content-Type": content_type,
+            **conditions,
+        }
+        put_resp = get_session().put(blob_url, headers=put_headers, data=bytes(buffer), timeout=timeout)
+        try:
+            put_resp.raise_for_status()
+        except requests.HTTPError as ex:
+            msg = getattr(put_resp, "text", "")
+            raise requests.HTTPError(f"Azure blob upload failed: {ex}\nResponse text: {msg}") from ex
+        return total, put_resp.headers.get("ETag")
+
+    if buffer:
+        block_ids.append(_put_blob_block(blob_url, upload_id, len(block_ids), bytes(buffer), timeout))
+
+    body = "".join(f"<Latest>{block_id}</Latest>" for block_id in block_ids)
+    block_list = f'<?xml version="1.0" encoding="utf-8"?><BlockList>{body}</BlockList>'
+    list_headers = {
+        "x-ms-version": "2019-12-12",
+        "x-ms-blob-content-type": content_type,
+        "Content-Type": "application/xml",
+        **conditions,
+    }
+    list_resp = get_session().put(
+        f"{blob_url}&comp=blocklist", headers=list_headers, data=block_list.encode("utf-8"), timeout=timeout
+    )
+    try:
+        list_resp.raise_for_status()
+    except requests.HTTPError as ex:
+        msg = getattr(list_resp, "text", "")
+        raise requests.HTTPError(f"Azure block list commit failed: {ex}\nResponse text: {msg}") from ex
+    return total, list_resp.headers.get("ETag")
+
+def _upload_resume_blob(
         api_url: str,
         name: str,
-        description: str,
-        page_size: str,
-        upload: requests.Response,
+        content: requests.Response | bytes | Iterable[bytes],
         timeout: int = 30
-) -> str | None:
+) -> tuple[str, str, str | None]:
     from utils.identifiers import slugify, generate_resume_code
     container_url = api_url.strip()
 
@@ -136,43 +375,179 @@ def _update_log(
 
     blob_url = f"{base_url.rstrip('/')}/{blob_name}?{sas_query}"
 
-    put_headers = {
-        "x-ms-blob-type": "BlockBlob",
-        "Content-Type": "application/pdf",
-        "If-None-Match": "*",
-    }
-    put_resp = requests.put(blob_url, headers=put_headers, data=upload.content, timeout=timeout)
+    # A streamed render is still being downloaded while it uploads, so this span includes that.
+    with span("upload.blob"):
+        uploaded, etag = _put_blob_stream(blob_url, _iter_pdf_chunks(content), timeout=timeout)
+    count("bytes_uploaded_total", uploaded, target="blob")
+
+    return code, blob_url, etag
+
+def _update_log(
+        api_url: str,
+        name: str,
+        description: str,
+        page_size: str,
+        upload: requests.Response | bytes | Iterable[bytes],
+        timeout: int = 30
+) -> str | None:
+    code, blob_url, etag = _upload_resume_blob(api_url, name, upload, timeout=timeout)
+    entity = build_resume_entity(name, code, blob_url, page_size, description, blob_etag=etag)
+
+    try:
+        persist_entity_durably(entity)
+    except MetadataPersistError as meta_ex:
+        print(f"Warning: failed to persist metadata, queued for retry: {meta_ex}")
+
+    return blob_url
+
+def _current_blob_etag(code: str, blob_url: str, timeout: int) -> str:
+    # Rows written before BlobETag was stored: the blob's ETag now still catches writers
+    # that overwrite it while this render runs.
+    resp = get_session().head(blob_url, headers={"x-ms-version": "2019-12-12"}, timeout=timeout)
+    if resp.status_code == 404:
+        raise ResumeConflictError(f"Resume {code} was removed since it was loaded; refresh the list and try again")
     try:
-        put_resp.raise_for_status()
+        resp.raise_for_status()
     except requests.HTTPError as ex:
-        msg = getattr(put_resp, "text", "")
-        raise requests.HTTPError(f"Azure blob upload failed: {ex}\nResponse text: {msg}") from ex
+        raise requests.HTTPError(f"Azure blob lookup failed: {ex}") from ex
+    etag = resp.headers.get("ETag")
+    if not etag:
+        raise RuntimeError(f"Azure returned no ETag for the blob of resume {code}")
+    return etag
 
+def _overwrite_resume(
+        api_url: str,
+        existing: dict,
+        name: str,
+        description: str,
+        page_size: str,
+        upload: requests.Response | bytes | Iterable[bytes],
+        timeout: int = 30,
+        force: bool = False,
+) -> str:
+    # Same code, same blob name: one conditional PUT and one MERGE instead of a new
+    # upload, a new row and a DELETE of the old blob. force skips the stale-write check.
+    from urllib.parse import urlparse
+
+    code = existing.get("code")
+    old_url = existing.get("blob_url") or ""
+    if not code or not old_url.startswith("http"):
+        raise ValueError(f"Resume {code} has no blob to update in place")
+    if "?" not in api_url:
+        raise ValueError("azure_container_sas_url must include a SAS query string")
+
+    base_url, sas_query = api_url.strip().split("?", 1)
+    base_url = base_url.rstrip("/")
+    container_path = urlparse(base_url).path
+    blob_path = urlparse(old_url).path
+    if not blob_path.startswith(f"{container_path}/"):
+        raise ValueError(f"Resume {code} is stored outside the configured container")
+    # Rebuild the URL so a rotated SAS token is used rather than the one saved with the row.
+    blob_url = f"{base_url}/{blob_path[len(container_path) + 1:]}?{sas_query}"
+    expected_etag = "*" if force else existing.get("blob_etag") or _current_blob_etag(code, blob_url, timeout)
+
+    with span("upload.blob", op="overwrite"):
+        try:
+            uploaded, etag = _put_blob_stream(
+                blob_url,
+                _iter_pdf_chunks(upload),
+                timeout=timeout,
+                conditions={"If-Match": expected_etag},
+            )
+        except requests.HTTPError as ex:
+            if _http_status(ex) in (404, 412):
+                raise ResumeConflictError(
+                    f"Resume {code} was changed or removed since it was loaded; refresh the list and try again"
+                ) from ex
+            raise
+    count("bytes_uploaded_total", uploaded, target="blob")
+
+    entity = build_resume_entity(
+        name, code, blob_url, page_size, description, created_at=existing.get("created_at"), blob_etag=etag
+    )
+    entity["UpdatedAt"] = datetime.now(timezone.utc).isoformat()
     try:
-        persist_resume_metadata(
-            original_name=name,
-            code=code,
-            blob_url=blob_url,
-            page_size=page_size,
-            description=description,
-        )
-    except Exception as meta_ex:
-        print(f"Warning: failed to persist metadata: {meta_ex}")
+        persist_entity_durably(entity, merge=True)
+    except MetadataPersistError as meta_ex:
+        print(f"Warning: failed to persist metadata, queued for retry: {meta_ex}")
+
+    from services.resume_index import remember_resume
 
+    # The next update needs the new ETag even before the index syncs again.
+    remember_resume(_entity_to_resume(entity))
     return blob_url
 
-def get_all_resumes(page_size: int = 1000, max_pages: int | None = None) -> list[dict]:
+def persist_entity_durably(entity: dict, merge: bool = False) -> bool:
+    from services.metadata_journal import get_metadata_journal, write_behind_enabled
+
+    if write_behind_enabled():
+        # The blob is already durable; the journal makes the metadata durable too
+        # and a background worker writes it out.
+        get_metadata_journal().append(entity, merge=merge)
+        return False
+
+    try:
+        _write_entity(entity, merge=merge)
+    except MetadataPersistError as meta_ex:
+        get_metadata_journal().append(entity, completed=meta_ex.completed, merge=merge)
+        raise
+    return True
+
+def persist_entities_durably(entities: list[dict]) -> dict[str, MetadataPersistError]:
+    # Bulk form of persist_entity_durably for new rows: table inserts go out as entity group
+    # transactions (up to 100 per partition) and audit records share append blocks. Returns
+    # the failures by RowKey; each one is journaled for retry like a single write.
+    from services.metadata_journal import get_metadata_journal
+    from services.table_batch import write_entities_batched
+
+    if not entities:
+        return {}
+    errors: dict[str, dict[str, Exception]] = {}
+    targets = set()
+
+    if os.getenv("AZURE_TABLE_SAS_URL") and os.getenv("AZURE_TABLE_NAME"):
+        targets.add("table")
+        with span("metadata.table_batch"):
+            _, failures = write_entities_batched(entities, mode="insert")
+        for failure in failures:
+            # 409: a retried import row that is already stored.
+            if failure.status != 409:
+                errors.setdefault(failure.entity["RowKey"], {})["table"] = RuntimeError(
+                    f"Table insert failed ({failure.status}): {failure.error}"
+                )
+
+    if os.getenv("AZURE_LOGS_CONTAINER_SAS_URL"):
+        targets.add("logs")
+        try:
+            get_audit_log().append_many([build_audit_record(entity, "insert") for entity in entities])
+        except Exception as ex:
+            # Some blocks may have landed; the journal retries and readers drop the duplicates.
+            for entity in entities:
+                errors.setdefault(entity["RowKey"], {})["logs"] = ex
+
+    failed: dict[str, MetadataPersistError] = {}
+    for entity in entities:
+        entity_errors = errors.get(entity["RowKey"])
+        if entity_errors:
+            completed = targets - set(entity_errors)
+            get_metadata_journal().append(entity, completed=completed)
+            failed[entity["RowKey"]] = MetadataPersistError(entity, completed, entity_errors)
+    return failed
+
+def _resolve_table_query_url() -> str | None:
     table_sas_url = os.getenv("AZURE_TABLE_SAS_URL")
     table_name = os.getenv("AZURE_TABLE_NAME")
     if not table_sas_url or not table_name:
-        return []
+        return None
 
+    table_sas_url = table_sas_url.strip()
+    table_name = table_name.strip()
     if "?" not in table_sas_url:
         raise ValueError("AZURE_TABLE_SAS_URL must include a SAS query string")
 
     base_url, sas_query = table_sas_url.split("?", 1)
 
-    from urllib.parse import urlparse, quote
+    from urllib.parse import urlparse
     parsed = urlparse(base_url)
     path = parsed.path.rstrip("/")
     table_segment = f"/{table_name}"
@@ -185,32 +560,50 @@ def get_all_resumes(page_size: int = 1000, max_pages: int | None = None) -> list
     if table_url.endswith("()"):
         table_url = table_url[:-2]
 
-    base_query_url = f"{table_url}?{sas_query}"
+    return f"{table_url}?{sas_query}"
 
-    headers = {
-        "Accept": "application/json;odata=nometadata",
-        "DataServiceVersion": "3.0;NetFx",
-        "MaxDataServiceVersion": "3.0;NetFx",
-        "x-ms-version": "2019-02-02",
-    }
+_TABLE_QUERY_HEADERS = {
+    "Accept": "application/json;odata=nometadata",
+    "DataServiceVersion": "3.0;NetFx",
+    "MaxDataServiceVersion": "3.0;NetFx",
+    "x-ms-version": "2019-02-02",
+}
+
+RESUME_SUMMARY_COLUMNS = ("PartitionKey", "RowKey", "Code", "OriginalName", "NameSlug")
+
+def _odata_quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+def _iter_table_pages(
+    filter_expr: str = "PartitionKey eq 'by-code'",
+    page_size: int = 1000,
+    max_pages: int | None = None,
+    select: list[str] | tuple[str, ...] | None = None,
+) -> Iterator[list[dict]]:
+    base_query_url = _resolve_table_query_url()
+    if base_query_url is None:
+        return
+
+    from urllib.parse import quote
 
-    resumes: list[dict] = []
     next_pk: str | None = None
     next_rk: str | None = None
     pages_fetched = 0
 
     while True:
         query_parts = [
-            "$filter=PartitionKey eq 'by-code'",
+            f"$filter={filter_expr}",
             f"$top={page_size}",
         ]
+        if select:
+            query_parts.append(f"$select={','.join(select)}")
         if next_pk and next_rk:
             query_parts.append(f"NextPartitionKey={quote(next_pk)}")
             query_parts.append(f"NextRowKey={quote(next_rk)}")
 
         url = f"{base_query_url}&{'&'.join(query_parts)}"
 
-        resp = requests.get(url, headers=headers, timeout=30)
+        resp = get_session().get(url, headers=_TABLE_QUERY_HEADERS, timeout=30)
         try:
             resp.raise_for_status()
         except requests.HTTPError as ex:
@@ -218,16 +611,7 @@ def get_all_resumes(page_size: int = 1000, max_pages: int | None = None) -> list
             raise requests.HTTPError(f"Table query failed: {ex}\nResponse text: {msg}") from ex
 
         payload = resp.json() if resp.content else {}
-        values = payload.get("value", [])
-        for e in values:
-            resumes.append({
-                "code": e.get("Code") or e.get("RowKey"),
-                "name": e.get("OriginalName") or e.get("NameSlug"),
-                "description": e.get("Description"),
-                "page_size": e.get("PageSize"),
-                "created_at": e.get("CreatedAt"),
-                "blob_url": e.get("BlobUrl"),
-            })
+        yield payload.get("value", [])
 
         next_pk = resp.headers.get("x-ms-continuation-NextPartitionKey")
         next_rk = resp.headers.get("x-ms-continuation-NextRowKey")
@@ -238,8 +622,129 @@ def get_all_resumes(page_size: int = 1000, max_pages: int | None = None) -> list
         if max_pages is not None and pages_fetched >= max_pages:
             break
 
+def _entity_to_resume(e: dict) -> dict:
+    return {
+        "code": e.get("Code") or e.get("RowKey"),
+        "name": e.get("OriginalName") or e.get("NameSlug"),
+        "description": e.get("Description"),
+        "page_size": e.get("PageSize"),
+        "created_at": e.get("CreatedAt"),
+        "blob_url": e.get("BlobUrl"),
+        "blob_etag": e.get("BlobETag"),
+    }
+
+def iter_resume_pages(
+    page_size: int = 1000,
+    max_pages: int | None = None,
+    select: list[str] | tuple[str, ...] | None = None,
+    filter_expr: str = "PartitionKey eq 'by-code'",
+) -> Iterator[list[dict]]:
+    # The next continuation page downloads while the caller handles this one; closing
+    # the iterator stops paging.
+    from utils.prefetch import prefetch
+
+    pages = _iter_table_pages(filter_expr=filter_expr, page_size=page_size, max_pages=max_pages, select=select)
+    for values in prefetch(pages):
+        yield [_entity_to_resume(e) for e in values]
+
+def get_all_resumes(
+    page_size: int = 1000,
+    max_pages: int | None = None,
+    select: list[str] | tuple[str, ...] | None = None,
+) -> list[dict]:
+    resumes: list[dict] = []
+    for page in iter_resume_pages(page_size=page_size, max_pages=max_pages, select=select):
+        resumes.extend(page)
+    return resumes
+
+def _format_created_at(value: datetime | str) -> str:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat()
+    return value
+
+def find_resumes(
+    name_slug_prefix: str | None = None,
+    created_from: datetime | str | None = None,
+    created_to: datetime | str | None = None,
+    select: list[str] | tuple[str, ...] | None = None,
+    page_size: int = 1000,
+    max_pages: int | None = None,
+) -> list[dict]:
+    clauses = ["PartitionKey eq 'by-code'"]
+    prefix = (name_slug_prefix or "").strip().lower()
+    if prefix:
+        # Table storage has no startswith(); a half-open range on the slug is the equivalent.
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        clauses.append(f"NameSlug ge {_odata_quote(prefix)}")
+        clauses.append(f"NameSlug lt {_odata_quote(upper)}")
+    if created_from is not None:
+        clauses.append(f"CreatedAt ge {_odata_quote(_format_created_at(created_from))}")
+    if created_to is not None:
+        clauses.append(f"CreatedAt lt {_odata_quote(_format_created_at(created_to))}")
+
+    resumes: list[dict] = []
+    pages = iter_resume_pages(
+        filter_expr=" and ".join(clauses),
+        page_size=page_size,
+        max_pages=max_pages,
+        select=select,
+    )
+    for page in pages:
+        resumes.extend(page)
     return resumes
 
+def get_resume_by_code(code: str, select: list[str] | tuple[str, ...] | None = None) -> dict | None:
+    if not code:
+        raise ValueError("code is required to look up a resume")
+
+    base_query_url = _resolve_table_query_url()
+    if base_query_url is None:
+        return None
+
+    from urllib.parse import quote
+
+    table_url, sas_query = base_query_url.split("?", 1)
+    key = f"(PartitionKey='by-code',RowKey={quote(_odata_quote(code), safe='')})"
+    url = f"{table_url}{key}?{sas_query}"
+    if select:
+        url += f"&$select={','.join(select)}"
+
+    resp = get_session().get(url, headers=_TABLE_QUERY_HEADERS, timeout=30)
+    if resp.status_code == 404:
+        return None
+    try:
+        resp.raise_for_status()
+    except requests.HTTPError as ex:
+        msg = getattr(resp, "text", "")
+        raise requests.HTTPError(f"Table lookup failed: {ex}\nResponse text: {msg}") from ex
+
+    return _entity_to_resume(resp.json())
+
+def delete_resume_entity(code: str, timeout: int = 30) -> bool:
+    if not code:
+        raise ValueError("code is required to delete a resume")
+
+    base_query_url = _resolve_table_query_url()
+    if base_query_url is None:
+        return False
+
+    from urllib.parse import quote
+
+    table_url, sas_query = base_query_url.split("?", 1)
+    key = f"(PartitionKey='by-code',RowKey={quote(_odata_quote(code), safe='')})"
+    headers = {**_TABLE_QUERY_HEADERS, "If-Match": "*"}
+    resp = get_session().delete(f"{table_url}{key}?{sas_query}", headers=headers, timeout=timeout)
+    if resp.status_code == 404:
+        return False
+    try:
+        resp.raise_for_status()
+    except requests.HTTPError as ex:
+        msg = getattr(resp, "text", "")
+        raise requests.HTTPError(f"Table delete failed: {ex}\nResponse text: {msg}") from ex
+    return True
+
 def delete_resume_blob(blob_url: str, timeout: int = 30) -> None:
     if not blob_url:
         raise ValueError("blob_url is required to delete a resume blob")
@@ -248,54 +753,214 @@ def delete_resume_blob(blob_url: str, timeout: int = 30) -> None:
         "x-ms-version": "2019-12-12",
         "x-ms-delete-snapshots": "include",
     }
-    resp = requests.delete(blob_url, headers=headers, timeout=timeout)
+    resp = get_session().delete(blob_url, headers=headers, timeout=timeout)
     try:
         resp.raise_for_status()
     except requests.HTTPError as ex:
         msg = getattr(resp, "text", "")
         raise requests.HTTPError(f"Failed to delete resume blob: {ex}\nResponse text: {msg}") from ex
 
+_REWRITE_SYSTEM_PROMPT = (
+    "You are an assistant that rewrites user-provided text for clarity, grammar, and concision. "
+    "Preserve all factual details and specific accomplishments. Avoid adding new facts. "
+    "Return ONLY the improved text, with no markdown or additional commentary."
+)
+
 def improve_text_with_openai(
     text: str,
     property: list[str] | str,
-    model: str = "gpt-4o-mini",
-    temperature: float = 0.3,
-    max_tokens: int = 600
+    model: str = OPENAI_MODEL,
+    temperature: float = OPENAI_TEMPERATURE,
+    max_tokens: int = OPENAI_MAX_TOKENS,
+    use_cache: bool = True,
 ) -> str:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("Missing OpenAI API key. Set OPENAI_API_KEY in the environment.")
+    cache = get_rewrite_cache() if use_cache else None
+    cache_key = make_rewrite_key(model, temperature, max_tokens, property, text) if cache else None
+    if cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
+    # Long sections are rewritten in pieces of at most half the completion budget, so a
+    # rewrite that runs a little longer than its input still fits.
+    budget = max(max_tokens // 2, 1)
+    chunks = split_text(text, budget) if estimate_tokens(text) > budget else []
+    complete = True
+    if len(chunks) > 1:
+        improved, complete = _improve_chunks(chunks, property, model, temperature, max_tokens, cache)
+    else:
+        improved = _post_chat_completion(_rewrite_payload(text, property, model, temperature, max_tokens)).strip()
+    if cache and complete:
+        cache.put(cache_key, improved)
+    return improved
+
+def _rewrite_payload(text: str, property: list[str] | str, model: str, temperature: float, max_tokens: int) -> dict:
     messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are an assistant that rewrites user-provided text for clarity, grammar, and concision. "
-                "Preserve all factual details and specific accomplishments. Avoid adding new facts. "
-                "Return ONLY the improved text, with no markdown or additional commentary."
-            ),
-        },
+        {"role": "system", "content": _REWRITE_SYSTEM_PROMPT},
         {
             "role": "user",
             "content": f"Improve the following resume {property}:\n\n{text}",
         },
     ]
-    payload = {
+    return {
         "model": model,
         "messages": messages,
         "temperature": temperature,
         "max_tokens": max_tokens,
     }
 
+def _improve_chunk(chunk: str, property, model: str, temperature: float, max_tokens: int, cache) -> tuple[str, bool]:
+    cache_key = make_rewrite_key(model, temperature, max_tokens, property, chunk) if cache else None
+    if cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached, True
+
+    # Token counts go to a counter; as a span label every distinct count would be its own series.
+    count("openai_chunk_tokens_total", estimate_tokens(chunk), kind="estimated")
+    with span("openai.chunk", section=str(property)):
+        choice = _chat_completion_choice(_rewrite_payload(chunk, property, model, temperature, max_tokens))
+    improved = (choice["message"]["content"] or "").strip()
+    if choice.get("finish_reason") == "length" or \
+            estimate_tokens(improved) < estimate_tokens(chunk) * MIN_CHUNK_OUTPUT_RATIO:
+        # Keeping the original wording beats dropping part of someone's experience.
+        count("openai_chunk_fallbacks_total")
+        print(f"Warning: rewrite of part of '{property}' came back truncated or too short; keeping the original text.")
+        return chunk, False
+    if cache:
+        cache.put(cache_key, improved)
+    return improved, True
+
+def _iter_improved_chunks(
+    chunks: list[tuple[str, str]],
+    property,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    cache,
+) -> Iterator[tuple[str, bool]]:
+    # Chunks are rewritten in parallel and yielded in input order, each followed by the
+    # separator the input had after it, as soon as it and everything before it are done.
+    executor = _get_chunk_executor()
+    futures = [
+        executor.submit(contextvars.copy_context().run, _improve_chunk, chunk, property, model, temperature,
+                        max_tokens, cache)
+        for chunk, _ in chunks
+    ]
     try:
-        resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=30)
+        for future, (_, separator) in zip(futures, chunks):
+            text, ok = future.result()
+            yield text + separator, ok
+    finally:
+        for future in futures:
+            future.cancel()
+
+def _improve_chunks(
+    chunks: list[tuple[str, str]],
+    property,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    cache,
+) -> tuple[str, bool]:
+    results = list(_iter_improved_chunks(chunks, property, model, temperature, max_tokens, cache))
+    return "".join(text for text, _ in results).strip(), all(ok for _, ok in results)
+
+def stream_text_with_openai(
+    text: str,
+    property: list[str] | str,
+    model: str = OPENAI_MODEL,
+    temperature: float = OPENAI_TEMPERATURE,
+    max_tokens: int = OPENAI_MAX_TOKENS,
+    use_cache: bool = True,
+) -> Iterator[str]:
+    # Same rewrite as improve_text_with_openai, yielded as text deltas while the completion
+    # streams in. Joining and stripping the deltas gives the improved text.
+    cache = get_rewrite_cache() if use_cache else None
+    cache_key = make_rewrite_key(model, temperature, max_tokens, property, text) if cache else None
+    if cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    budget = max(max_tokens // 2, 1)
+    chunks = split_text(text, budget) if estimate_tokens(text) > budget else []
+    parts: list[str] = []
+    complete = True
+    if len(chunks) > 1:
+        for piece, ok in _iter_improved_chunks(chunks, property, model, temperature, max_tokens, cache):
+            complete = complete and ok
+            parts.append(piece)
+            yield piece
+    else:
+        for delta in _stream_chat_completion(_rewrite_payload(text, property, model, temperature, max_tokens)):
+            parts.append(delta)
+            yield delta
+    if cache and complete:
+        cache.put(cache_key, "".join(parts).strip())
+
+def _count_usage(usage: dict | None) -> None:
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if (usage or {}).get(kind):
+            count("openai_tokens_total", usage[kind], kind=kind.split("_")[0])
+
+def _stream_chat_completion(payload: dict) -> Iterator[str]:
+    payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+    resp = _send_chat_completion(payload, stream=True)
+    try:
+        for line in resp.iter_lines():
+            # Server-sent events: only "data:" lines carry chunks; blank lines end an
+            # event and lines starting with ":" are keep-alive comments.
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            try:
+                event = json.loads(data)
+            except ValueError as e:
+                raise RuntimeError(f"Unexpected OpenAI stream event: {data[:200]!r}") from e
+            if event.get("error"):
+                raise RuntimeError(f"OpenAI API error in stream: {event['error']}")
+            # With include_usage the last chunk has no choices, only the token counts.
+            _count_usage(event.get("usage"))
+            for choice in event.get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+    except requests.RequestException as e:
+        raise RuntimeError(f"OpenAI stream interrupted: {e}") from e
+    finally:
+        resp.close()
+
+def _post_chat_completion(payload: dict) -> str:
+    return _chat_completion_choice(payload)["message"]["content"]
+
+def _send_chat_completion(payload: dict, stream: bool = False) -> requests.Response:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("Missing OpenAI API key. Set OPENAI_API_KEY in the environment.")
+
+    url = os.getenv("OPENAI_API_URL") or OPENAI_API_URL
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+
+    body = json.dumps(payload)
+    # Rough token cost for the TPM bucket: ~4 characters per prompt token plus the completion budget.
+    cost_tokens = len(body) / 4 + payload.get("max_tokens", 0)
+    try:
+        with span("openai.request", model=payload.get("model")):
+            resp = send_with_rate_limit(
+                get_rate_limiter("openai"),
+                lambda: get_session().post(url, headers=headers, data=body, timeout=30, stream=stream),
+                cost_tokens=cost_tokens,
+            )
     except requests.RequestException as e:
         raise RuntimeError(f"Failed to contact OpenAI API: {e}") from e
+    count("bytes_uploaded_total", len(body), target="openai")
 
     if resp.status_code != 200:
         try:
@@ -303,14 +968,62 @@ def improve_text_with_openai(
         except Exception:
             err = resp.text
         raise RuntimeError(f"OpenAI API error ({resp.status_code}): {err}")
+    return resp
 
-    data = resp.json()
+def _chat_completion_choice(payload: dict) -> dict:
+    data = _send_chat_completion(payload).json()
+    _count_usage(data.get("usage"))
     try:
-        improved = data["choices"][0]["message"]["content"]
-    except (KeyError, IndexError) as e:
+        choice = data["choices"][0]
+        choice["message"]["content"]
+        return choice
+    except (KeyError, IndexError, TypeError) as e:
         raise RuntimeError(f"Unexpected OpenAI response format: {data}") from e
 
-    return improved.strip()
+def improve_sections_with_openai(
+    sections: dict[str, str],
+    model: str = OPENAI_MODEL,
+    temperature: float = OPENAI_TEMPERATURE,
+    max_tokens: int = OPENAI_MAX_TOKENS,
+) -> dict[str, str]:
+    if not sections:
+        return {}
+
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                f"{_REWRITE_SYSTEM_PROMPT} "
+                "You will receive a JSON object mapping resume section names to their text. "
+                "Respond with a JSON object that has exactly the same keys, each mapped to the "
+                "improved text of that section as a plain string."
+            ),
+        },
+        {"role": "user", "content": json.dumps(sections, ensure_ascii=False)},
+    ]
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        # Same per-section budget as the single-section call, capped at the model's output limit.
+        "max_tokens": min(max_tokens * len(sections), 16384),
+        "response_format": {"type": "json_object"},
+    }
+
+    content = _post_chat_completion(payload)
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    improved: dict[str, str] = {}
+    for name in sections:
+        value = data.get(name)
+        if isinstance(value, str) and value.strip():
+            improved[name] = value.strip()
+    return improved
 
 def render_section(title: str, content) -> str:
     if content is None:
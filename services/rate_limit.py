@@ -0,0 +1,276 @@
+import os
+import re
+import time
+import random
+from dataclasses import dataclass
+from threading import Condition, Lock
+from typing import Callable
+
+import requests
+
+from services.telemetry import count
+
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_BACKOFF_BASE = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+DEFAULT_WINDOW_SECONDS = 60.0
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def parse_duration(value: str | None) -> float | None:
+    # Accepts '20ms', '1.5s', '6m0s' (OpenAI's reset format) or a plain number of seconds.
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    seconds = parse_duration(value)
+    if seconds is not None:
+        return seconds
+    from email.utils import parsedate_to_datetime
+
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def _header_int(headers, name: str) -> int | None:
+    raw = headers.get(name)
+    if raw is None:
+        return None
+    try:
+        return int(float(raw.split(",")[0].split(";")[0].strip()))
+    except ValueError:
+        return None
+
+@dataclass
+class LimitSnapshot:
+    kind: str
+    limit: int | None
+    remaining: int | None
+    reset: float | None
+    window: float | None = None
+
+def read_limit_headers(headers) -> list[LimitSnapshot]:
+    snapshots = []
+    # OpenAI: x-ratelimit-{limit,remaining,reset}-{requests,tokens}, reset as "6m0s".
+    for kind in ("requests", "tokens"):
+        limit = _header_int(headers, f"x-ratelimit-limit-{kind}")
+        remaining = _header_int(headers, f"x-ratelimit-remaining-{kind}")
+        if limit is not None or remaining is not None:
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            snapshots.append(LimitSnapshot(kind, limit, remaining, reset))
+    if snapshots:
+        return snapshots
+
+    # Generic X-RateLimit-* and the IETF RateLimit-* fields, both request counts.
+    for prefix in ("x-ratelimit-", "ratelimit-"):
+        limit = _header_int(headers, f"{prefix}limit")
+        remaining = _header_int(headers, f"{prefix}remaining")
+        if limit is None and remaining is None:
+            continue
+        reset_raw = headers.get(f"{prefix}reset")
+        reset = parse_duration(reset_raw)
+        if reset is not None and reset > 10 ** 9:
+            # Some providers send an epoch timestamp instead of seconds-until-reset.
+            reset = max(reset - time.time(), 0.0)
+        window = None
+        match = re.search(r"w=(\d+)", headers.get("ratelimit-policy", "") or headers.get(f"{prefix}limit", ""))
+        if match:
+            window = float(match.group(1))
+        return [LimitSnapshot("requests", limit, remaining, reset, window)]
+    return []
+
+class TokenBucket:
+    def __init__(self, rate: float | None = None, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity or 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if self.rate:
+            self.tokens = min(self.tokens + (now - self._updated) * self.rate, self.capacity or float("inf"))
+        self._updated = now
+
+    def configure(self, rate: float, capacity: float) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        if self.rate is None:
+            self.tokens = capacity
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = min(self.tokens, capacity)
+
+    def reserve(self, amount: float) -> float:
+        # Take the tokens now, possibly going into debt, and report how long to wait them out.
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def clamp(self, remaining: float) -> None:
+        # The provider's count wins when it says we have less than we think.
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, remaining)
+
+class AdaptiveRateLimiter:
+    # Token buckets start unlimited (or at the configured per-minute limits) and are
+    # re-tuned from the provider's headers. The in-flight limit is AIMD: a 429 halves
+    # it, and each full window of successful calls grows it by one.
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        max_in_flight: int = 16,
+        min_in_flight: int = 1,
+    ) -> None:
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.min_in_flight = min_in_flight
+        self.in_flight_limit = float(max_in_flight)
+        self.throttled = 0
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = Lock()
+        self._slots = Condition(self._lock)
+        self._buckets = {"requests": TokenBucket(), "tokens": TokenBucket()}
+        if requests_per_minute:
+            self._buckets["requests"].configure(requests_per_minute / 60.0, max(requests_per_minute / 60.0, 1.0))
+        if tokens_per_minute:
+            self._buckets["tokens"].configure(tokens_per_minute / 60.0, tokens_per_minute / 60.0)
+
+    def acquire(self, cost_tokens: float = 0.0) -> None:
+        with self._slots:
+            self._slots.wait_for(lambda: self._in_flight < int(self.in_flight_limit))
+            self._in_flight += 1
+            wait = max(
+                self._buckets["requests"].reserve(1),
+                self._buckets["tokens"].reserve(cost_tokens) if cost_tokens else 0.0,
+                self._paused_until - time.monotonic(),
+            )
+        if wait > 0:
+            count("rate_limit_wait_seconds_total", wait, provider=self.name)
+            time.sleep(wait)
+
+    def release(self) -> None:
+        with self._slots:
+            self._in_flight -= 1
+            self._slots.notify()
+
+    def observe(self, response: requests.Response) -> None:
+        snapshots = read_limit_headers(response.headers)
+        throttled = response.status_code == 429
+        with self._slots:
+            for snap in snapshots:
+                bucket = self._buckets[snap.kind]
+                if snap.limit:
+                    window = snap.window or DEFAULT_WINDOW_SECONDS
+                    rate = snap.limit / window
+                    if bucket.rate != rate:
+                        # Burst of one second's worth keeps the pacing smooth without idling.
+                        bucket.configure(rate, max(rate, 1.0))
+                if snap.remaining is not None:
+                    bucket.clamp(snap.remaining)
+                    if snap.remaining <= 0 and snap.reset:
+                        self._pause(snap.reset)
+
+            if throttled:
+                self.throttled += 1
+                now = time.monotonic()
+                # Several in-flight calls usually hit the same 429 burst; back off once per burst.
+                if now - self._last_decrease > 1.0:
+                    self.in_flight_limit = max(self.in_flight_limit / 2, float(self.min_in_flight))
+                    self._last_decrease = now
+            elif response.status_code < 400 and self.in_flight_limit < self.max_in_flight:
+                before = int(self.in_flight_limit)
+                self.in_flight_limit = min(self.in_flight_limit + 1.0 / self.in_flight_limit, self.max_in_flight)
+                if int(self.in_flight_limit) > before:
+                    self._slots.notify_all()
+
+    def _pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._pause(seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "in_flight_limit": int(self.in_flight_limit),
+                "throttled": self.throttled,
+                "requests_per_second": self._buckets["requests"].rate,
+                "tokens_per_second": self._buckets["tokens"].rate,
+            }
+
+def _env_float(name: str) -> float | None:
+    raw = os.getenv(name, "").strip()
+    return float(raw) if raw else None
+
+def _backoff(attempt: int) -> float:
+    base = _env_float("RATE_LIMIT_BACKOFF_BASE") or DEFAULT_BACKOFF_BASE
+    # Full jitter: spreads retries from workers that were throttled together.
+    return random.uniform(0, min(base * (2 ** attempt), MAX_BACKOFF_SECONDS))
+
+def send_with_rate_limit(
+    limiter: AdaptiveRateLimiter,
+    send: Callable[[], requests.Response],
+    cost_tokens: float = 0.0,
+    max_attempts: int | None = None,
+) -> requests.Response:
+    if max_attempts is None:
+        max_attempts = int(_env_float("RATE_LIMIT_MAX_ATTEMPTS") or DEFAULT_MAX_ATTEMPTS)
+
+    attempt = 0
+    while True:
+        limiter.acquire(cost_tokens)
+        try:
+            resp = send()
+        finally:
+            limiter.release()
+        limiter.observe(resp)
+        attempt += 1
+        if resp.status_code != 429 or attempt >= max_attempts:
+            return resp
+
+        count("rate_limited_total", provider=limiter.name)
+        retry_after = parse_retry_after(resp.headers.get("retry-after"))
+        retry_after_ms = resp.headers.get("retry-after-ms")
+        if retry_after_ms:
+            retry_after = parse_duration(f"{retry_after_ms}ms")
+        delay = retry_after if retry_after is not None else _backoff(attempt - 1)
+        # Everyone waits out a server-specified pause, not just the caller that saw it.
+        limiter.pause(delay + random.uniform(0, 0.1 * delay + 0.05))
+        resp.close()
+
+_limiters: dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = Lock()
+
+def get_rate_limiter(name: str) -> AdaptiveRateLimiter:
+    with _limiters_lock:
+        if name not in _limiters:
+            prefix = name.upper()
+            _limiters[name] = AdaptiveRateLimiter(
+                name,
+                requests_per_minute=_env_float(f"{prefix}_RATE_LIMIT_RPM"),
+                tokens_per_minute=_env_float(f"{prefix}_RATE_LIMIT_TPM"),
+                max_in_flight=int(_env_float(f"{prefix}_MAX_IN_FLIGHT") or 16),
+            )
+        return _limiters[name]
@@ -0,0 +1,174 @@
+import os
+import json
+import uuid
+import hashlib
+from threading import Lock
+from typing import BinaryIO, Iterable, Iterator
+
+from services.telemetry import count
+
+DEFAULT_CACHE_DIR = ".cache/renders"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+_LOOKUP_RESULTS = {"hits": "hit", "misses": "miss", "mirror_hits": "mirror_hit"}
+
+def make_render_key(html_doc: str, instructions: dict) -> str:
+    digest = hashlib.sha256()
+    digest.update(json.dumps(instructions, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(html_doc.encode("utf-8"))
+    return digest.hexdigest()
+
+def iter_open_file(f: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    try:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
+
+class RenderCache:
+    def __init__(
+        self,
+        directory: str = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        mirror_container_sas_url: str | None = None,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.mirror_container_sas_url = mirror_container_sas_url
+        self.hits = 0
+        self.misses = 0
+        self.mirror_hits = 0
+        self._stats_lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+        count("cache_lookups_total", cache="render", result=_LOOKUP_RESULTS[name])
+
+    def open(self, key: str) -> BinaryIO | None:
+        path = self._path(key)
+        try:
+            # Holding the descriptor keeps the content readable even if another
+            # process evicts the file while we stream it.
+            f = open(path, "rb")
+        except FileNotFoundError:
+            f = self._fetch_from_mirror(key)
+            if f is None:
+                self._count("misses")
+                return None
+            self._count("mirror_hits")
+            return f
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count("hits")
+        return f
+
+    def put(self, key: str, chunks: Iterable[bytes], mirror: bool = True) -> BinaryIO:
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        f = open(path, "rb")
+        if mirror and self.mirror_container_sas_url:
+            self._store_in_mirror(key, path)
+        self._evict()
+        return f
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".pdf"):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _mirror_blob_url(self, key: str) -> str:
+        base_url, sas_query = self.mirror_container_sas_url.strip().split("?", 1)
+        return f"{base_url.rstrip('/')}/{key}.pdf?{sas_query}"
+
+    def _fetch_from_mirror(self, key: str) -> BinaryIO | None:
+        if not self.mirror_container_sas_url:
+            return None
+        from services.http_client import get_session
+
+        try:
+            resp = get_session().get(self._mirror_blob_url(key), stream=True, timeout=30)
+        except Exception as ex:
+            print(f"Warning: render cache mirror lookup failed: {ex}")
+            return None
+        if resp.status_code != 200:
+            resp.close()
+            return None
+        try:
+            return self.put(key, resp.iter_content(CHUNK_SIZE), mirror=False)
+        finally:
+            resp.close()
+
+    def _store_in_mirror(self, key: str, path: str) -> None:
+        from services.metadata_service import _iter_file_chunks, _put_blob_stream
+
+        try:
+            _put_blob_stream(self._mirror_blob_url(key), _iter_file_chunks(path))
+        except Exception as ex:
+            # 409/412 just means another writer mirrored the same render first.
+            cause = ex.__cause__ or ex
+            status = getattr(getattr(cause, "response", None), "status_code", None)
+            if status not in (409, 412):
+                print(f"Warning: failed to mirror render to blob storage: {ex}")
+
+    def stats(self) -> dict[str, int]:
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses, "mirror_hits": self.mirror_hits}
+
+_cache: RenderCache | None = None
+_cache_lock = Lock()
+
+def get_render_cache() -> RenderCache | None:
+    global _cache
+    if os.getenv("RENDER_CACHE_DISABLED", "").strip().lower() in ("1", "true", "yes"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = RenderCache(
+                directory=os.getenv("RENDER_CACHE_DIR", DEFAULT_CACHE_DIR),
+                max_bytes=int(os.getenv("RENDER_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+                mirror_container_sas_url=os.getenv("RENDER_CACHE_CONTAINER_SAS_URL") or None,
+            )
+        return _cache
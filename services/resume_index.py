@@ -0,0 +1,321 @@
+import os
+import sqlite3
+from threading import Lock, Thread
+from typing import Iterator
+
+DEFAULT_INDEX_PATH = ".cache/resume-index.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resumes (
+    code TEXT PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    page_size TEXT,
+    created_at TEXT,
+    blob_url TEXT,
+    timestamp TEXT,
+    blob_etag TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_COLUMNS = ("code", "name", "description", "page_size", "created_at", "blob_url", "blob_etag")
+_UPSERT = (
+    f"INSERT OR REPLACE INTO resumes ({', '.join(_COLUMNS)}, timestamp) "
+    f"VALUES ({', '.join('?' * (len(_COLUMNS) + 1))})"
+)
+
+class ResumeIndex:
+    def __init__(self, path: str = DEFAULT_INDEX_PATH) -> None:
+        self.path = path
+        self._sync_lock = Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(resumes)")}
+            if "blob_etag" not in columns:
+                # Indexes built before ETags were tracked; forget the source so the next sync is full.
+                conn.execute("ALTER TABLE resumes ADD COLUMN blob_etag TEXT")
+                conn.execute("DELETE FROM sync_state")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _get_state(self, conn: sqlite3.Connection, key: str) -> str | None:
+        row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, conn: sqlite3.Connection, key: str, value: str) -> None:
+        conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+
+    def sync(self, full: bool = False, page_size: int = 1000) -> int:
+        return sum(len(rows) for rows in self.iter_sync(full=full, page_size=page_size))
+
+    def _sync_source(self) -> str | None:
+        from services.metadata_service import _resolve_table_query_url
+
+        query_url = _resolve_table_query_url()
+        # The SAS token rotates; only the table location decides whether the index is still valid.
+        return query_url.split("?", 1)[0] if query_url is not None else None
+
+    def needs_full_sync(self) -> bool:
+        source = self._sync_source()
+        if source is None:
+            return False
+        conn = self._connect()
+        try:
+            return self._get_state(conn, "source") != source
+        finally:
+            conn.close()
+
+    def resuming_full_sync(self) -> bool:
+        # True when an interrupted full sync of the current table has rows stored already.
+        source = self._sync_source()
+        if source is None:
+            return False
+        conn = self._connect()
+        try:
+            return self._get_state(conn, "source") != source and self._get_state(conn, "full_source") == source
+        finally:
+            conn.close()
+
+    def iter_sync(self, full: bool = False, page_size: int = 1000) -> Iterator[list[dict]]:
+        # Yields each page of changed resumes once it is stored, so a first full sync can
+        # be shown while it downloads. Stopping early is safe: the watermark only moves
+        # after the last page, and a full sync records its progress page by page so the
+        # next call picks it up where it stopped. Pass full=True to start over instead.
+        from services.metadata_service import _entity_to_resume, _iter_table_pages, _odata_quote
+        from utils.prefetch import prefetch
+
+        source = self._sync_source()
+        if source is None:
+            return
+
+        with self._sync_lock:
+            conn = self._connect()
+            fetcher = None
+            try:
+                resume_after = None
+                if not full and self._get_state(conn, "source") != source:
+                    full = True
+                    if self._get_state(conn, "full_source") == source:
+                        resume_after = self._get_state(conn, "full_after")
+
+                filter_expr = "PartitionKey eq 'by-code'"
+                if resume_after is not None:
+                    last_timestamp = self._get_state(conn, "full_last_timestamp")
+                    last_created_at = self._get_state(conn, "full_last_created_at")
+                    # Pages come in RowKey order, so everything up to the last stored key is done.
+                    if resume_after:
+                        filter_expr += f" and RowKey gt {_odata_quote(resume_after)}"
+                else:
+                    last_timestamp = None if full else self._get_state(conn, "last_timestamp")
+                    last_created_at = None if full else self._get_state(conn, "last_created_at")
+                    if last_timestamp:
+                        # ge rather than gt: entities sharing the boundary timestamp are simply re-upserted.
+                        filter_expr += f" and Timestamp ge datetime'{last_timestamp}'"
+                    elif last_created_at:
+                        filter_expr += f" and CreatedAt ge '{last_created_at}'"
+
+                pages = fetcher = prefetch(_iter_table_pages(filter_expr=filter_expr, page_size=page_size))
+                if full and resume_after is None:
+                    # Fetch the first page before clearing so a failing query leaves the old index intact.
+                    first_page = next(pages, [])
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.execute("DELETE FROM resumes")
+                    conn.execute("DELETE FROM sync_state")
+                    self._set_state(conn, "full_source", source)
+                    self._set_state(conn, "full_after", "")
+                    conn.execute("COMMIT")
+                    pages = _chain_first(first_page, pages)
+
+                for values in pages:
+                    rows = []
+                    resumes = []
+                    for e in values:
+                        resume = _entity_to_resume(e)
+                        if not resume["code"]:
+                            continue
+                        resumes.append(resume)
+                        rows.append(tuple(resume[c] for c in _COLUMNS) + (e.get("Timestamp"),))
+                        if e.get("Timestamp") and (last_timestamp is None or e["Timestamp"] > last_timestamp):
+                            last_timestamp = e["Timestamp"]
+                        if e.get("CreatedAt") and (last_created_at is None or e["CreatedAt"] > last_created_at):
+                            last_created_at = e["CreatedAt"]
+
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.executemany(_UPSERT, rows)
+                    if full and values:
+                        # Progress is committed with the rows it covers.
+                        self._set_state(conn, "full_after", values[-1].get("RowKey") or "")
+                        if last_timestamp:
+                            self._set_state(conn, "full_last_timestamp", last_timestamp)
+                        if last_created_at:
+                            self._set_state(conn, "full_last_created_at", last_created_at)
+                    conn.execute("COMMIT")
+                    yield resumes
+
+                # Pages arrive in RowKey order, not Timestamp order, so the watermark only moves
+                # once every page is stored; an interrupted incremental sync starts over from the old one.
+                conn.execute("BEGIN IMMEDIATE")
+                self._set_state(conn, "source", source)
+                if last_timestamp:
+                    self._set_state(conn, "last_timestamp", last_timestamp)
+                if last_created_at:
+                    self._set_state(conn, "last_created_at", last_created_at)
+                conn.execute(
+                    "DELETE FROM sync_state WHERE key IN "
+                    "('full_source', 'full_after', 'full_last_timestamp', 'full_last_created_at')"
+                )
+                conn.execute("COMMIT")
+            finally:
+                if fetcher is not None:
+                    fetcher.close()
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                conn.close()
+
+    def list_resumes(self) -> list[dict]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM resumes ORDER BY code"
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def iter_pages(self, page_size: int = 100) -> Iterator[list[dict]]:
+        # Keyset paging keeps each query cheap however deep the caller scrolls.
+        conn = self._connect()
+        try:
+            last_code = ""
+            while True:
+                rows = conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM resumes WHERE code > ? ORDER BY code LIMIT ?",
+                    (last_code, page_size),
+                ).fetchall()
+                if not rows:
+                    return
+                yield [dict(zip(_COLUMNS, row)) for row in rows]
+                last_code = rows[-1][0]
+        finally:
+            conn.close()
+
+    def get(self, code: str) -> dict | None:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM resumes WHERE code = ?", (code,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def upsert(self, resume: dict) -> None:
+        # The watermark is left alone: the next sync re-reads this row with its real Timestamp.
+        conn = self._connect()
+        try:
+            conn.execute(_UPSERT, tuple(resume.get(c) for c in _COLUMNS) + (None,))
+        finally:
+            conn.close()
+
+    def delete(self, code: str) -> None:
+        # Incremental sync only sees inserts and updates, so deletions are applied here.
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM resumes WHERE code = ?", (code,))
+        finally:
+            conn.close()
+
+    def count(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM resumes").fetchone()[0]
+        finally:
+            conn.close()
+
+def _chain_first(first: list[dict], rest):
+    yield first
+    yield from rest
+
+_index: ResumeIndex | None = None
+_index_lock = Lock()
+
+def index_enabled() -> bool:
+    return os.getenv("RESUME_INDEX_DISABLED", "").strip().lower() not in ("1", "true", "yes")
+
+def get_resume_index() -> ResumeIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ResumeIndex(os.getenv("RESUME_INDEX_PATH", DEFAULT_INDEX_PATH))
+        return _index
+
+def load_resumes(full_sync: bool = False) -> list[dict]:
+    if not os.getenv("AZURE_TABLE_SAS_URL") or not os.getenv("AZURE_TABLE_NAME"):
+        return []
+    if not index_enabled():
+        from services.metadata_service import RESUME_SUMMARY_COLUMNS, get_all_resumes
+        return get_all_resumes(select=RESUME_SUMMARY_COLUMNS)
+
+    index = get_resume_index()
+    index.sync(full=full_sync)
+    return index.list_resumes()
+
+def remember_resume(resume: dict) -> None:
+    if index_enabled() and resume.get("code"):
+        get_resume_index().upsert(resume)
+
+def forget_resume(code: str) -> None:
+    if index_enabled():
+        get_resume_index().delete(code)
+
+def _finish_sync(index: ResumeIndex) -> None:
+    try:
+        index.sync()
+    except Exception as ex:
+        print(f"Warning: background resume index sync failed: {ex}")
+
+def iter_resume_pages(page_size: int = 100) -> Iterator[list[dict]]:
+    if not os.getenv("AZURE_TABLE_SAS_URL") or not os.getenv("AZURE_TABLE_NAME"):
+        return
+    if not index_enabled():
+        from services.metadata_service import RESUME_SUMMARY_COLUMNS, iter_resume_pages as iter_table_pages
+        yield from iter_table_pages(page_size=page_size, select=RESUME_SUMMARY_COLUMNS)
+        return
+
+    index = get_resume_index()
+    if index.needs_full_sync():
+        # Stream the table while it fills the index. If an earlier listing stopped partway,
+        # show what it stored first; the sync then continues after the last stored code.
+        try:
+            if index.resuming_full_sync():
+                yield from index.iter_pages(page_size)
+            yield from index.iter_sync(page_size=page_size)
+        except GeneratorExit:
+            # The caller found what it wanted; keep filling the index without holding it up.
+            Thread(target=_finish_sync, args=(index,), name="resume-index-sync", daemon=True).start()
+            raise
+        return
+    # An incremental sync only fetches what changed, so the wait stays short.
+    index.sync()
+    yield from index.iter_pages(page_size)
+
+def get_resume(code: str) -> dict | None:
+    if index_enabled():
+        resume = get_resume_index().get(code)
+        if resume is not None:
+            return resume
+
+    from services.metadata_service import get_resume_by_code
+    return get_resume_by_code(code)
@@ -0,0 +1,226 @@
+import os
+import time
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from threading import Event, Lock
+from typing import Callable
+
+from services.llm_cache import get_rewrite_cache, make_rewrite_key
+from services.metadata_service import (
+    OPENAI_MAX_TOKENS,
+    OPENAI_MODEL,
+    OPENAI_TEMPERATURE,
+    improve_sections_with_openai,
+    improve_text_with_openai,
+    stream_text_with_openai,
+)
+from services.telemetry import count, span
+from utils.text_chunks import estimate_tokens
+
+DEFAULT_MAX_CONCURRENCY = 4
+REWRITE_MODES = ("batched", "per-section")
+
+@dataclass
+class SectionRewrite:
+    property: str
+    text: str
+    elapsed: float
+
+def _resolve_max_concurrency(max_concurrency: int | None) -> int:
+    if max_concurrency is None:
+        raw = os.getenv("OPENAI_MAX_CONCURRENCY", "").strip()
+        max_concurrency = int(raw) if raw else DEFAULT_MAX_CONCURRENCY
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    return max_concurrency
+
+def _resolve_mode(mode: str | None) -> str:
+    mode = (mode or os.getenv("OPENAI_REWRITE_MODE", "") or "batched").strip().lower()
+    if mode not in REWRITE_MODES:
+        raise ValueError(f"Unknown rewrite mode '{mode}'; expected one of {', '.join(REWRITE_MODES)}")
+    return mode
+
+def _rewrite_batched(sections: list[tuple[str, str]], skip: set[int] = frozenset()) -> dict[int, SectionRewrite]:
+    done: dict[int, SectionRewrite] = {}
+    cache = get_rewrite_cache()
+    keys: dict[int, str] = {}
+    pending: dict[str, int] = {}
+
+    for idx, (prop, text) in enumerate(sections):
+        if idx in skip:
+            continue
+        if cache:
+            keys[idx] = make_rewrite_key(OPENAI_MODEL, OPENAI_TEMPERATURE, OPENAI_MAX_TOKENS, prop, text)
+            cached = cache.get(keys[idx])
+            if cached is not None:
+                done[idx] = SectionRewrite(property=prop, text=cached, elapsed=0.0)
+                continue
+        # A repeated section name can't share one JSON key, and a section too long for one
+        # completion needs the chunked per-section path; leave both to it.
+        if prop not in pending and estimate_tokens(text) <= OPENAI_MAX_TOKENS // 2:
+            pending[prop] = idx
+
+    if len(pending) < 2:
+        return done
+
+    started = time.perf_counter()
+    count("rewrite_batched_sections_total", len(pending))
+    with span("rewrite.batched"):
+        improved = improve_sections_with_openai({prop: sections[idx][1] for prop, idx in pending.items()})
+    elapsed = time.perf_counter() - started
+
+    for prop, idx in pending.items():
+        text = improved.get(prop)
+        if text is None:
+            continue
+        done[idx] = SectionRewrite(property=prop, text=text, elapsed=elapsed)
+        if cache:
+            cache.put(keys[idx], text)
+    return done
+
+def _rewrite_one(
+    property: str,
+    text: str,
+    canceled: Event,
+    on_delta: Callable[[str, str], None] | None = None,
+) -> SectionRewrite:
+    if canceled.is_set():
+        raise RuntimeError(f"Rewrite of '{property}' canceled")
+    started = time.perf_counter()
+    with span("rewrite.section", section=property):
+        if on_delta is None:
+            improved = improve_text_with_openai(text=text, property=property)
+        else:
+            parts = []
+            for delta in stream_text_with_openai(text=text, property=property):
+                if canceled.is_set():
+                    raise RuntimeError(f"Rewrite of '{property}' canceled")
+                parts.append(delta)
+                on_delta(property, delta)
+            improved = "".join(parts).strip()
+    return SectionRewrite(property=property, text=improved, elapsed=time.perf_counter() - started)
+
+class SpeculativeRewriter:
+    # Rewrites sections in the background while the user is still filling in the rest of
+    # the form. rewrite_sections() claims a result only if the property and text still
+    # match; an edited field replaces its speculation and close() drops whatever is left.
+    def __init__(self, max_concurrency: int | None = None) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=_resolve_max_concurrency(max_concurrency), thread_name_prefix="speculative"
+        )
+        self._canceled = Event()
+        self._futures: dict[str, tuple[str, Future]] = {}
+        self._lock = Lock()
+
+    def submit(self, property: str, text: str) -> None:
+        with self._lock:
+            if self._canceled.is_set():
+                return
+            current = self._futures.get(property)
+            if current is not None:
+                if current[0] == text:
+                    return
+                current[1].cancel()
+                del self._futures[property]
+            if text:
+                future = self._executor.submit(
+                    contextvars.copy_context().run, _rewrite_one, property, text, self._canceled
+                )
+                self._futures[property] = (text, future)
+
+    def claim(self, property: str, text: str) -> Future | None:
+        with self._lock:
+            current = self._futures.get(property)
+            if current is None or current[0] != text:
+                return None
+            del self._futures[property]
+            return current[1]
+
+    def close(self) -> None:
+        with self._lock:
+            self._canceled.set()
+            self._futures.clear()
+        # Requests already in flight finish on their own; their results still land in the rewrite cache.
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def rewrite_sections(
+    sections: list[tuple[str, str]],
+    max_concurrency: int | None = None,
+    on_complete: Callable[[SectionRewrite], None] | None = None,
+    mode: str | None = None,
+    speculative: SpeculativeRewriter | None = None,
+    on_delta: Callable[[str, str], None] | None = None,
+) -> list[SectionRewrite]:
+    # With on_delta, each section streams on its own and on_delta(property, text) receives
+    # its text as it arrives; a batched JSON reply has nothing useful to show until it ends.
+    if not sections:
+        return []
+
+    results: list[SectionRewrite | None] = [None] * len(sections)
+    claimed: dict[int, Future] = {}
+    if speculative is not None:
+        for idx, (prop, text) in enumerate(sections):
+            future = speculative.claim(prop, text)
+            if future is not None:
+                claimed[idx] = future
+
+    if on_delta is None and _resolve_mode(mode) == "batched" and len(sections) - len(claimed) > 1:
+        try:
+            prefilled = _rewrite_batched(sections, skip=set(claimed))
+        except Exception as exc:
+            # One timeout or 5xx on the combined call shouldn't fail the resume; every section
+            # goes through the per-section path below, which raises if it fails too.
+            print(f"Warning: batched rewrite failed, retrying per section: {exc}")
+            count("rewrite_batched_fallbacks_total")
+            prefilled = {}
+        for idx, rewrite in sorted(prefilled.items()):
+            results[idx] = rewrite
+            if on_complete:
+                on_complete(rewrite)
+
+    for idx, future in claimed.items():
+        try:
+            rewrite = future.result()
+        except Exception:
+            # A failed or canceled speculation is simply retried below.
+            continue
+        results[idx] = rewrite
+        if on_complete:
+            on_complete(rewrite)
+
+    # Whatever the batched call failed, left out or returned malformed is retried one section at a time.
+    remaining = [idx for idx, r in enumerate(results) if r is None]
+    if not remaining:
+        return results
+
+    workers = min(_resolve_max_concurrency(max_concurrency), len(remaining))
+    canceled = Event()
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rewrite")
+    try:
+        futures = {
+            # Each task runs in a copy of the caller's context so its spans keep the trace id.
+            executor.submit(
+                contextvars.copy_context().run, _rewrite_one, sections[idx][0], sections[idx][1], canceled, on_delta
+            ): idx
+            for idx in remaining
+        }
+        for fut in as_completed(futures):
+            exc = fut.exception()
+            if exc is not None:
+                canceled.set()
+                for other in futures:
+                    other.cancel()
+                prop = sections[futures[fut]][0]
+                raise RuntimeError(f"Failed to rewrite section '{prop}': {exc}") from exc
+
+            result = fut.result()
+            results[futures[fut]] = result
+            if on_complete:
+                on_complete(result)
+    finally:
+        # In-flight HTTP calls cannot be interrupted; don't block the caller on them after a failure.
+        executor.shutdown(wait=not canceled.is_set(), cancel_futures=True)
+
+    return results
@@ -0,0 +1,194 @@
+import re
+import json
+import uuid
+from dataclasses import dataclass
+from threading import Lock
+from urllib.parse import quote
+
+import requests
+
+from services.http_client import get_session
+from services.metadata_service import _odata_quote, _resolve_table_query_url
+
+MAX_BATCH_ENTITIES = 100
+# The service rejects change sets over 4 MiB; keep some room for the multipart framing.
+MAX_BATCH_BYTES = 4 * 1024 * 1024 - 64 * 1024
+
+_STATUS_LINE = re.compile(r"^HTTP/1\.1 (\d{3})", re.MULTILINE)
+_FAILED_INDEX = re.compile(r"^(\d+):")
+
+@dataclass
+class EntityWriteFailure:
+    entity: dict
+    status: int | None
+    error: str
+
+class TableBatchWriter:
+    def __init__(
+        self,
+        mode: str = "insert",
+        batch_size: int = MAX_BATCH_ENTITIES,
+        timeout: int = 30,
+    ) -> None:
+        if mode not in ("insert", "merge", "delete"):
+            raise ValueError("mode must be 'insert', 'merge' or 'delete'")
+        if not 1 <= batch_size <= MAX_BATCH_ENTITIES:
+            raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_ENTITIES}")
+
+        query_url = _resolve_table_query_url()
+        if query_url is None:
+            raise ValueError("AZURE_TABLE_SAS_URL and AZURE_TABLE_NAME must be set for batched writes")
+        self._table_url, self._sas_query = query_url.split("?", 1)
+        account_url = self._table_url.rsplit("/", 1)[0]
+        self._batch_url = f"{account_url}/$batch?{self._sas_query}"
+
+        self.mode = mode
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.written = 0
+        self.requests = 0
+        self.failures: list[EntityWriteFailure] = []
+        self._buffers: dict[str, list[tuple[dict, bytes]]] = {}
+        self._buffer_bytes: dict[str, int] = {}
+        self._lock = Lock()
+
+    def __enter__(self) -> "TableBatchWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.flush()
+
+    def add(self, entity: dict) -> None:
+        pk = entity.get("PartitionKey")
+        if not pk or not entity.get("RowKey"):
+            raise ValueError("Entity must include non-empty 'PartitionKey' and 'RowKey'")
+
+        body = b"" if self.mode == "delete" else json.dumps(entity, ensure_ascii=False).encode("utf-8")
+        ready: list[tuple[dict, bytes]] | None = None
+        with self._lock:
+            # Entity group transactions are limited to one partition, so buffer per PartitionKey.
+            if self._buffer_bytes.get(pk, 0) + len(body) > MAX_BATCH_BYTES:
+                ready = self._buffers.pop(pk, None)
+                self._buffer_bytes.pop(pk, None)
+            self._buffers.setdefault(pk, []).append((entity, body))
+            self._buffer_bytes[pk] = self._buffer_bytes.get(pk, 0) + len(body)
+            if ready is None and len(self._buffers[pk]) >= self.batch_size:
+                ready = self._buffers.pop(pk)
+                self._buffer_bytes.pop(pk, None)
+
+        if ready:
+            self._submit(ready)
+
+    def flush(self) -> None:
+        with self._lock:
+            pending = list(self._buffers.values())
+            self._buffers.clear()
+            self._buffer_bytes.clear()
+        for batch in pending:
+            self._submit(batch)
+
+    def _submit(self, batch: list[tuple[dict, bytes]]) -> None:
+        # A failed change set is rolled back as a whole; drop the entity the service
+        # blamed and resend the rest so one bad row doesn't sink its 99 neighbours.
+        while batch:
+            status, failed_index, error = self._send(batch)
+            if status is None:
+                with self._lock:
+                    self.written += len(batch)
+                return
+            if failed_index is None or failed_index >= len(batch):
+                with self._lock:
+                    self.failures.extend(EntityWriteFailure(entity, status, error) for entity, _ in batch)
+                return
+            failed_entity, _ = batch.pop(failed_index)
+            with self._lock:
+                if self.mode == "delete" and status == 404:
+                    # Already gone is the outcome a delete wants.
+                    self.written += 1
+                else:
+                    self.failures.append(EntityWriteFailure(failed_entity, status, error))
+
+    def _entity_request(self, entity: dict, body: bytes) -> bytes:
+        if self.mode == "insert":
+            request_line = f"POST {self._table_url} HTTP/1.1"
+        else:
+            key = (
+                f"(PartitionKey={quote(_odata_quote(entity['PartitionKey']), safe='')},"
+                f"RowKey={quote(_odata_quote(entity['RowKey']), safe='')})"
+            )
+            verb = "DELETE" if self.mode == "delete" else "MERGE"
+            request_line = f"{verb} {self._table_url}{key} HTTP/1.1"
+        head = "\r\n".join([
+            "Content-Type: application/http",
+            "Content-Transfer-Encoding: binary",
+            "",
+            request_line,
+            *(["If-Match: *"] if self.mode == "delete" else []),
+            "Content-Type: application/json",
+            "Accept: application/json;odata=nometadata",
+            "Prefer: return-no-content",
+            "DataServiceVersion: 3.0;",
+            f"Content-Length: {len(body)}",
+            "",
+            "",
+        ])
+        return head.encode("utf-8") + body + b"\r\n"
+
+    def _send(self, batch: list[tuple[dict, bytes]]) -> tuple[int | None, int | None, str]:
+        batch_boundary = f"batch_{uuid.uuid4()}"
+        changeset_boundary = f"changeset_{uuid.uuid4()}"
+
+        parts = [
+            f"--{batch_boundary}\r\n"
+            f"Content-Type: multipart/mixed; boundary={changeset_boundary}\r\n\r\n".encode("utf-8")
+        ]
+        for entity, body in batch:
+            parts.append(f"--{changeset_boundary}\r\n".encode("utf-8"))
+            parts.append(self._entity_request(entity, body))
+        parts.append(f"--{changeset_boundary}--\r\n--{batch_boundary}--\r\n".encode("utf-8"))
+
+        headers = {
+            "Content-Type": f"multipart/mixed; boundary={batch_boundary}",
+            "Accept": "application/json;odata=nometadata",
+            "DataServiceVersion": "3.0;NetFx",
+            "MaxDataServiceVersion": "3.0;NetFx",
+            "x-ms-version": "2019-02-02",
+        }
+        with self._lock:
+            self.requests += 1
+        try:
+            resp = get_session().post(self._batch_url, headers=headers, data=b"".join(parts), timeout=self.timeout)
+        except requests.RequestException as ex:
+            return 0, None, f"Table batch request failed: {ex}"
+
+        if resp.status_code != 202:
+            return resp.status_code, None, f"Table batch rejected ({resp.status_code}): {resp.text}"
+
+        statuses = [int(code) for code in _STATUS_LINE.findall(resp.text)]
+        failed = [code for code in statuses if code >= 300]
+        if not failed:
+            return None, None, ""
+        failed_index, message = _parse_batch_error(resp.text)
+        return failed[0], failed_index, message
+
+def _parse_batch_error(body: str) -> tuple[int | None, str]:
+    start = body.find("{")
+    end = body.rfind("}")
+    if start == -1 or end == -1:
+        return None, body
+    try:
+        payload = json.loads(body[start:end + 1])
+        message = payload["odata.error"]["message"]["value"]
+    except (ValueError, KeyError, TypeError):
+        return None, body[start:end + 1]
+    # The service prefixes the message with the index of the operation that failed.
+    match = _FAILED_INDEX.match(message)
+    if not match:
+        return None, message
+    return int(match.group(1)), message[match.end():].strip()
+
+def write_entities_batched(entities, mode: str = "insert") -> tuple[int, list[EntityWriteFailure]]:
+    with TableBatchWriter(mode=mode) as writer:
+        for entity in entities:
+            writer.add(entity)
+    return writer.written, writer.failures
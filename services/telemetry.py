@@ -0,0 +1,260 @@
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Iterator
+
+METRIC_PREFIX = "resume"
+# Upper bounds in seconds; covers a cache hit through a slow multi-output render.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_trace_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("resume_trace_id", default=None)
+
+class _NoopSpan:
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def set(self, **labels) -> None:
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class _Histogram:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self) -> None:
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+
+def _label_key(labels: dict) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+class Telemetry:
+    def __init__(self, log_path: str | None = None, metrics_path: str | None = None) -> None:
+        self.log_path = log_path
+        self.metrics_path = metrics_path
+        self._lock = Lock()
+        self._log_lock = Lock()
+        self._log_file = None
+        self._histograms: dict[tuple[str, tuple], _Histogram] = {}
+        self._errors: dict[tuple[str, tuple], int] = {}
+        self._counters: dict[tuple[str, tuple], float] = {}
+
+    def _open_log(self):
+        if self._log_file is None:
+            if self.log_path == "-":
+                self._log_file = sys.stderr
+            else:
+                directory = os.path.dirname(os.path.abspath(self.log_path))
+                os.makedirs(directory, exist_ok=True)
+                self._log_file = open(self.log_path, "a", encoding="utf-8", buffering=1)
+        return self._log_file
+
+    def log(self, event: dict) -> None:
+        if not self.log_path:
+            return
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._log_lock:
+            self._open_log().write(line + "\n")
+
+    def observe(self, name: str, seconds: float, labels: dict, error: BaseException | None) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(seconds)
+            if error is not None:
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+        event = {
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "type": "span",
+            "span": name,
+            "duration_ms": round(seconds * 1000, 3),
+            "status": "error" if error is not None else "ok",
+            "trace": _trace_id.get(),
+            **labels,
+        }
+        if error is not None:
+            event["error"] = f"{type(error).__name__}: {error}"
+        self.log(event)
+
+    def count(self, name: str, value: float, labels: dict) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            histograms = {k: (list(h.buckets), h.sum, h.count) for k, h in self._histograms.items()}
+            errors = dict(self._errors)
+            counters = dict(self._counters)
+        for (host, stats) in _http_stats().items():
+            for stat in ("requests", "retries", "connections"):
+                counters[(f"http_{stat}_total", (("host", host),))] = stats.get(stat, 0)
+
+        lines: list[str] = []
+        duration = f"{METRIC_PREFIX}_span_duration_seconds"
+        if histograms:
+            lines.append(f"# HELP {duration} Time spent in each pipeline stage.")
+            lines.append(f"# TYPE {duration} histogram")
+            for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+                base = (("span", name),) + labels
+                cumulative = 0
+                for bound, hits in zip(DURATION_BUCKETS, buckets):
+                    cumulative += hits
+                    lines.append(f"{duration}_bucket{_format_labels(base + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{duration}_bucket{_format_labels(base + (('le', '+Inf'),))} {count}")
+                lines.append(f"{duration}_sum{_format_labels(base)} {total:.6f}")
+                lines.append(f"{duration}_count{_format_labels(base)} {count}")
+
+        failures = f"{METRIC_PREFIX}_span_errors_total"
+        if errors:
+            lines.append(f"# HELP {failures} Pipeline stages that raised.")
+            lines.append(f"# TYPE {failures} counter")
+            for (name, labels), value in sorted(errors.items()):
+                lines.append(f"{failures}{_format_labels((('span', name),) + labels)} {value}")
+
+        by_name: dict[str, list[tuple[tuple, float]]] = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for name, series in sorted(by_name.items()):
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} counter")
+            for labels, value in sorted(series):
+                lines.append(f"{metric}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path: str | None = None) -> str | None:
+        path = path or self.metrics_path
+        if not path:
+            return None
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        # node_exporter's textfile collector must never see a half-written file.
+        os.replace(tmp_path, path)
+        return path
+
+    def close(self) -> None:
+        self.write_metrics()
+        with self._log_lock:
+            if self._log_file not in (None, sys.stderr):
+                self._log_file.close()
+            self._log_file = None
+
+def _http_stats() -> dict[str, dict[str, int]]:
+    # Only report connection stats if something already imported the HTTP client.
+    module = sys.modules.get("services.http_client")
+    return module.connection_stats() if module else {}
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels) + "}"
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+_telemetry: Telemetry | None = None
+_configured = False
+_configure_lock = Lock()
+
+def configure(
+    enabled: bool | None = None,
+    log_path: str | None = None,
+    metrics_path: str | None = None,
+) -> Telemetry | None:
+    global _telemetry, _configured
+    with _configure_lock:
+        if _telemetry is not None:
+            _telemetry.close()
+        log_path = log_path or os.getenv("TELEMETRY_LOG_PATH") or None
+        metrics_path = metrics_path or os.getenv("TELEMETRY_METRICS_PATH") or None
+        if enabled is None:
+            flag = os.getenv("TELEMETRY_ENABLED", "").strip().lower() in ("1", "true", "yes")
+            enabled = flag or bool(log_path or metrics_path)
+        _telemetry = Telemetry(log_path, metrics_path) if enabled else None
+        if _telemetry is not None and not _configured:
+            atexit.register(_close_on_exit)
+        _configured = True
+        return _telemetry
+
+def _close_on_exit() -> None:
+    if _telemetry is not None:
+        _telemetry.close()
+
+def get_telemetry() -> Telemetry | None:
+    if not _configured:
+        configure()
+    return _telemetry
+
+class _Span:
+    __slots__ = ("telemetry", "name", "labels", "started")
+
+    def __init__(self, telemetry: Telemetry, name: str, labels: dict) -> None:
+        self.telemetry = telemetry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.telemetry.observe(self.name, time.perf_counter() - self.started, self.labels, exc)
+        return False
+
+    def set(self, **labels) -> None:
+        self.labels.update(labels)
+
+def span(name: str, **labels) -> _Span | _NoopSpan:
+    telemetry = _telemetry if _configured else get_telemetry()
+    if telemetry is None:
+        return _NOOP_SPAN
+    return _Span(telemetry, name, labels)
+
+def count(name: str, value: float = 1, **labels) -> None:
+    telemetry = _telemetry if _configured else get_telemetry()
+    if telemetry is not None:
+        telemetry.count(name, value, labels)
+
+def enabled() -> bool:
+    return (_telemetry if _configured else get_telemetry()) is not None
+
+@contextmanager
+def trace(trace_id: str | None = None) -> Iterator[str]:
+    # Groups the spans of one resume in the JSON log; worker threads pick it up
+    # when their task runs inside contextvars.copy_context().
+    token = _trace_id.set(trace_id or uuid.uuid4().hex[:16])
+    try:
+        yield _trace_id.get()
+    finally:
+        _trace_id.reset(token)
+
+def current_trace_id() -> str | None:
+    return _trace_id.get()
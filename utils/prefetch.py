@@ -0,0 +1,52 @@
+import contextvars
+import queue
+import threading
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+def prefetch(source: Iterable[T], depth: int = 1) -> Iterator[T]:
+    # Pulls up to `depth` items ahead on a background thread, so the next page downloads
+    # while the caller works through the current one. Closing the returned generator stops
+    # the producer after whatever request it already has in flight.
+    items: queue.Queue = queue.Queue(maxsize=max(depth, 1))
+    stop = threading.Event()
+
+    def offer(entry: tuple) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        iterator = iter(source)
+        try:
+            for item in iterator:
+                if not offer((item, None)):
+                    return
+            offer((_DONE, None))
+        except Exception as ex:
+            offer((_DONE, ex))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    worker = threading.Thread(target=contextvars.copy_context().run, args=(produce,),
+                              name="prefetch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,66 @@
+import re
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+# Coarsest first: paragraphs, bullet lines, any line, sentences, then words.
+_BOUNDARIES = (
+    r"\n[ \t]*\n\s*",
+    r"\n(?=[ \t]*(?:[-*•·]|\d+[.)])\s)",
+    r"\n",
+    r"(?<=[.!?;])\s+",
+    r"\s+",
+)
+
+def estimate_tokens(text: str) -> int:
+    # BPE tokenizers give common English words one token and split long or rare ones;
+    # counting a token per six characters of each word, plus one per punctuation mark,
+    # lands slightly above the real count for resume text, which is the safe side.
+    return sum(1 + len(m) // 6 if m[0].isalnum() or m[0] == "_" else 1 for m in _TOKEN.findall(text))
+
+def split_text(text: str, max_tokens: int) -> list[tuple[str, str]]:
+    # Returns (chunk, separator) pairs; joining every chunk with its separator gives the
+    # original text back. Splits happen on the coarsest boundary that fits the budget.
+    if max_tokens < 1:
+        raise ValueError("max_tokens must be at least 1")
+    chunks = _merge_blank(_split(text, max_tokens, 0))
+    assert "".join(c + s for c, s in chunks) == (text if text.strip() else ""), "split_text changed the text"
+    return chunks
+
+def _merge_blank(pairs: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    # Whitespace-only pieces (a paragraph break split off on its own) join the previous
+    # separator, or lead the first chunk, so no chunk is empty and no break is lost.
+    chunks: list[tuple[str, str]] = []
+    leading = ""
+    for chunk, separator in pairs:
+        if chunk:
+            chunks.append((leading + chunk, separator))
+            leading = ""
+        elif chunks:
+            chunks[-1] = (chunks[-1][0], chunks[-1][1] + separator)
+        else:
+            leading += separator
+    return chunks
+
+def _split(text: str, max_tokens: int, _level: int) -> list[tuple[str, str]]:
+    if estimate_tokens(text) <= max_tokens or _level == len(_BOUNDARIES):
+        body = text.rstrip()
+        return [(body, text[len(body):])]
+
+    parts = re.split(f"({_BOUNDARIES[_level]})", text)
+    pieces = [parts[i] + (parts[i + 1] if i + 1 < len(parts) else "") for i in range(0, len(parts), 2)]
+
+    chunks: list[tuple[str, str]] = []
+    current = ""
+    for piece in pieces:
+        if estimate_tokens(piece) > max_tokens:
+            if current:
+                chunks.extend(_split(current, max_tokens, len(_BOUNDARIES)))
+                current = ""
+            chunks.extend(_split(piece, max_tokens, _level + 1))
+            continue
+        if current and estimate_tokens(current + piece) > max_tokens:
+            chunks.extend(_split(current, max_tokens, len(_BOUNDARIES)))
+            current = ""
+        current += piece
+    if current:
+        chunks.extend(_split(current, max_tokens, len(_BOUNDARIES)))
+    return chunks